@@ -1,50 +1,210 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.paginator import Paginator
+from django.db import connections
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
+from .clientes import buscar_clientes
+from .precios import ajustar_precios
 from .models import (
     Proveedor, CategoriaProducto, Producto, Cliente, 
     Venta, DetalleVenta, Abono, OrdenPedido, 
-    DetalleOrdenPedido, RecepcionProducto, DetalleRecepcion
+    DetalleOrdenPedido, RecepcionProducto, DetalleRecepcion,
+    Sucursal, PerfilUsuario, StockSucursal, EventoOutbox, HistorialPrecio,
+    VentaArchivada, DetalleVentaArchivada, AsociacionProducto, ClasificacionABC,
+    CierreCaja, LineaCierreCaja
 )
 
+
+class PaginadorEstimado(Paginator):
+    """
+    Paginador que, para listados sin filtros en PostgreSQL, usa la estimación de
+    filas de las estadísticas (pg_class.reltuples) en vez de un COUNT(*) completo.
+    """
+
+    UMBRAL_ESTIMACION = 10000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimado = self.estimar_filas(self.object_list)
+            if estimado is not None and estimado > self.UMBRAL_ESTIMACION:
+                return estimado
+        return super().count
+
+    @staticmethod
+    def estimar_filas(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [queryset.model._meta.db_table]
+            )
+            fila = cursor.fetchone()
+        return fila[0] if fila and fila[0] > 0 else None
+
+
+class AdminEscalable(admin.ModelAdmin):
+    """Base para los changelists grandes: sin conteo total y con conteo estimado"""
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    list_per_page = 50
+
+
 @admin.register(Proveedor)
 class ProveedorAdmin(admin.ModelAdmin):
     list_display = ['id_proveedor', 'nombre', 'rut', 'contacto', 'rubro']
     search_fields = ['nombre', 'rut', 'id_proveedor']
+    ordering = ['nombre']
 
 @admin.register(CategoriaProducto)
 class CategoriaProductoAdmin(admin.ModelAdmin):
     list_display = ['nombre', 'codigo']
     search_fields = ['nombre', 'codigo']
+    ordering = ['nombre']
+
+@admin.register(Sucursal)
+class SucursalAdmin(admin.ModelAdmin):
+    list_display = ['codigo', 'nombre', 'direccion']
+    search_fields = ['nombre', 'codigo']
+    ordering = ['codigo']
+
+@admin.register(PerfilUsuario)
+class PerfilUsuarioAdmin(admin.ModelAdmin):
+    list_display = ['usuario', 'sucursal']
+    list_filter = ['sucursal']
+    list_select_related = ['usuario', 'sucursal']
+    autocomplete_fields = ['usuario']
+
+class StockSucursalInline(admin.TabularInline):
+    model = StockSucursal
+    extra = 0
+
+class HistorialPrecioInline(admin.TabularInline):
+    model = HistorialPrecio
+    extra = 0
+    can_delete = False
+    readonly_fields = ['precio', 'precio_compra', 'vigente_desde', 'vigente_hasta']
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 @admin.register(Producto)
-class ProductoAdmin(admin.ModelAdmin):
-    list_display = ['codigo', 'nombre', 'marca', 'precio_compra', 'precio', 'stock', 'proveedor', 'categoria']
-    list_filter = ['categoria', 'proveedor', 'marca']
+class ProductoAdmin(AdminEscalable):
+    list_display = ['codigo', 'nombre', 'marca', 'precio_compra', 'precio', 'stock_total__stock', 'proveedor', 'categoria']
+    list_filter = ['categoria', 'proveedor']
+    list_select_related = ['proveedor', 'categoria', 'stock_total']
     search_fields = ['codigo', 'nombre', 'marca']
+    ordering = ['nombre']
+    autocomplete_fields = ['proveedor', 'categoria']
     readonly_fields = ['codigo', 'numero_secuencial']
+    inlines = [StockSucursalInline, HistorialPrecioInline]
+    actions = ['ajustar_precios_seleccionados']
+
+    @admin.action(description='Ajustar precios de los productos seleccionados')
+    def ajustar_precios_seleccionados(self, request, queryset):
+        # Para una categoría, proveedor o marca completa: filtrar y "seleccionar todos"
+        form = AjustePreciosForm(request.POST if 'aplicar' in request.POST else None)
+        if form.is_valid():
+            datos = form.cleaned_data
+            valor = {'porcentaje' if datos['tipo'] == 'porcentaje' else 'monto': datos['valor']}
+            ajustados = ajustar_precios(queryset, datos['campo'], redondear_a=datos['redondear_a'], **valor)
+            self.message_user(request, f'Precios ajustados en {ajustados} producto(s).', messages.SUCCESS)
+            return None
+
+        return TemplateResponse(request, 'admin/ajustar_precios.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Ajustar precios',
+            'opts': self.model._meta,
+            'form': form,
+            'cantidad': queryset.count(),
+            'seleccionados': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'todos': request.POST.get('select_across', '0'),
+            'accion': 'ajustar_precios_seleccionados',
+        })
+
+
+class AjustePreciosForm(forms.Form):
+    campo = forms.ChoiceField(choices=[
+        ('precio', 'Precio de venta'), ('precio_compra', 'Precio de compra'), ('ambos', 'Ambos'),
+    ])
+    tipo = forms.ChoiceField(choices=[('porcentaje', 'Porcentaje (%)'), ('monto', 'Monto fijo ($)')])
+    valor = forms.DecimalField(max_digits=10, decimal_places=2, help_text='Negativo para bajar precios')
+    redondear_a = forms.DecimalField(
+        required=False, min_value=1, max_digits=10, decimal_places=0,
+        help_text='Opcional: redondea al múltiplo indicado (p. ej. 10 pesos)',
+    )
 
 @admin.register(Cliente)
-class ClienteAdmin(admin.ModelAdmin):
+class ClienteAdmin(AdminEscalable):
     list_display = ['nombre', 'apellido', 'rut', 'deuda_actual', 'estado']
     list_filter = ['estado']
-    search_fields = ['nombre', 'apellido', 'rut']
+    search_fields = ['^nombre_normalizado', '=rut_normalizado']
+    ordering = ['nombre']
+
+    def get_search_results(self, request, queryset, search_term):
+        # RUT exacto o prefijo del nombre, ambos sobre las columnas normalizadas indexadas
+        return buscar_clientes(queryset, search_term), False
 
 class DetalleVentaInline(admin.TabularInline):
     model = DetalleVenta
     extra = 0
-    readonly_fields = ['subtotal']
+    readonly_fields = ['subtotal', 'costo_unitario']
+    autocomplete_fields = ['producto']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('producto')
 
 @admin.register(Venta)
-class VentaAdmin(admin.ModelAdmin):
-    list_display = ['numero_boleta', 'cliente', 'fecha', 'vendedor', 'tipo_pago', 'total', 'estado_credito']
-    list_filter = ['tipo_pago', 'estado_credito', 'fecha']
+class VentaAdmin(AdminEscalable):
+    list_display = ['numero_boleta', 'cliente', 'fecha', 'vendedor', 'sucursal', 'tipo_pago', 'total', 'estado_credito']
+    list_filter = ['sucursal', 'tipo_pago', 'estado_credito']
+    list_select_related = ['cliente', 'vendedor', 'sucursal']
     search_fields = ['numero_boleta', 'cliente__nombre']
+    autocomplete_fields = ['cliente', 'vendedor']
+    date_hierarchy = 'fecha'
     inlines = [DetalleVentaInline]
 
+class DetalleVentaArchivadaInline(admin.TabularInline):
+    model = DetalleVentaArchivada
+    extra = 0
+    can_delete = False
+    readonly_fields = ['producto', 'cantidad', 'precio_unitario', 'costo_unitario', 'subtotal']
+    fields = readonly_fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('producto')
+
+@admin.register(VentaArchivada)
+class VentaArchivadaAdmin(AdminEscalable):
+    # Solo lectura: el archivo se llena con el comando archivar_ventas
+    list_display = ['numero_boleta', 'cliente', 'fecha', 'vendedor', 'sucursal', 'tipo_pago', 'total', 'archivada_en']
+    list_filter = ['sucursal', 'tipo_pago']
+    list_select_related = ['cliente', 'vendedor', 'sucursal']
+    search_fields = ['numero_boleta']
+    date_hierarchy = 'fecha'
+    inlines = [DetalleVentaArchivadaInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 @admin.register(Abono)
-class AbonoAdmin(admin.ModelAdmin):
+class AbonoAdmin(AdminEscalable):
     list_display = ['cliente', 'numero_boleta', 'monto', 'fecha']
-    list_filter = ['fecha']
+    list_select_related = ['cliente']
     search_fields = ['cliente__nombre', 'numero_boleta']
+    autocomplete_fields = ['cliente']
+    date_hierarchy = 'fecha'
 
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
@@ -53,8 +213,78 @@ class AbonoAdmin(admin.ModelAdmin):
 class OrdenPedidoAdmin(admin.ModelAdmin):
     list_display = ['id', 'proveedor', 'fecha']
     list_filter = ['fecha', 'proveedor']
+    list_select_related = ['proveedor']
+    search_fields = ['=id', 'proveedor__nombre']
+    autocomplete_fields = ['proveedor']
 
 @admin.register(RecepcionProducto)
 class RecepcionProductoAdmin(admin.ModelAdmin):
-    list_display = ['id', 'orden', 'fecha_recepcion']
-    list_filter = ['fecha_recepcion']
\ No newline at end of file
+    list_display = ['id', 'orden', 'sucursal', 'fecha_recepcion']
+    list_filter = ['sucursal', 'fecha_recepcion']
+    list_select_related = ['orden', 'orden__proveedor', 'sucursal']
+    autocomplete_fields = ['orden']
+
+@admin.register(EventoOutbox)
+class EventoOutboxAdmin(AdminEscalable):
+    list_display = ['id', 'tipo', 'estado', 'intentos', 'creado', 'disponible_desde', 'procesado_en']
+    list_filter = ['estado', 'tipo']
+    readonly_fields = ['creado', 'procesado_en', 'reclamado_por', 'bloqueado_hasta', 'ultimo_error']
+
+@admin.register(AsociacionProducto)
+class AsociacionProductoAdmin(AdminEscalable):
+    # Se recalcula completo con el comando analizar_ventas
+    list_display = ['producto', 'asociado', 'ventas_juntas', 'confianza', 'lift']
+    list_select_related = ['producto', 'asociado']
+    search_fields = ['producto__nombre', 'producto__codigo']
+    ordering = ['producto', '-lift']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ClasificacionABC)
+class ClasificacionABCAdmin(AdminEscalable):
+    list_display = ['producto', 'clase', 'ingreso', 'participacion', 'acumulado', 'calculado_en']
+    list_filter = ['clase']
+    list_select_related = ['producto']
+    search_fields = ['producto__nombre', 'producto__codigo']
+    ordering = ['-ingreso']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+class LineaCierreCajaInline(admin.TabularInline):
+    model = LineaCierreCaja
+    extra = 0
+    can_delete = False
+    readonly_fields = ['vendedor', 'tipo_pago', 'cantidad', 'total']
+    fields = readonly_fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('vendedor')
+
+@admin.register(CierreCaja)
+class CierreCajaAdmin(AdminEscalable):
+    # Inmutable: los cierres se crean desde Reportes > Cierres de Caja
+    list_display = ['id', 'sucursal', 'desde', 'hasta', 'cantidad_ventas', 'total', 'cerrado_por']
+    list_filter = ['sucursal']
+    list_select_related = ['sucursal', 'cerrado_por']
+    date_hierarchy = 'hasta'
+    inlines = [LineaCierreCajaInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
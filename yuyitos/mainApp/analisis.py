@@ -0,0 +1,168 @@
+from array import array
+from collections import Counter
+from decimal import Decimal
+from itertools import combinations
+
+from django.db import transaction
+from django.db.models import Sum
+
+from .archivo import incluye_archivo
+from .models import (
+    AsociacionProducto, ClasificacionABC, DetalleVenta, DetalleVentaArchivada, Producto, ResumenMargenDiario
+)
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # numpy/scipy son opcionales, sin ellos se cuenta en Python puro (más lento)
+    np = sparse = None
+
+TAMANO_LECTURA = 10000
+
+
+def lineas_de_venta(inicio):
+    """Pares (venta_id, producto_id) de las ventas desde `inicio`, activas y archivadas, en streaming"""
+    modelos = [DetalleVenta]
+    if incluye_archivo(inicio):
+        modelos.append(DetalleVentaArchivada)
+    for modelo in modelos:
+        yield from (
+            modelo.objects.filter(venta__fecha__gte=inicio)
+            .order_by('venta_id')
+            .values_list('venta_id', 'producto_id')
+            .iterator(chunk_size=TAMANO_LECTURA)
+        )
+
+
+# -----------------------------
+# CANASTA: CO-OCURRENCIA Y LIFT
+# -----------------------------
+def coocurrencias(lineas, min_juntas):
+    """
+    Cuenta ventas por producto y por par de productos. Devuelve (total de ventas, {producto: ventas},
+    [(a, b, ventas juntas)] con a < b y al menos `min_juntas`).
+    """
+    if sparse is not None:
+        return _coocurrencias_dispersas(lineas, min_juntas)
+    return _coocurrencias_python(lineas, min_juntas)
+
+
+def _coocurrencias_dispersas(lineas, min_juntas):
+    # Las columnas se acumulan en arrays de enteros (8 bytes por línea), no en tuplas de Python
+    ventas, productos = array('q'), array('q')
+    for venta_id, producto_id in lineas:
+        ventas.append(venta_id)
+        productos.append(producto_id)
+    if not ventas:
+        return 0, {}, []
+
+    ids_venta, filas = np.unique(np.frombuffer(ventas, dtype=np.int64), return_inverse=True)
+    ids_producto, columnas = np.unique(np.frombuffer(productos, dtype=np.int64), return_inverse=True)
+
+    # Matriz venta × producto binaria (un producto repetido en la boleta cuenta una vez)
+    matriz = sparse.csr_matrix(
+        (np.ones(len(filas), dtype=np.int32), (filas, columnas)),
+        shape=(len(ids_venta), len(ids_producto)),
+    )
+    matriz.data[:] = 1
+
+    # Xᵀ·X: en la diagonal las ventas de cada producto, fuera de ella las ventas de cada par
+    conteos = (matriz.T @ matriz).tocsr()
+    por_producto = conteos.diagonal()
+    pares = sparse.triu(conteos, k=1).tocoo()
+    filtro = pares.data >= min_juntas
+
+    return (
+        len(ids_venta),
+        dict(zip(ids_producto.tolist(), por_producto.tolist())),
+        list(zip(ids_producto[pares.row[filtro]].tolist(), ids_producto[pares.col[filtro]].tolist(), pares.data[filtro].tolist())),
+    )
+
+
+def _coocurrencias_python(lineas, min_juntas):
+    total, por_producto, por_par = 0, Counter(), Counter()
+    venta_actual, canasta = None, set()
+
+    def cerrar(canasta):
+        por_producto.update(canasta)
+        por_par.update(combinations(sorted(canasta), 2))
+
+    for venta_id, producto_id in lineas:
+        if venta_id != venta_actual:
+            if canasta:
+                cerrar(canasta)
+                total += 1
+            venta_actual, canasta = venta_id, set()
+        canasta.add(producto_id)
+    if canasta:
+        cerrar(canasta)
+        total += 1
+
+    return total, dict(por_producto), [(a, b, n) for (a, b), n in por_par.items() if n >= min_juntas]
+
+
+def calcular_asociaciones(inicio, min_juntas=3, max_por_producto=20):
+    """Recalcula AsociacionProducto con las ventas desde `inicio`; devuelve (ventas, asociaciones)"""
+    total, por_producto, pares = coocurrencias(lineas_de_venta(inicio), min_juntas)
+
+    por_origen = {}
+    for a, b, juntas in pares:
+        lift = juntas * total / (por_producto[a] * por_producto[b])
+        for producto, asociado in ((a, b), (b, a)):
+            por_origen.setdefault(producto, []).append(AsociacionProducto(
+                producto_id=producto,
+                asociado_id=asociado,
+                ventas_juntas=juntas,
+                soporte=juntas / total,
+                confianza=juntas / por_producto[producto],
+                lift=lift,
+            ))
+
+    asociaciones = [
+        asociacion
+        for lista in por_origen.values()
+        for asociacion in sorted(lista, key=lambda a: -a.lift)[:max_por_producto]
+    ]
+    with transaction.atomic():
+        AsociacionProducto.objects.all().delete()
+        AsociacionProducto.objects.bulk_create(asociaciones, batch_size=1000)
+    return total, len(asociaciones)
+
+
+# -----------------------------
+# CLASIFICACIÓN ABC
+# -----------------------------
+def calcular_abc(desde, limite_a=0.8, limite_b=0.95):
+    """
+    Clasifica todos los productos por su ingreso desde `desde` (leído del resumen diario de
+    márgenes): A hasta el `limite_a` del ingreso acumulado, B hasta `limite_b`, el resto C.
+    Devuelve {clase: cantidad de productos}.
+    """
+    ingresos = dict(
+        ResumenMargenDiario.objects.filter(fecha__gte=desde)
+        .values('producto_id').annotate(total=Sum('ingreso'))
+        .values_list('producto_id', 'total')
+    )
+    total = sum(ingresos.values(), Decimal('0'))
+
+    orden = sorted(Producto.objects.values_list('id', flat=True), key=lambda p: -ingresos.get(p, 0))
+    clasificaciones, acumulado = [], Decimal('0')
+    for producto_id in orden:
+        ingreso = ingresos.get(producto_id) or Decimal('0')
+        # La clase se decide por el acumulado antes de sumar el producto: el que cruza el límite
+        # sigue en la clase anterior
+        previo = float(acumulado / total) if total else 1.0
+        acumulado += ingreso
+        clase = 'A' if previo < limite_a and ingreso else 'B' if previo < limite_b and ingreso else 'C'
+        clasificaciones.append(ClasificacionABC(
+            producto_id=producto_id,
+            clase=clase,
+            ingreso=ingreso,
+            participacion=float(ingreso / total) if total else 0.0,
+            acumulado=float(acumulado / total) if total else 0.0,
+        ))
+
+    with transaction.atomic():
+        ClasificacionABC.objects.all().delete()
+        ClasificacionABC.objects.bulk_create(clasificaciones, batch_size=1000)
+    return Counter(c.clase for c in clasificaciones)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MainappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mainApp'
+
+    def ready(self):
+        from . import signals, manejadores, consultas_lentas  # noqa: F401
@@ -0,0 +1,114 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.http import Http404
+from django.utils import timezone
+
+from .models import DetalleVenta, DetalleVentaArchivada, Venta, VentaArchivada
+
+CAMPOS_VENTA = [
+    'id', 'numero_boleta', 'cliente_id', 'vendedor_id', 'sucursal_id',
+    'tipo_pago', 'total', 'fecha', 'estado_credito',
+]
+CAMPOS_DETALLE = ['id', 'venta_id', 'producto_id', 'cantidad', 'precio_unitario', 'costo_unitario', 'subtotal']
+
+CLAVE_TOTAL = 'archivo:ventas:total'
+TOTAL_ARCHIVO_SEGUNDOS = 60 * 60
+
+
+def limite_archivo(dias=None):
+    """Las ventas anteriores a esta fecha pueden archivarse"""
+    return timezone.now() - timedelta(days=settings.ARCHIVO_VENTAS_DIAS if dias is None else dias)
+
+
+def ventas_archivables(limite):
+    # Solo ventas cerradas: las a crédito pendientes siguen activas hasta que se paguen
+    return Venta.objects.filter(
+        Q(tipo_pago='contado') | Q(estado_credito='CANCELADA'),
+        fecha__lt=limite,
+    )
+
+
+def archivar_lote(limite, tamano):
+    """
+    Mueve hasta `tamano` ventas archivables (con sus detalles) a las tablas de archivo en una
+    transacción. Es reanudable: si se corta, el lote no se aplicó o quedó completo, y las
+    inserciones ignoran lo que ya estuviera archivado. Devuelve las ventas movidas.
+    """
+    with transaction.atomic():
+        ids = list(
+            ventas_archivables(limite).select_for_update().order_by('id').values_list('id', flat=True)[:tamano]
+        )
+        if not ids:
+            return 0
+
+        VentaArchivada.objects.bulk_create(
+            [VentaArchivada(**v) for v in Venta.objects.filter(id__in=ids).values(*CAMPOS_VENTA)],
+            ignore_conflicts=True,
+        )
+        DetalleVentaArchivada.objects.bulk_create(
+            [DetalleVentaArchivada(**d) for d in DetalleVenta.objects.filter(venta_id__in=ids).values(*CAMPOS_DETALLE)],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        DetalleVenta.objects.filter(venta_id__in=ids).delete()
+        Venta.objects.filter(id__in=ids).delete()
+
+        transaction.on_commit(lambda: cache.delete(CLAVE_TOTAL))
+    return len(ids)
+
+
+def fecha_corte():
+    """Fecha de la venta archivada más reciente (None sin archivo); antes de ella hay que mirar el archivo"""
+    # Una sola lectura del índice por fecha: no se cachea para no depender de otro proceso
+    return VentaArchivada.objects.aggregate(corte=Max('fecha'))['corte']
+
+
+def incluye_archivo(inicio):
+    """True si un rango que parte en `inicio` (None = desde siempre) alcanza ventas archivadas"""
+    corte = fecha_corte()
+    return corte is not None and (inicio is None or inicio <= corte)
+
+
+def total_ventas_archivadas():
+    """Conteo del archivo para estadísticas; solo crece al archivar, así que se cachea un rato"""
+    total = cache.get(CLAVE_TOTAL)
+    if total is None:
+        total = VentaArchivada.objects.count()
+        cache.set(CLAVE_TOTAL, total, TOTAL_ARCHIVO_SEGUNDOS)
+    return total
+
+
+def primera_fecha_venta():
+    primeras = [
+        modelo.objects.aggregate(primera=Min('fecha'))['primera']
+        for modelo in (Venta, VentaArchivada)
+    ]
+    primeras = [fecha for fecha in primeras if fecha is not None]
+    return min(primeras) if primeras else None
+
+
+def ventas_con_archivo(campos, inicio=None, **filtros):
+    """
+    Ventas activas y archivadas como un solo queryset de valores (UNION ALL), con los mismos
+    filtros. El archivo solo se consulta si el rango que parte en `inicio` lo alcanza.
+    """
+    if inicio is not None:
+        filtros['fecha__gte'] = inicio
+    activas = Venta.objects.filter(**filtros).values(*campos).order_by()
+    if not incluye_archivo(inicio):
+        return activas
+    archivadas = VentaArchivada.objects.filter(**filtros).values(*campos).order_by()
+    return activas.union(archivadas, all=True)
+
+
+def buscar_venta(venta_id):
+    """La venta activa o, si ya se archivó, la archivada (misma interfaz para las plantillas)"""
+    for modelo in (Venta, VentaArchivada):
+        venta = modelo.objects.select_related('cliente', 'vendedor', 'sucursal').filter(pk=venta_id).first()
+        if venta is not None:
+            return venta
+    raise Http404('Venta no encontrada')
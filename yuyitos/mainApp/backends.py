@@ -0,0 +1,69 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+
+# Versiones en el cache compartido: un cambio en un proceso invalida la copia local de los demás
+CLAVE_VERSION_USUARIOS = 'usuarios:version'
+
+
+def cache_usuarios():
+    return caches['usuarios']
+
+
+def clave_usuario(user_id):
+    return f"usuario:{user_id}"
+
+
+def clave_version_usuario(user_id):
+    return f"usuario:{user_id}:version"
+
+
+def invalidar_usuario(user_id):
+    cache.set(clave_version_usuario(user_id), uuid.uuid4().hex, None)
+    cache_usuarios().delete(clave_usuario(user_id))
+
+
+def invalidar_usuarios():
+    """Para cambios que afectan a muchos usuarios (permisos de un grupo)"""
+    cache.set(CLAVE_VERSION_USUARIOS, uuid.uuid4().hex, None)
+    cache_usuarios().clear()
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend que guarda por unos segundos el usuario autenticado (con su rol,
+    is_superuser) en un cache local del proceso, evitando el SELECT de User en cada request.
+    Cada copia se valida contra la versión del usuario en el cache compartido, que cambia al
+    guardar el usuario o sus grupos/permisos. Sin cache compartido queda desactivado
+    (USUARIOS_CACHE_SEGUNDOS = 0).
+    """
+
+    def leer_usuario(self, user_id):
+        # Con su perfil y sucursal, para que las vistas por sucursal no consulten de nuevo
+        usuario = (
+            User.objects.select_related('perfil__sucursal')
+            .filter(pk=user_id).first()
+        )
+        if usuario is None or not self.user_can_authenticate(usuario):
+            return None
+        return usuario
+
+    def get_user(self, user_id):
+        if not settings.USUARIOS_CACHE_SEGUNDOS:
+            return self.leer_usuario(user_id)
+
+        claves = [CLAVE_VERSION_USUARIOS, clave_version_usuario(user_id)]
+        actuales = cache.get_many(claves)
+        versiones = tuple(actuales.get(c) for c in claves)
+
+        clave = clave_usuario(user_id)
+        guardado = cache_usuarios().get(clave)
+        if guardado is not None and guardado[0] == versiones:
+            return guardado[1]
+        usuario = self.leer_usuario(user_id)
+        if usuario is not None:
+            cache_usuarios().set(clave, (versiones, usuario), settings.USUARIOS_CACHE_SEGUNDOS)
+        return usuario
@@ -0,0 +1,102 @@
+import hashlib
+import zipfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+
+from .archivo import ventas_con_archivo
+from .models import DetalleVenta, DetalleVentaArchivada, DocumentoBoleta, Venta, VentaArchivada
+
+try:
+    from weasyprint import HTML
+except ImportError:  # weasyprint es opcional, sin él solo se guardan boletas HTML
+    HTML = None
+
+DIRECTORIO = 'boletas'
+TAMANO_TRAMO = 500
+
+
+def guardar_contenido(contenido, extension):
+    """Guarda bytes con su SHA-256 como nombre; si ya existen no se vuelven a escribir"""
+    huella = hashlib.sha256(contenido).hexdigest()
+    nombre = f"{DIRECTORIO}/{huella[:2]}/{huella}.{extension}"
+    if not default_storage.exists(nombre):
+        nombre = default_storage.save(nombre, ContentFile(contenido))
+    return nombre, huella
+
+
+def generar_documento(venta, detalles=None):
+    """Renderiza la boleta una vez y la registra; la venta debe traer cliente, vendedor y sucursal"""
+    if detalles is None:
+        detalles = venta.detalles.select_related('producto')
+    html = render_to_string('boleta.html', {'venta': venta, 'detalles': detalles})
+    nombre_html, huella = guardar_contenido(html.encode('utf-8'), 'html')
+    nombre_pdf = ''
+    if HTML is not None:
+        nombre_pdf, _ = guardar_contenido(HTML(string=html).write_pdf(), 'pdf')
+
+    documento, _ = DocumentoBoleta.objects.update_or_create(
+        numero_boleta=venta.numero_boleta,
+        defaults={
+            'venta_id': venta.id,
+            'vendedor_id': venta.vendedor_id,
+            'fecha': venta.fecha,
+            'html': nombre_html,
+            'pdf': nombre_pdf,
+            'huella': huella,
+        },
+    )
+    return documento
+
+
+def documento_de(venta):
+    """
+    La boleta guardada de la venta; si aún no existe (venta anterior o outbox atrasado) se genera.
+    Recibe la venta ya buscada para que quien llama revise los permisos antes de renderizar nada.
+    """
+    documento = DocumentoBoleta.objects.filter(venta_id=venta.id).first()
+    if documento is not None:
+        return documento
+    return generar_documento(venta)
+
+
+def documentos_del_periodo(inicio, fin):
+    """Boletas de las ventas en [inicio, fin), generando en tramos las que falten"""
+    ids = [v['id'] for v in ventas_con_archivo(['id'], inicio, fecha__lt=fin)]
+    documentos = []
+    for i in range(0, len(ids), TAMANO_TRAMO):
+        tramo = ids[i:i + TAMANO_TRAMO]
+        existentes = list(DocumentoBoleta.objects.filter(venta_id__in=tramo))
+        faltantes = set(tramo) - {d.venta_id for d in existentes}
+        documentos += existentes
+        if faltantes:
+            documentos += _generar_faltantes(faltantes)
+    return sorted(documentos, key=lambda d: d.numero_boleta)
+
+
+def _generar_faltantes(ids):
+    generados = []
+    for modelo, modelo_detalle in ((Venta, DetalleVenta), (VentaArchivada, DetalleVentaArchivada)):
+        ventas = list(modelo.objects.select_related('cliente', 'vendedor', 'sucursal').filter(id__in=ids))
+        if not ventas:
+            continue
+        # Los detalles de todo el tramo en una consulta, en vez de una por venta
+        por_venta = {}
+        for detalle in modelo_detalle.objects.select_related('producto').filter(venta_id__in=[v.id for v in ventas]):
+            por_venta.setdefault(detalle.venta_id, []).append(detalle)
+        generados += [generar_documento(v, por_venta.get(v.id, [])) for v in ventas]
+    return generados
+
+
+def escribir_zip(documentos, destino, formato='html'):
+    """Copia las boletas guardadas a un zip (ruta o archivo abierto), sin volver a renderizarlas"""
+    with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+        for documento in documentos:
+            nombre = documento.pdf if formato == 'pdf' else documento.html
+            if not nombre:
+                continue
+            with default_storage.open(nombre, 'rb') as origen, \
+                    archivo_zip.open(f"boleta_{documento.numero_boleta}.{formato}", 'w') as copia:
+                while bloque := origen.read(64 * 1024):
+                    copia.write(bloque)
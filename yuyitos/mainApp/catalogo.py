@@ -0,0 +1,185 @@
+import base64
+import hashlib
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import eventos
+from .models import Producto, ProductoEliminado
+from .sucursales import sucursal_de
+
+logger = logging.getLogger(__name__)
+
+CLAVE_VERSION_CATALOGO = 'catalogo:version'
+
+
+CLAVE_VERSION_STOCK_TOTAL = 'catalogo:stock:total'
+
+
+def clave_version_stock(sucursal_id):
+    return f'catalogo:stock:{sucursal_id}'
+
+
+def _version(clave):
+    """(token, fecha de modificación) guardado en cache; si no existe se crea uno nuevo"""
+    version = cache.get(clave)
+    if version is None:
+        version = (uuid.uuid4().hex, timezone.now())
+        # add y no set: si otro request la creó primero, se usa la suya
+        if not cache.add(clave, version, settings.CATALOGO_VERSION_SEGUNDOS):
+            version = cache.get(clave) or version
+    return version
+
+
+def _renovar(*claves, aviso=None):
+    # Recién al confirmar la transacción, para no entregar datos viejos con la versión nueva
+    # (ni avisar a las cajas de un cambio que después se revierte)
+    def renovar():
+        ahora = timezone.now()
+        cache.set_many({clave: (uuid.uuid4().hex, ahora) for clave in claves}, settings.CATALOGO_VERSION_SEGUNDOS)
+        if aviso is not None:
+            try:
+                aviso()
+            except Exception:
+                # Sin aviso las cajas siguen funcionando: la venta valida el stock igual
+                logger.exception("No se pudo avisar el cambio a las cajas conectadas")
+    transaction.on_commit(renovar)
+
+
+def invalidar_catalogo(productos=None):
+    """
+    Llamar cuando cambian productos, precios, categorías o proveedores. Con `productos` (ids)
+    además se avisa a las cajas conectadas que revisen su precio.
+    """
+    _renovar(CLAVE_VERSION_CATALOGO, aviso=productos and (lambda: eventos.precios_cambiados(productos)))
+
+
+def invalidar_stock(sucursal_id, productos=eventos.TODOS):
+    """
+    Llamar cuando cambia el stock de la sucursal (también tras UPDATE masivos sin señales).
+    Las cajas conectadas reciben el stock nuevo de `productos` (ids) o de todo el catálogo.
+    """
+    _renovar(
+        clave_version_stock(sucursal_id), CLAVE_VERSION_STOCK_TOTAL,
+        aviso=lambda: eventos.stock_cambiado(sucursal_id, productos),
+    )
+
+
+def _versiones(request, incluir_total):
+    sucursal = sucursal_de(request.user)
+    claves = [CLAVE_VERSION_CATALOGO, clave_version_stock(sucursal.pk if sucursal else None)]
+    if incluir_total:
+        claves.append(CLAVE_VERSION_STOCK_TOTAL)
+    return [_version(clave) for clave in claves]
+
+
+def _etag(request, incluir_total):
+    if not settings.CATALOGO_ETAG:
+        return None
+    # Además de las versiones, el usuario y la URL: la página muestra datos del usuario y filtros
+    partes = [token for token, _ in _versiones(request, incluir_total)]
+    partes += [str(request.user.pk), request.get_full_path()]
+    return hashlib.md5('|'.join(partes).encode()).hexdigest()
+
+
+def etag_catalogo(request, *args, **kwargs):
+    """ETag de catálogo y stock de la sucursal del usuario, sin consultar las tablas de productos"""
+    return _etag(request, incluir_total=False)
+
+
+def etag_inventario(request, *args, **kwargs):
+    """Como etag_catalogo, pero también cambia con el stock de otras sucursales (stock total)"""
+    return _etag(request, incluir_total=True)
+
+
+def ultima_modificacion_catalogo(request, *args, **kwargs):
+    if not settings.CATALOGO_ETAG:
+        return None
+    return max(fecha for _, fecha in _versiones(request, incluir_total=False))
+
+
+def ultima_modificacion_inventario(request, *args, **kwargs):
+    if not settings.CATALOGO_ETAG:
+        return None
+    return max(fecha for _, fecha in _versiones(request, incluir_total=True))
+
+
+# -----------------------------
+# SINCRONIZACIÓN INCREMENTAL
+# -----------------------------
+CAMPOS_SINCRONIZACION = ['id', 'codigo', 'nombre', 'precio', 'marca', 'categoria_id', 'proveedor_id', 'updated_at']
+
+
+def codificar_cursor(posiciones):
+    return base64.urlsafe_b64encode(json.dumps(posiciones).encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """{'p': [fecha iso, id], 'e': [fecha iso, id]}; sin cursor se parte desde el inicio"""
+    if not cursor:
+        return {'p': None, 'e': None}
+    try:
+        posiciones = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {
+            clave: (datetime.fromisoformat(posiciones[clave][0]), int(posiciones[clave][1]))
+            if posiciones.get(clave) else None
+            for clave in ('p', 'e')
+        }
+    except (ValueError, TypeError, KeyError, IndexError):
+        raise ValueError('Cursor inválido.')
+
+
+def _despues_de(queryset, campo_fecha, posicion):
+    if posicion is None:
+        return queryset
+    fecha, ultimo_id = posicion
+    return queryset.filter(
+        Q(**{f'{campo_fecha}__gt': fecha}) | Q(**{campo_fecha: fecha, 'id__gt': ultimo_id})
+    )
+
+
+def cambios_catalogo(cursor, limite):
+    """
+    Productos modificados y eliminados después del cursor, recorridos por índice (fecha, id).
+    Solo entrega filas con más de SINCRONIZACION_MARGEN_SEGUNDOS de antigüedad: una transacción
+    más lenta puede confirmar después una fecha anterior, y así no queda detrás del cursor.
+    """
+    posiciones = decodificar_cursor(cursor)
+    hasta = timezone.now() - timedelta(seconds=settings.SINCRONIZACION_MARGEN_SEGUNDOS)
+
+    productos = list(
+        _despues_de(Producto.objects.filter(updated_at__lte=hasta), 'updated_at', posiciones['p'])
+        .order_by('updated_at', 'id')
+        .values(*CAMPOS_SINCRONIZACION)[:limite + 1]
+    )
+    eliminados = list(
+        _despues_de(ProductoEliminado.objects.filter(eliminado_en__lte=hasta), 'eliminado_en', posiciones['e'])
+        .order_by('eliminado_en', 'id')
+        .values('id', 'producto_id', 'codigo', 'eliminado_en')[:limite + 1]
+    )
+
+    hay_mas = len(productos) > limite or len(eliminados) > limite
+    productos, eliminados = productos[:limite], eliminados[:limite]
+
+    nuevas = {'p': posiciones['p'], 'e': posiciones['e']}
+    if productos:
+        nuevas['p'] = (productos[-1]['updated_at'], productos[-1]['id'])
+    if eliminados:
+        nuevas['e'] = (eliminados[-1]['eliminado_en'], eliminados[-1]['id'])
+
+    return {
+        'productos': productos,
+        'eliminados': [{'id': e['producto_id'], 'codigo': e['codigo']} for e in eliminados],
+        'cursor': codificar_cursor({
+            clave: [posicion[0].isoformat(), posicion[1]] if posicion else None
+            for clave, posicion in nuevas.items()
+        }),
+        'hay_mas': hay_mas,
+    }
@@ -0,0 +1,94 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import CierreCaja, LineaCierreCaja, Venta
+
+
+def inicio_turno(sucursal):
+    """El turno abierto parte donde terminó el último cierre de la sucursal (o al inicio del día)"""
+    ultimo = CierreCaja.objects.filter(sucursal=sucursal).order_by('-hasta').values_list('hasta', flat=True).first()
+    if ultimo is not None:
+        return ultimo
+    return timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+
+
+def fin_turno():
+    """Hasta dónde llega un cierre hecho ahora; lo posterior aún puede tener ventas sin confirmar"""
+    return timezone.now() - timedelta(seconds=settings.CIERRE_CAJA_MARGEN_SEGUNDOS)
+
+
+def resumen_turno(sucursal, desde, hasta):
+    """Ventas por vendedor y tipo de pago en [desde, hasta), en una sola consulta agrupada"""
+    return list(
+        Venta.objects.filter(sucursal=sucursal, fecha__gte=desde, fecha__lt=hasta)
+        .values('vendedor_id', 'vendedor__username', 'tipo_pago')
+        .annotate(cantidad=Count('id'), total=Sum('total'))
+        .order_by('vendedor__username', 'tipo_pago')
+    )
+
+
+def cerrar_caja(sucursal, usuario):
+    """
+    Congela el turno abierto de la sucursal en un CierreCaja con sus líneas. Levanta ValueError si
+    otro cierre de la misma sucursal se registró al mismo tiempo.
+    """
+    hasta = fin_turno()
+    try:
+        with transaction.atomic():
+            desde = inicio_turno(sucursal)
+            if hasta <= desde:
+                raise ValueError(
+                    f'La caja de {sucursal.nombre} se cerró hace menos de '
+                    f'{settings.CIERRE_CAJA_MARGEN_SEGUNDOS} segundos. Espere un momento.'
+                )
+            filas = resumen_turno(sucursal, desde, hasta)
+            cierre = CierreCaja.objects.create(
+                sucursal=sucursal,
+                desde=desde,
+                hasta=hasta,
+                cerrado_por=usuario,
+                cantidad_ventas=sum(f['cantidad'] for f in filas),
+                total=sum((f['total'] for f in filas), Decimal('0')),
+            )
+            LineaCierreCaja.objects.bulk_create([
+                LineaCierreCaja(
+                    cierre=cierre, vendedor_id=f['vendedor_id'], tipo_pago=f['tipo_pago'],
+                    cantidad=f['cantidad'], total=f['total'],
+                )
+                for f in filas
+            ])
+    except IntegrityError:
+        raise ValueError(f'La caja de {sucursal.nombre} ya se cerró hace un momento. Recargue la página.')
+    return cierre
+
+
+def comparar_lineas(cierre, anterior):
+    """Líneas del cierre junto a las del cierre anterior de la sucursal, por vendedor y tipo de pago"""
+    def por_clave(c):
+        if c is None:
+            return {}
+        return {
+            (l.vendedor.username, l.tipo_pago): l
+            for l in c.lineas.select_related('vendedor')
+        }
+
+    actuales, previas = por_clave(cierre), por_clave(anterior)
+    filas = []
+    for clave in sorted(set(actuales) | set(previas)):
+        actual, previa = actuales.get(clave), previas.get(clave)
+        total = actual.total if actual else Decimal('0')
+        total_anterior = previa.total if previa else None
+        filas.append({
+            'vendedor': clave[0],
+            'tipo_pago': clave[1],
+            'cantidad': actual.cantidad if actual else 0,
+            'total': total,
+            'total_anterior': total_anterior,
+            'variacion': total - total_anterior if total_anterior is not None else None,
+        })
+    return filas
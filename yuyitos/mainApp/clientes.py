@@ -0,0 +1,63 @@
+import re
+import unicodedata
+
+from django.core.exceptions import ValidationError
+
+# Cuerpo de 7 u 8 dígitos seguido del dígito verificador (0-9 o K), ya sin puntos ni guion
+PATRON_RUT_NORMALIZADO = re.compile(r'^\d{7,8}[\dK]$')
+
+CLIENTES_POR_PAGINA = 24
+API_CLIENTES_POR_PAGINA = 20
+
+
+def normalizar_rut(rut):
+    """'12.345.678-k' -> '12345678K': sin puntos, guion, espacios ni ceros a la izquierda"""
+    return re.sub(r'[^0-9K]', '', (rut or '').upper()).lstrip('0')
+
+
+def digito_verificador(cuerpo):
+    """Dígito verificador módulo 11 del cuerpo numérico de un RUT"""
+    suma = 0
+    factor = 2
+    for digito in reversed(str(cuerpo)):
+        suma += int(digito) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - (suma % 11)
+    if resto == 11:
+        return '0'
+    if resto == 10:
+        return 'K'
+    return str(resto)
+
+
+def es_rut(texto):
+    """True si el texto tiene forma de RUT (sin validar el dígito verificador)"""
+    return bool(PATRON_RUT_NORMALIZADO.match(normalizar_rut(texto)))
+
+
+def validar_rut(rut):
+    """Levanta ValidationError si el RUT no tiene forma válida o su dígito verificador no cuadra"""
+    normalizado = normalizar_rut(rut)
+    if not PATRON_RUT_NORMALIZADO.match(normalizado):
+        raise ValidationError('RUT con formato inválido. Use el formato 12.345.678-9.')
+    if digito_verificador(normalizado[:-1]) != normalizado[-1]:
+        raise ValidationError('RUT inválido: el dígito verificador no corresponde.')
+
+
+def normalizar_nombre(texto):
+    """Minúsculas, sin tildes y con espacios simples, para búsqueda por prefijo"""
+    sin_tildes = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sin_tildes.lower().split())
+
+
+def buscar_clientes(queryset, texto):
+    """
+    Filtra por RUT exacto si el texto tiene forma de RUT, si no por prefijo del nombre.
+    Ambas búsquedas van contra columnas normalizadas e indexadas.
+    """
+    texto = (texto or '').strip()
+    if not texto:
+        return queryset
+    if es_rut(texto):
+        return queryset.filter(rut_normalizado=normalizar_rut(texto))
+    return queryset.filter(nombre_normalizado__startswith=normalizar_nombre(texto))
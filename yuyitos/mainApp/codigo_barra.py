@@ -0,0 +1,108 @@
+from django.core.cache import cache
+
+# Anchos (barra, espacio, barra, ...) de cada símbolo Code128, índices 0..106
+PATRONES_CODE128 = [
+    "212222", "222122", "222221", "121223", "121322", "131222", "122213", "122312",
+    "132212", "221213", "221312", "231212", "112232", "122132", "122231", "113222",
+    "123122", "123221", "223211", "221132", "221231", "213212", "223112", "312131",
+    "311222", "321122", "321221", "312212", "322112", "322211", "212123", "212321",
+    "232121", "111323", "131123", "131321", "112313", "132113", "132311", "211313",
+    "231113", "231311", "112133", "112331", "132131", "113123", "113321", "133121",
+    "313121", "211331", "231131", "213113", "213311", "213131", "311123", "311321",
+    "331121", "312113", "312311", "332111", "314111", "221411", "431111", "111224",
+    "111422", "121124", "121421", "141122", "141221", "112214", "112412", "122114",
+    "122411", "142112", "142211", "241211", "221114", "413111", "241112", "134111",
+    "111242", "121142", "121241", "114212", "124112", "124211", "411212", "421112",
+    "421211", "212141", "214121", "412121", "111143", "111341", "131141", "114113",
+    "114311", "411113", "411311", "113141", "114131", "311141", "411131", "211412",
+    "211214", "211232", "2331112",
+]
+
+START_B = 104
+START_C = 105
+CODE_B = 100
+CODE_C = 99
+STOP = 106
+
+CACHE_TIMEOUT_SVG = 60 * 60 * 24
+
+
+def codificar_code128(texto):
+    """
+    Devuelve la lista de símbolos Code128 (incluye inicio, checksum y término).
+    Usa el set C para los tramos numéricos (dos dígitos por símbolo) y el set B para el resto.
+    """
+    if not texto:
+        raise ValueError("No se puede codificar un texto vacío.")
+
+    for caracter in texto:
+        if not 32 <= ord(caracter) <= 126:
+            raise ValueError(f"Carácter no soportado en Code128: {caracter!r}")
+
+    simbolos = []
+    i = 0
+    set_actual = None
+
+    while i < len(texto):
+        # Largo del tramo numérico desde la posición actual
+        j = i
+        while j < len(texto) and texto[j].isdigit():
+            j += 1
+        digitos = j - i
+
+        # El set C conviene con al menos 4 dígitos (o 2 si el texto completo es numérico)
+        if digitos >= 4 or (digitos >= 2 and digitos == len(texto)):
+            pares = digitos - (digitos % 2)
+            if set_actual is None:
+                simbolos.append(START_C)
+            elif set_actual != 'C':
+                simbolos.append(CODE_C)
+            set_actual = 'C'
+            for k in range(i, i + pares, 2):
+                simbolos.append(int(texto[k:k + 2]))
+            i += pares
+            continue
+
+        if set_actual is None:
+            simbolos.append(START_B)
+        elif set_actual != 'B':
+            simbolos.append(CODE_B)
+        set_actual = 'B'
+        simbolos.append(ord(texto[i]) - 32)
+        i += 1
+
+    checksum = simbolos[0] + sum(pos * valor for pos, valor in enumerate(simbolos[1:], start=1))
+    simbolos.append(checksum % 103)
+    simbolos.append(STOP)
+    return simbolos
+
+
+def generar_svg_code128(texto, ancho_modulo=2, alto=80, margen=10):
+    """Genera el SVG de un código de barras Code128 para el texto dado"""
+    x = margen
+    rects = []
+    for simbolo in codificar_code128(texto):
+        for idx, ancho in enumerate(PATRONES_CODE128[simbolo]):
+            ancho = int(ancho) * ancho_modulo
+            # Los índices pares son barras, los impares espacios
+            if idx % 2 == 0:
+                rects.append(f'<rect x="{x}" y="0" width="{ancho}" height="{alto}"/>')
+            x += ancho
+
+    ancho_total = x + margen
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{ancho_total}" height="{alto}" '
+        f'viewBox="0 0 {ancho_total} {alto}" shape-rendering="crispEdges">'
+        f'<rect width="{ancho_total}" height="{alto}" fill="#ffffff"/>'
+        f'<g fill="#000000">{"".join(rects)}</g></svg>'
+    )
+
+
+def svg_codigo_barra(texto):
+    """SVG del código de barras, cacheado por código para no regenerarlo en cada etiqueta"""
+    clave = f"codigo_barra:svg:{texto}"
+    svg = cache.get(clave)
+    if svg is None:
+        svg = generar_svg_code128(texto)
+        cache.set(clave, svg, CACHE_TIMEOUT_SVG)
+    return svg
@@ -0,0 +1,244 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import (
+    Abono, Cliente, DetalleRecepcion, DetalleVenta, DetalleVentaArchivada,
+    PuntoConciliacion, StockSucursal, Venta, VentaArchivada
+)
+
+CERO = Decimal('0')
+
+
+def corte_actual():
+    """Hasta aquí los movimientos ya confirmaron; lo posterior se vuelve a mirar en la próxima corrida"""
+    return timezone.now() - timedelta(seconds=settings.CONCILIACION_MARGEN_SEGUNDOS)
+
+
+def tramos(queryset, campo, tamano):
+    """Rangos [desde, hasta) de valores de `campo` con a lo más `tamano` valores distintos cada uno"""
+    valores = list(queryset.order_by(campo).values_list(campo, flat=True).distinct())
+    return [
+        (valores[i], valores[min(i + tamano, len(valores)) - 1] + 1)
+        for i in range(0, len(valores), tamano)
+    ]
+
+
+@contextmanager
+def lectura_consistente():
+    """Saldos y movimientos leídos de la misma foto de la base, para no ver ventas a medias"""
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+def _puntos(tipo, ids, desde_cero):
+    if desde_cero:
+        return {}
+    return {
+        p.objeto_id: (p.base, p.corte)
+        for p in PuntoConciliacion.objects.filter(tipo=tipo, objeto_id__in=ids)
+    }
+
+
+def _guardar_puntos(tipo, bases, corte):
+    PuntoConciliacion.objects.bulk_create(
+        [PuntoConciliacion(tipo=tipo, objeto_id=objeto_id, base=base, corte=corte) for objeto_id, base in bases.items()],
+        update_conflicts=True,
+        unique_fields=['tipo', 'objeto_id'],
+        update_fields=['base', 'corte'],
+        batch_size=500,
+    )
+
+
+def descartar_puntos(tipo, ids):
+    """
+    Olvida el punto de conciliación de estos objetos: la próxima corrida toma su valor actual
+    como base. Hace falta al cargar movimientos con fechas anteriores al corte ya guardado.
+    """
+    ids = list(ids)
+    for i in range(0, len(ids), 500):
+        PuntoConciliacion.objects.filter(tipo=tipo, objeto_id__in=ids[i:i + 500]).delete()
+
+
+def _inicializar(puntos, objeto_id, desde_cero):
+    """
+    Sin punto previo (primera corrida, objeto nuevo o punto descartado) no hay saldo inicial
+    con qué comparar: el valor registrado se toma como base sin informarlo como diferencia.
+    Con --desde-cero se recorre toda la historia e informa todo.
+    """
+    return not desde_cero and objeto_id not in puntos
+
+
+def _primer_corte(puntos, ids, corte, desde_cero):
+    """Desde dónde leer movimientos para el tramo (None = toda la historia)"""
+    if desde_cero or not ids:
+        return None
+    cortes = [c for _, c in puntos.values()]
+    if any(objeto_id not in puntos for objeto_id in ids):
+        # Los que se inicializan solo necesitan lo posterior al corte de esta corrida
+        cortes.append(corte)
+    return min(cortes)
+
+
+def _diferencia(tipo, objeto_id, descripcion, registrado, esperado, desde):
+    return {
+        'tipo': tipo,
+        'id': objeto_id,
+        'descripcion': descripcion,
+        'registrado': registrado,
+        'esperado': esperado,
+        'diferencia': registrado - esperado,
+        'desde': desde.isoformat() if desde else '',
+    }
+
+
+# -----------------------------
+# DEUDA DE CLIENTES
+# -----------------------------
+def _reproducir(saldo, movimientos):
+    for _, monto in movimientos:
+        saldo += monto
+        # Abono.save deja la deuda en cero cuando el abono la cubre: nunca queda negativa
+        if monto < 0 and saldo <= 0:
+            saldo = CERO
+    return saldo
+
+
+def conciliar_deudas(desde, hasta, corte, desde_cero=False):
+    """
+    Recalcula la deuda de los clientes con id en [desde, hasta) desde su último punto de
+    conciliación: ventas a crédito (activas y archivadas) suman y los abonos restan.
+    """
+    with lectura_consistente():
+        clientes = list(
+            Cliente.objects.filter(id__gte=desde, id__lt=hasta).values('id', 'nombre', 'apellido', 'deuda_actual')
+        )
+        ids = [c['id'] for c in clientes]
+        puntos = _puntos('deuda', ids, desde_cero)
+
+        rango = Q(cliente_id__gte=desde, cliente_id__lt=hasta)
+        inicio = _primer_corte(puntos, ids, corte, desde_cero)
+        if inicio is not None:
+            rango &= Q(fecha__gt=inicio)
+
+        movimientos = defaultdict(list)
+        for modelo in (Venta, VentaArchivada):
+            for cliente_id, fecha, total in modelo.objects.filter(rango, tipo_pago='credito').values_list('cliente_id', 'fecha', 'total'):
+                movimientos[cliente_id].append((fecha, total))
+        for cliente_id, fecha, monto in Abono.objects.filter(rango).values_list('cliente_id', 'fecha', 'monto'):
+            movimientos[cliente_id].append((fecha, -monto))
+
+        diferencias, bases, inicializados = [], {}, 0
+        for cliente in clientes:
+            registrado = cliente['deuda_actual']
+            if _inicializar(puntos, cliente['id'], desde_cero):
+                posteriores = [monto for fecha, monto in movimientos[cliente['id']] if fecha > corte]
+                bases[cliente['id']] = max(registrado - sum(posteriores), CERO)
+                inicializados += 1
+                continue
+
+            base, previo = puntos.get(cliente['id'], (CERO, None))
+            propios = sorted(m for m in movimientos[cliente['id']] if previo is None or m[0] > previo)
+            hasta_corte = [m for m in propios if m[0] <= corte]
+            posteriores = [m for m in propios if m[0] > corte]
+
+            saldo_corte = _reproducir(base, hasta_corte)
+            esperado = _reproducir(saldo_corte, posteriores)
+            if registrado == esperado:
+                bases[cliente['id']] = saldo_corte
+            else:
+                diferencias.append(_diferencia(
+                    'deuda', cliente['id'], f"{cliente['nombre']} {cliente['apellido']}".strip(),
+                    registrado, esperado, previo,
+                ))
+                # Se acepta el valor registrado (p. ej. un ajuste en el admin) como nueva base
+                bases[cliente['id']] = max(registrado - sum(monto for _, monto in posteriores), CERO)
+
+    # Se escribe fuera de la transacción de lectura: en SQLite dos procesos que leen y luego
+    # quieren escribir en la misma transacción se bloquean mutuamente
+    _guardar_puntos('deuda', bases, corte)
+    return {'revisados': len(clientes), 'diferencias': diferencias, 'inicializados': inicializados}
+
+
+# -----------------------------
+# STOCK POR SUCURSAL
+# -----------------------------
+FUENTES_STOCK = [
+    # (modelo, sucursal, fecha, cantidad, signo)
+    (DetalleRecepcion, 'recepcion__sucursal_id', 'recepcion__fecha_recepcion', 'cantidad_recibida', 1),
+    (DetalleVenta, 'venta__sucursal_id', 'venta__fecha', 'cantidad', -1),
+    (DetalleVentaArchivada, 'venta__sucursal_id', 'venta__fecha', 'cantidad', -1),
+]
+
+
+def _movimientos_stock(desde, hasta, previo, corte):
+    """
+    {(sucursal_id, producto_id): (neto desde `previo`, neto desde `corte`)} para los productos
+    con id en [desde, hasta), con un GROUP BY por fuente de movimientos.
+    """
+    netos = defaultdict(lambda: [0, 0])
+    for modelo, sucursal, fecha, cantidad, signo in FUENTES_STOCK:
+        filtro = Q(producto_id__gte=desde, producto_id__lt=hasta)
+        if previo is not None:
+            filtro &= Q(**{f'{fecha}__gt': min(previo, corte)})
+        filas = modelo.objects.filter(filtro).values(sucursal, 'producto_id').annotate(
+            desde_previo=Sum(cantidad, filter=Q(**{f'{fecha}__gt': previo}) if previo else None),
+            desde_corte=Sum(cantidad, filter=Q(**{f'{fecha}__gt': corte})),
+        ).order_by()
+        for fila in filas:
+            neto = netos[(fila[sucursal], fila['producto_id'])]
+            neto[0] += signo * (fila['desde_previo'] or 0)
+            neto[1] += signo * (fila['desde_corte'] or 0)
+    return netos
+
+
+def conciliar_stock(desde, hasta, corte, desde_cero=False):
+    """
+    Recalcula el stock por sucursal de los productos con id en [desde, hasta) desde su último
+    punto de conciliación: las recepciones suman y las ventas (activas y archivadas) restan.
+    """
+    with lectura_consistente():
+        filas = list(
+            StockSucursal.objects.filter(producto_id__gte=desde, producto_id__lt=hasta)
+            .values('id', 'sucursal_id', 'producto_id', 'stock', 'producto__nombre', 'sucursal__nombre')
+        )
+        puntos = _puntos('stock', [f['id'] for f in filas], desde_cero)
+
+        # Normalmente todo el tramo comparte el corte de la corrida anterior: una consulta por fuente
+        por_previo = {}
+        for fila in filas:
+            previo = corte if _inicializar(puntos, fila['id'], desde_cero) else puntos.get(fila['id'], (None, None))[1]
+            if previo not in por_previo:
+                por_previo[previo] = _movimientos_stock(desde, hasta, previo, corte)
+
+        diferencias, bases, inicializados = [], {}, 0
+        for fila in filas:
+            registrado = fila['stock']
+            if _inicializar(puntos, fila['id'], desde_cero):
+                desde_corte = por_previo[corte].get((fila['sucursal_id'], fila['producto_id']), (0, 0))[1]
+                bases[fila['id']] = registrado - desde_corte
+                inicializados += 1
+                continue
+
+            base, previo = puntos.get(fila['id'], (CERO, None))
+            desde_previo, desde_corte = por_previo[previo].get((fila['sucursal_id'], fila['producto_id']), (0, 0))
+            esperado = int(base) + desde_previo
+            if registrado != esperado:
+                diferencias.append(_diferencia(
+                    'stock', fila['id'], f"{fila['producto__nombre']} en {fila['sucursal__nombre']}",
+                    registrado, esperado, previo,
+                ))
+            # El stock es lineal en los movimientos: la base al corte sale del valor registrado
+            bases[fila['id']] = registrado - desde_corte
+
+    _guardar_puntos('stock', bases, corte)
+    return {'revisados': len(filas), 'diferencias': diferencias, 'inicializados': inicializados}
@@ -0,0 +1,270 @@
+import contextvars
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Vista y rol del request en curso (los comandos y el outbox quedan sin vista)
+_contexto = contextvars.ContextVar('contexto_consulta', default=None)
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+
+# Normalización de SQL para agrupar consultas que solo difieren en valores
+_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_MARCADOR = re.compile(r'%s|\?')
+_LISTA = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ESPACIOS = re.compile(r'\s+')
+
+
+def huella(sql):
+    """SQL sin valores: literales y parámetros como ?, listas IN colapsadas a (...)"""
+    sql = _LITERAL_TEXTO.sub('?', sql)
+    sql = _NUMERO.sub('?', sql)
+    sql = _MARCADOR.sub('?', sql)
+    sql = _LISTA.sub('(...)', sql)
+    return _ESPACIOS.sub(' ', sql).strip()
+
+
+def forma_parametros(params, many):
+    """Cantidad y tipos de los parámetros, nunca los valores"""
+    if many:
+        filas = list(params or [])
+        return f"{len(filas)} filas × {len(filas[0]) if filas else 0} parámetros"
+    if not params:
+        return 'sin parámetros'
+    valores = params.values() if isinstance(params, dict) else params
+    tipos = sorted({type(v).__name__ for v in valores})
+    return f"{len(params)} parámetros ({', '.join(tipos)})"
+
+
+def origen():
+    """Primer marco de mainApp (desde el más interno) que originó la consulta"""
+    for marco in reversed(traceback.extract_stack()):
+        if marco.filename.startswith(DIRECTORIO_APP) and marco.filename != __file__:
+            return f"{os.path.relpath(marco.filename, DIRECTORIO_APP)}:{marco.lineno} en {marco.name}"
+    return ''
+
+
+# -----------------------------
+# REGISTRO EN MEMORIA
+# -----------------------------
+class Registro:
+    """Las consultas lentas del proceso agrupadas por huella; conserva las N de más tiempo total"""
+
+    def __init__(self):
+        self.entradas = {}
+        self.lock = threading.Lock()
+        self.ultima_instantanea = 0
+        self.cambios = False
+
+    def agregar(self, sql, duracion_ms, params, many):
+        clave = huella(sql)
+        contexto = _contexto.get() or {}
+        vista = contexto.get('vista') or '(sin vista)'
+        rol = contexto.get('rol') or '-'
+        ahora = timezone.now().isoformat()
+        lugar = origen()
+
+        with self.lock:
+            entrada = self.entradas.get(clave)
+            if entrada is None:
+                # Se hace espacio antes de insertar: si no, la huella nueva (con el menor total)
+                # sería siempre la descartada y el registro nunca cambiaría al llenarse
+                if len(self.entradas) >= settings.CONSULTAS_LENTAS_MAXIMO:
+                    menor = min(self.entradas.values(), key=lambda e: e['total_ms'])
+                    del self.entradas[menor['huella']]
+                entrada = self.entradas[clave] = {
+                    'huella': clave, 'veces': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'vistas': {}, 'roles': {}, 'origenes': {},
+                }
+            entrada['veces'] += 1
+            entrada['total_ms'] += duracion_ms
+            if duracion_ms >= entrada['max_ms']:
+                # Se guarda la forma de los parámetros del peor caso
+                entrada['max_ms'] = duracion_ms
+                entrada['parametros'] = forma_parametros(params, many)
+            entrada['ultima'] = ahora
+            for campo, valor in (('vistas', vista), ('roles', rol), ('origenes', lugar)):
+                entrada[campo][valor] = entrada[campo].get(valor, 0) + 1
+            self.cambios = True
+
+        logger.warning("Consulta lenta (%.0f ms) en %s: %s", duracion_ms, vista, clave[:300])
+        self.guardar_instantanea()
+
+    def top(self, limite=None):
+        with self.lock:
+            entradas = [
+                {**e, 'vistas': dict(e['vistas']), 'roles': dict(e['roles']), 'origenes': dict(e['origenes'])}
+                for e in self.entradas.values()
+            ]
+        return ordenar(entradas)[:limite]
+
+    def guardar_instantanea(self, forzar=False):
+        """
+        Escribe el registro del proceso a un JSON propio (un archivo por proceso), a lo más
+        cada CONSULTAS_LENTAS_INSTANTANEA_SEGUNDOS, para que el comando y la vista lo lean.
+        """
+        ahora = time.monotonic()
+        with self.lock:
+            if not self.cambios or (
+                not forzar and ahora - self.ultima_instantanea < settings.CONSULTAS_LENTAS_INSTANTANEA_SEGUNDOS
+            ):
+                return
+            self.ultima_instantanea = ahora
+            self.cambios = False
+
+        ruta = os.path.join(settings.CONSULTAS_LENTAS_DIRECTORIO, f'{os.getpid()}.json')
+        temporal = f'{ruta}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(settings.CONSULTAS_LENTAS_DIRECTORIO, exist_ok=True)
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump({'pid': os.getpid(), 'fecha': timezone.now().isoformat(), 'consultas': self.top()},
+                          f, ensure_ascii=False)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            logger.warning("No se pudo guardar la instantánea de consultas lentas: %s", e)
+
+    def limpiar(self):
+        with self.lock:
+            self.entradas.clear()
+            self.cambios = False
+
+
+registro = Registro()
+
+
+def ordenar(entradas):
+    return sorted(entradas, key=lambda e: e['total_ms'], reverse=True)
+
+
+def registrar_consulta(execute, sql, params, many, context):
+    """execute_wrapper instalado en cada conexión: mide y registra lo que pase el umbral"""
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        if duracion_ms >= settings.CONSULTAS_LENTAS_MS:
+            registro.agregar(sql, duracion_ms, params, many)
+
+
+def instalar(sender, connection, **kwargs):
+    if registrar_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(registrar_consulta)
+
+
+connection_created.connect(instalar, dispatch_uid='consultas_lentas')
+
+
+# -----------------------------
+# CONTEXTO DEL REQUEST
+# -----------------------------
+def iniciar_request(request):
+    rol = 'anónimo'
+    if request.user.is_authenticated:
+        rol = 'admin' if request.user.is_superuser else 'vendedor'
+    return _contexto.set({'vista': None, 'rol': rol})
+
+
+def fijar_vista(nombre):
+    contexto = _contexto.get()
+    if contexto is not None:
+        contexto['vista'] = nombre
+
+
+def terminar_request(token):
+    _contexto.reset(token)
+
+
+# -----------------------------
+# LECTURA DE INSTANTÁNEAS
+# -----------------------------
+def proceso_terminado(ruta):
+    """
+    True si la instantánea es de un proceso que ya no existe. En Windows os.kill terminaría el
+    proceso, así que ahí se usa la antigüedad del archivo.
+    """
+    try:
+        pid = int(os.path.splitext(os.path.basename(ruta))[0])
+    except ValueError:
+        return False
+    if pid == os.getpid():
+        return False
+    if os.name != 'posix':
+        try:
+            return time.time() - os.path.getmtime(ruta) > settings.CONSULTAS_LENTAS_VIGENCIA_SEGUNDOS
+        except OSError:
+            return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        # Existe, pero es de otro usuario
+        return False
+    return False
+
+
+def instantaneas():
+    """Rutas de las instantáneas vigentes; las de procesos terminados se borran al pasar"""
+    rutas = []
+    for ruta in glob.glob(os.path.join(settings.CONSULTAS_LENTAS_DIRECTORIO, '*.json')):
+        if proceso_terminado(ruta):
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+            continue
+        rutas.append(ruta)
+    return rutas
+
+
+def consultas_de_todos_los_procesos(limite=None):
+    """Une las instantáneas de los procesos vivos (y el registro de este) por huella"""
+    registro.guardar_instantanea(forzar=True)
+
+    unidas = {}
+    for ruta in instantaneas():
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                consultas = json.load(f)['consultas']
+        except (OSError, ValueError, KeyError):
+            continue
+        for consulta in consultas:
+            actual = unidas.get(consulta['huella'])
+            if actual is None:
+                unidas[consulta['huella']] = consulta
+                continue
+            actual['veces'] += consulta['veces']
+            actual['total_ms'] += consulta['total_ms']
+            if consulta['max_ms'] > actual['max_ms']:
+                actual['max_ms'] = consulta['max_ms']
+                actual['parametros'] = consulta['parametros']
+            actual['ultima'] = max(actual['ultima'], consulta['ultima'])
+            for campo in ('vistas', 'roles', 'origenes'):
+                for valor, veces in consulta[campo].items():
+                    actual[campo][valor] = actual[campo].get(valor, 0) + veces
+
+    for consulta in unidas.values():
+        consulta['promedio_ms'] = consulta['total_ms'] / consulta['veces']
+    return ordenar(unidas.values())[:limite]
+
+
+def borrar_instantaneas():
+    registro.limpiar()
+    for ruta in glob.glob(os.path.join(settings.CONSULTAS_LENTAS_DIRECTORIO, '*.json')):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import threading
+import weakref
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .models import Sucursal
+from .sucursales import productos_con_stock
+
+# Marca de "cambió todo el stock de la sucursal" (UPDATE masivos sin lista de productos)
+TODOS = None
+
+
+class Suscripcion:
+    """
+    Cambios pendientes de enviar a una caja. Los eventos que llegan mientras la caja espera la
+    ventana de agrupación se funden: de una ráfaga de ventas sale un solo mensaje.
+    """
+
+    def __init__(self, sucursal_id):
+        self.sucursal_id = sucursal_id
+        self.loop = asyncio.get_running_loop()
+        self.aviso = asyncio.Event()
+        self.stock, self.precios = set(), set()
+
+    def recibir(self, evento):
+        # Se llama desde cualquier hilo; los cambios se anotan en el loop de la suscripción
+        self.loop.call_soon_threadsafe(self._anotar, evento)
+
+    def _anotar(self, evento):
+        if evento['tipo'] == 'stock':
+            if evento['sucursal_id'] != self.sucursal_id:
+                return
+            if evento['productos'] is TODOS or self.stock is TODOS:
+                self.stock = TODOS
+            else:
+                self.stock.update(evento['productos'])
+        else:
+            self.precios.update(evento['productos'])
+        self.aviso.set()
+
+    async def siguiente(self, ventana, latido):
+        """Espera cambios y devuelve (stock, precios) ya agrupados, o None si pasó `latido` sin novedades"""
+        try:
+            await asyncio.wait_for(self.aviso.wait(), latido)
+        except asyncio.TimeoutError:
+            return None
+        await asyncio.sleep(ventana)
+        cambios = (self.stock, self.precios)
+        self.stock, self.precios = set(), set()
+        self.aviso.clear()
+        return cambios
+
+
+class DifusorLocal:
+    """
+    Reparte los eventos entre las cajas conectadas a este proceso. Sirve con un solo proceso
+    ASGI; con varios, EVENTOS_DIFUSOR apunta a una subclase que publique en un pub/sub y llame a
+    `repartir` con lo que reciba.
+    """
+
+    def __init__(self):
+        # Referencias débiles: si una conexión se corta sin pasar por `cancelar`, su suscripción
+        # desaparece con el flujo
+        self.suscripciones = weakref.WeakSet()
+        self.lock = threading.Lock()
+
+    def suscribir(self, sucursal_id):
+        suscripcion = Suscripcion(sucursal_id)
+        with self.lock:
+            self.suscripciones.add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self.lock:
+            self.suscripciones.discard(suscripcion)
+
+    def publicar(self, evento):
+        self.repartir(evento)
+
+    def repartir(self, evento):
+        with self.lock:
+            suscripciones = list(self.suscripciones)
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.recibir(evento)
+            except RuntimeError:
+                # Loop ya cerrado: la conexión terminó sin cancelar
+                self.cancelar(suscripcion)
+
+
+@lru_cache(maxsize=None)
+def difusor():
+    return import_string(settings.EVENTOS_DIFUSOR)()
+
+
+def stock_cambiado(sucursal_id, productos=TODOS):
+    difusor().publicar({
+        'tipo': 'stock',
+        'sucursal_id': sucursal_id,
+        'productos': TODOS if productos is TODOS else [int(p) for p in productos],
+    })
+
+
+def precios_cambiados(productos):
+    difusor().publicar({'tipo': 'precio', 'productos': [int(p) for p in productos]})
+
+
+# -----------------------------
+# FLUJO SSE DE UNA CAJA
+# -----------------------------
+def cambios_para_caja(sucursal_id, stock, precios):
+    """Precio y stock actuales de los productos cambiados; los que ya no existen van en `eliminados`"""
+    productos = productos_con_stock(Sucursal(pk=sucursal_id))
+    if stock is not TODOS:
+        productos = productos.filter(pk__in=stock | precios)
+    filas = list(productos.values('id', 'nombre', 'precio', 'stock'))
+    encontrados = {fila['id'] for fila in filas}
+    for fila in filas:
+        fila['precio'] = str(fila['precio'])
+    return {
+        'productos': filas,
+        'eliminados': sorted((precios | (stock or set())) - encontrados),
+    }
+
+
+async def flujo(sucursal_id):
+    """Mensajes SSE para una caja: un evento `stock` por ráfaga de cambios y latidos entre medio"""
+    suscripcion = difusor().suscribir(sucursal_id)
+    try:
+        yield f"retry: {settings.EVENTOS_REINTENTO_MS}\n\n"
+        while True:
+            cambios = await suscripcion.siguiente(settings.EVENTOS_VENTANA_SEGUNDOS, settings.EVENTOS_LATIDO_SEGUNDOS)
+            if cambios is None:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ": latido\n\n"
+                continue
+            datos = await sync_to_async(cambios_para_caja)(sucursal_id, *cambios)
+            yield f"event: stock\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+    finally:
+        difusor().cancelar(suscripcion)
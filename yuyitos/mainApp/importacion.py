@@ -0,0 +1,406 @@
+import csv
+import hashlib
+import json
+import os
+import zlib
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Max, Min, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .catalogo import invalidar_stock
+from .clientes import normalizar_rut
+from .conciliacion import descartar_puntos
+from .models import (
+    Cliente, DetalleVenta, LoteImportacion, Producto, StockSucursal, Sucursal, Venta, VentaArchivada
+)
+
+# Una fila por línea de boleta; los datos de la venta se repiten en cada línea
+COLUMNAS = ['boleta', 'fecha', 'rut', 'vendedor', 'sucursal', 'tipo_pago', 'codigo', 'cantidad', 'precio_unitario']
+# Opcionales: estado_credito (PENDIENTE por defecto) y costo_unitario (por defecto el precio de compra actual)
+
+TAMANO_CONSULTA = 500
+
+
+def trozos(lista, tamano):
+    for i in range(0, len(lista), tamano):
+        yield lista[i:i + tamano]
+
+
+def normalizar_boleta(texto):
+    texto = str(texto or '').strip()
+    return texto.zfill(10) if texto.isdigit() else texto
+
+
+# -----------------------------
+# LECTURA Y PARTICIÓN
+# -----------------------------
+def huella_archivo(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def leer_lineas(ruta):
+    """(número de línea, fila) de un CSV (coma o punto y coma) o de un archivo JSON por línea, en streaming"""
+    if os.path.splitext(ruta)[1].lower() in ('.jsonl', '.ndjson', '.json'):
+        with open(ruta, encoding='utf-8-sig') as f:
+            for numero, linea in enumerate(f, start=1):
+                if linea.strip():
+                    try:
+                        yield numero, json.loads(linea)
+                    except ValueError:
+                        raise ValueError(f'Línea {numero}: JSON inválido.')
+        return
+
+    with open(ruta, encoding='utf-8-sig', newline='') as f:
+        try:
+            dialecto = csv.Sniffer().sniff(f.read(4096), delimiters=',;')
+        except csv.Error:
+            dialecto = csv.excel
+        f.seek(0)
+        lector = csv.reader(f, dialect=dialecto)
+        columnas = [c.strip().lower() for c in next(lector, [])]
+        faltantes = [c for c in COLUMNAS if c not in columnas]
+        if faltantes:
+            raise ValueError(f'Faltan columnas en el CSV: {", ".join(faltantes)}.')
+        for numero, valores in enumerate(lector, start=2):
+            if any(valores):
+                yield numero, dict(zip(columnas, valores))
+
+
+def particionar(ruta, destino, particiones):
+    """
+    Reparte las líneas en `particiones` archivos según un hash estable de la boleta: todas las
+    líneas de una venta caen en la misma partición, aunque en el origen vengan desordenadas.
+    """
+    os.makedirs(destino, exist_ok=True)
+    archivos = [open(os.path.join(destino, f'{i:03d}.jsonl'), 'w', encoding='utf-8') for i in range(particiones)]
+    lineas = 0
+    try:
+        for numero, fila in leer_lineas(ruta):
+            boleta = normalizar_boleta(fila.get('boleta'))
+            archivos[zlib.crc32(boleta.encode()) % particiones].write(json.dumps([numero, fila], ensure_ascii=False) + '\n')
+            lineas += 1
+    finally:
+        for archivo in archivos:
+            archivo.close()
+    # El marcador indica que las particiones están completas y se pueden reutilizar al reanudar
+    with open(os.path.join(destino, 'completo'), 'w') as f:
+        f.write(str(lineas))
+    return lineas
+
+
+def preparar(ruta, particiones, tamano):
+    """Devuelve (id de importación, directorio de particiones, líneas), partiendo el archivo si hace falta"""
+    importacion = hashlib.sha256(f'{huella_archivo(ruta)}:{particiones}:{tamano}'.encode()).hexdigest()
+    destino = os.path.join(settings.IMPORTACION_DIRECTORIO, importacion)
+    marcador = os.path.join(destino, 'completo')
+    if os.path.exists(marcador):
+        with open(marcador) as f:
+            return importacion, destino, int(f.read() or 0)
+    return importacion, destino, particionar(ruta, destino, particiones)
+
+
+# -----------------------------
+# VALIDACIÓN Y TRANSFORMACIÓN
+# -----------------------------
+class Referencias:
+    """Ids de clientes, vendedores, sucursales y productos que usa una partición, leídos una vez"""
+
+    def __init__(self, filas):
+        ruts = {normalizar_rut(f.get('rut')) for f in filas}
+        codigos = {str(f.get('codigo') or '').strip() for f in filas}
+        self.clientes, self.productos = {}, {}
+        for tramo in trozos(sorted(ruts), TAMANO_CONSULTA):
+            self.clientes.update(Cliente.objects.filter(rut_normalizado__in=tramo).values_list('rut_normalizado', 'id'))
+        for tramo in trozos(sorted(codigos), TAMANO_CONSULTA):
+            self.productos.update(
+                (codigo, (id, costo))
+                for codigo, id, costo in Producto.objects.filter(codigo__in=tramo).values_list('codigo', 'id', 'precio_compra')
+            )
+        self.vendedores = dict(User.objects.values_list('username', 'id'))
+        self.sucursales = dict(Sucursal.objects.values_list('codigo', 'id'))
+
+
+def leer_fecha(texto):
+    texto = str(texto or '').strip()
+    fecha = parse_datetime(texto)
+    if fecha is None:
+        dia = parse_date(texto)
+        if dia is None:
+            raise ValueError(f'fecha inválida "{texto}"')
+        fecha = datetime.combine(dia, time.min)
+    return fecha if timezone.is_aware(fecha) else timezone.make_aware(fecha)
+
+
+def leer_decimal(texto, campo):
+    try:
+        valor = Decimal(str(texto).strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f'{campo} inválido "{texto}"')
+    if not valor.is_finite() or valor < 0:
+        raise ValueError(f'{campo} inválido "{texto}"')
+    return valor
+
+
+def transformar(boleta, lineas, referencias):
+    """Venta y detalles (sin guardar) de una boleta; levanta ValueError con el motivo si no es válida"""
+    if not boleta.isdigit() or len(boleta) > 10:
+        raise ValueError('número de boleta inválido')
+    numero, cabecera = lineas[0]
+
+    cliente_id = referencias.clientes.get(normalizar_rut(cabecera.get('rut')))
+    if cliente_id is None:
+        raise ValueError(f'línea {numero}: no existe el cliente con RUT {cabecera.get("rut")}')
+    vendedor_id = referencias.vendedores.get(str(cabecera.get('vendedor') or '').strip())
+    if vendedor_id is None:
+        raise ValueError(f'línea {numero}: no existe el vendedor {cabecera.get("vendedor")}')
+    sucursal_id = referencias.sucursales.get(str(cabecera.get('sucursal') or '').strip().zfill(3))
+    if sucursal_id is None:
+        raise ValueError(f'línea {numero}: no existe la sucursal {cabecera.get("sucursal")}')
+    tipo_pago = str(cabecera.get('tipo_pago') or '').strip().lower()
+    if tipo_pago not in dict(Venta.TIPO_PAGO_CHOICES):
+        raise ValueError(f'línea {numero}: tipo de pago inválido "{cabecera.get("tipo_pago")}"')
+    estado_credito = str(cabecera.get('estado_credito') or 'PENDIENTE').strip().upper()
+    if estado_credito not in ('PENDIENTE', 'CANCELADA'):
+        raise ValueError(f'línea {numero}: estado de crédito inválido "{cabecera.get("estado_credito")}"')
+    try:
+        fecha = leer_fecha(cabecera.get('fecha'))
+    except ValueError as e:
+        raise ValueError(f'línea {numero}: {e}')
+
+    detalles = []
+    for numero, fila in lineas:
+        codigo = str(fila.get('codigo') or '').strip()
+        if codigo not in referencias.productos:
+            raise ValueError(f'línea {numero}: no existe el producto {codigo}')
+        producto_id, costo_actual = referencias.productos[codigo]
+        try:
+            cantidad = int(str(fila.get('cantidad')).strip())
+            if cantidad <= 0:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f'línea {numero}: cantidad inválida "{fila.get("cantidad")}"')
+        try:
+            precio = leer_decimal(fila.get('precio_unitario'), 'precio')
+            costo = leer_decimal(fila['costo_unitario'], 'costo') if fila.get('costo_unitario') not in (None, '') else costo_actual
+        except ValueError as e:
+            raise ValueError(f'línea {numero}: {e}')
+        detalles.append(DetalleVenta(
+            producto_id=producto_id,
+            cantidad=cantidad,
+            precio_unitario=precio,
+            costo_unitario=costo,
+            subtotal=cantidad * precio,
+        ))
+
+    venta = Venta(
+        numero_boleta=boleta,
+        cliente_id=cliente_id,
+        vendedor_id=vendedor_id,
+        sucursal_id=sucursal_id,
+        tipo_pago=tipo_pago,
+        total=sum((d.subtotal for d in detalles), Decimal('0')),
+        fecha=fecha,
+        estado_credito=estado_credito,
+    )
+    return venta, detalles
+
+
+# -----------------------------
+# CARGA POR LOTES
+# -----------------------------
+def guardar_lote(importacion, particion, lote, ventas):
+    """Inserta un lote de (venta, detalles) y su registro de avance en una sola transacción"""
+    stock, deuda, clientes = defaultdict(int), defaultdict(Decimal), set()
+    for venta, detalles in ventas:
+        for detalle in detalles:
+            stock[f'{venta.sucursal_id}:{detalle.producto_id}'] += detalle.cantidad
+        if venta.tipo_pago == 'credito':
+            # Toda venta a crédito entra en la conciliación de deuda del cliente, pagada o no
+            clientes.add(venta.cliente_id)
+            if venta.estado_credito == 'PENDIENTE':
+                deuda[str(venta.cliente_id)] += venta.total
+
+    with transaction.atomic():
+        Venta.objects.bulk_create([v for v, _ in ventas], batch_size=TAMANO_CONSULTA)
+        if ventas and ventas[0][0].pk is None:
+            # Motores que no devuelven las claves de un INSERT masivo
+            ids = dict(
+                Venta.objects.filter(numero_boleta__in=[v.numero_boleta for v, _ in ventas]).values_list('numero_boleta', 'id')
+            )
+            for venta, _ in ventas:
+                venta.pk = ids[venta.numero_boleta]
+        for venta, detalles in ventas:
+            for detalle in detalles:
+                detalle.venta_id = venta.pk
+        DetalleVenta.objects.bulk_create([d for _, detalles in ventas for d in detalles], batch_size=1000)
+
+        fechas = [v.fecha for v, _ in ventas]
+        LoteImportacion.objects.create(
+            importacion=importacion,
+            particion=particion,
+            lote=lote,
+            ventas=len(ventas),
+            lineas=sum(len(d) for _, d in ventas),
+            desde=min(fechas, default=None),
+            hasta=max(fechas, default=None),
+            ajustes={'stock': stock, 'deuda': {c: str(m) for c, m in deuda.items()}, 'clientes': sorted(clientes)},
+        )
+
+
+def importar_particion(importacion, ruta, particion, tamano):
+    """
+    Valida e inserta las ventas de una partición en lotes de `tamano` boletas. Los lotes ya
+    registrados se saltan y las boletas ya cargadas (mismo número, fecha, cliente y total) se
+    omiten, así que se puede reanudar. Un número que ya usa otra venta se informa como error.
+    """
+    por_boleta = defaultdict(list)
+    with open(ruta, encoding='utf-8') as f:
+        for linea in f:
+            numero, fila = json.loads(linea)
+            por_boleta[normalizar_boleta(fila.get('boleta'))].append((numero, fila))
+    boletas = sorted(por_boleta)
+
+    hechos = set(
+        LoteImportacion.objects.filter(importacion=importacion, particion=particion).values_list('lote', flat=True)
+    )
+    pendientes = [
+        (lote, boletas[inicio:inicio + tamano])
+        for lote, inicio in enumerate(range(0, len(boletas), tamano))
+        if lote not in hechos
+    ]
+    resultado = {'ventas': 0, 'lineas': 0, 'omitidas': 0, 'lotes': 0, 'saltados': len(hechos), 'errores': []}
+    if not pendientes:
+        return resultado
+
+    referencias = Referencias([fila for _, grupo in pendientes for b in grupo for _, fila in por_boleta[b]])
+    for lote, grupo in pendientes:
+        existentes = {}
+        for modelo in (Venta, VentaArchivada):
+            existentes.update(
+                (numero, (fecha, cliente_id, total))
+                for numero, fecha, cliente_id, total in modelo.objects.filter(numero_boleta__in=grupo)
+                .values_list('numero_boleta', 'fecha', 'cliente_id', 'total')
+            )
+
+        ventas = []
+        for boleta in grupo:
+            try:
+                venta, detalles = transformar(boleta, por_boleta[boleta], referencias)
+            except ValueError as e:
+                resultado['errores'].append({'particion': particion, 'boleta': boleta, 'error': str(e)})
+                continue
+            previa = existentes.get(boleta)
+            if previa is None:
+                ventas.append((venta, detalles))
+            elif previa == (venta.fecha, venta.cliente_id, venta.total):
+                # Ya la cargó una corrida anterior (de esta u otra importación del mismo historial)
+                resultado['omitidas'] += 1
+            else:
+                fecha, cliente_id, total = previa
+                resultado['errores'].append({
+                    'particion': particion, 'boleta': boleta,
+                    'error': f'el número ya lo usa otra venta (del {timezone.localtime(fecha):%d/%m/%Y %H:%M}, '
+                             f'cliente #{cliente_id}, total ${total})',
+                })
+
+        try:
+            guardar_lote(importacion, particion, lote, ventas)
+        except IntegrityError as e:
+            # Otra venta tomó uno de los números entre la revisión y el INSERT: el lote queda
+            # sin registrar y en la próxima corrida ese número se informa como choque
+            resultado['errores'].append({'particion': particion, 'boleta': '', 'error': f'lote {lote} no se cargó: {e}'})
+            continue
+        resultado['ventas'] += len(ventas)
+        resultado['lineas'] += sum(len(d) for _, d in ventas)
+        resultado['lotes'] += 1
+    return resultado
+
+
+# -----------------------------
+# AJUSTES AGREGADOS
+# -----------------------------
+def aplicar_ajustes(stock=True, deuda=True):
+    """
+    Suma los ajustes de todos los lotes aún no aplicados y los aplica con un UPDATE por tramo de
+    filas (no uno por línea importada). Devuelve cuántos lotes, filas de stock y clientes tocó,
+    y el rango de fechas importado.
+
+    Las ventas importadas quedan antes del corte de la conciliación incremental, así que los
+    puntos de conciliación de las filas y clientes afectados se descartan en la misma transacción.
+    """
+    with transaction.atomic():
+        lotes = list(LoteImportacion.objects.select_for_update().filter(aplicado=False))
+        if not lotes:
+            return {'lotes': 0, 'stock': 0, 'deuda': 0, 'desde': None, 'hasta': None}
+
+        vendido, generada, con_credito = defaultdict(int), defaultdict(Decimal), set()
+        for lote in lotes:
+            for clave, cantidad in lote.ajustes.get('stock', {}).items():
+                vendido[clave] += cantidad
+            for cliente_id, monto in lote.ajustes.get('deuda', {}).items():
+                generada[int(cliente_id)] += Decimal(monto)
+            con_credito.update(lote.ajustes.get('clientes', []))
+        con_credito.update(generada)
+
+        filas_stock = 0
+        sucursales = set()
+        if stock and vendido:
+            por_sucursal = defaultdict(list)
+            for clave, cantidad in vendido.items():
+                sucursal_id, producto_id = map(int, clave.split(':'))
+                por_sucursal[sucursal_id].append((producto_id, cantidad))
+            StockSucursal.objects.bulk_create(
+                [StockSucursal(sucursal_id=s, producto_id=p, stock=0) for s, filas in por_sucursal.items() for p, _ in filas],
+                batch_size=1000,
+                ignore_conflicts=True,
+            )
+            for sucursal_id, filas in por_sucursal.items():
+                for tramo in trozos(filas, TAMANO_CONSULTA):
+                    filas_stock += StockSucursal.objects.filter(
+                        sucursal_id=sucursal_id, producto_id__in=[p for p, _ in tramo]
+                    ).update(stock=F('stock') - Case(
+                        *[When(producto_id=p, then=Value(c)) for p, c in tramo], output_field=IntegerField()
+                    ))
+                sucursales.add(sucursal_id)
+
+        clientes = 0
+        if deuda and generada:
+            for tramo in trozos(list(generada.items()), TAMANO_CONSULTA):
+                clientes += Cliente.objects.filter(id__in=[c for c, _ in tramo]).update(
+                    deuda_actual=F('deuda_actual') + Case(
+                        *[When(id=c, then=Value(m)) for c, m in tramo],
+                        output_field=DecimalField(max_digits=10, decimal_places=2),
+                    )
+                )
+
+        # Los puntos se descartan aunque el ajuste se haya omitido (--sin-stock, --sin-deuda):
+        # el historial cambió igual y la próxima conciliación debe volver a recorrerlo
+        por_sucursal = defaultdict(list)
+        for clave in vendido:
+            sucursal_id, producto_id = map(int, clave.split(':'))
+            por_sucursal[sucursal_id].append(producto_id)
+        filas_afectadas = []
+        for sucursal_id, productos in por_sucursal.items():
+            for tramo in trozos(productos, TAMANO_CONSULTA):
+                filas_afectadas += StockSucursal.objects.filter(
+                    sucursal_id=sucursal_id, producto_id__in=tramo
+                ).values_list('id', flat=True)
+        descartar_puntos('stock', filas_afectadas)
+        descartar_puntos('deuda', con_credito)
+
+        rango = LoteImportacion.objects.filter(id__in=[l.id for l in lotes]).aggregate(desde=Min('desde'), hasta=Max('hasta'))
+        LoteImportacion.objects.filter(id__in=[l.id for l in lotes]).update(aplicado=True)
+        transaction.on_commit(lambda: [invalidar_stock(s) for s in sucursales])
+
+    return {'lotes': len(lotes), 'stock': filas_stock, 'deuda': clientes, **rango}
@@ -0,0 +1,67 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mainApp.models import CategoriaProducto, Producto, Proveedor
+from mainApp.precios import CAMPOS_PRECIO, ajustar_precios
+
+
+def decimal(texto):
+    try:
+        return Decimal(texto)
+    except InvalidOperation:
+        raise CommandError(f'Número inválido: {texto}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Ajusta precios por categoría, proveedor o marca en un solo UPDATE (p. ej. el reajuste mensual '
+        'por inflación), registrando el historial de precios de cada producto'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categoria', help='Código de la categoría')
+        parser.add_argument('--proveedor', help='ID de 3 dígitos del proveedor')
+        parser.add_argument('--marca', help='Marca (sin distinguir mayúsculas)')
+        parser.add_argument('--campo', choices=sorted(CAMPOS_PRECIO), default='precio', help='Precio a ajustar')
+        grupo = parser.add_mutually_exclusive_group(required=True)
+        grupo.add_argument('--porcentaje', help='Variación porcentual, p. ej. 4.5 o -10')
+        grupo.add_argument('--monto', help='Pesos a sumar (negativo para restar)')
+        parser.add_argument('--redondear-a', help='Redondea al múltiplo indicado, p. ej. 10')
+        parser.add_argument('--simular', action='store_true', help='Solo informa cuántos productos se ajustarían')
+
+    def handle(self, *args, **options):
+        productos = Producto.objects.all()
+        filtros = []
+        if options['categoria']:
+            if not CategoriaProducto.objects.filter(codigo=options['categoria']).exists():
+                raise CommandError(f"No existe la categoría {options['categoria']}.")
+            productos = productos.filter(categoria__codigo=options['categoria'])
+            filtros.append(f"categoría {options['categoria']}")
+        if options['proveedor']:
+            if not Proveedor.objects.filter(id_proveedor=options['proveedor']).exists():
+                raise CommandError(f"No existe el proveedor {options['proveedor']}.")
+            productos = productos.filter(proveedor__id_proveedor=options['proveedor'])
+            filtros.append(f"proveedor {options['proveedor']}")
+        if options['marca']:
+            productos = productos.filter(marca__iexact=options['marca'])
+            filtros.append(f"marca {options['marca']}")
+        if not filtros:
+            raise CommandError('Indique al menos --categoria, --proveedor o --marca.')
+
+        porcentaje = decimal(options['porcentaje']) if options['porcentaje'] else None
+        monto = decimal(options['monto']) if options['monto'] else None
+        redondear_a = decimal(options['redondear_a']) if options['redondear_a'] else None
+        cambio = f"{porcentaje:+}%" if porcentaje is not None else f"{monto:+} pesos"
+
+        if options['simular']:
+            self.stdout.write(
+                f"🔎 Se ajustaría {options['campo']} en {cambio} a {productos.count()} producto(s) "
+                f"({', '.join(filtros)})"
+            )
+            return
+
+        ajustados = ajustar_precios(productos, options['campo'], porcentaje, monto, redondear_a)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {options['campo']} ajustado en {cambio} para {ajustados} producto(s) ({', '.join(filtros)})"
+        ))
@@ -0,0 +1,102 @@
+import json
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from mainApp.models import Abono, DetalleVenta, Producto, StockSucursal, StockTotal, Venta
+from mainApp.outbox import eventos_disponibles, procesados_antes_de
+
+
+def consultas_frecuentes():
+    """
+    Formas reales de las consultas más usadas de la app (vista o método de origen, queryset).
+    Los valores concretos da igual que existan: solo se mira el plan.
+    """
+    ahora = timezone.now()
+    return [
+        ('Abono.save: ventas a crédito pendientes del cliente',
+         Venta.objects.filter(cliente_id=1, tipo_pago='credito', estado_credito='PENDIENTE')),
+        ('ventas: últimas ventas del vendedor',
+         Venta.objects.filter(vendedor_id=1).order_by('-fecha')[:20]),
+        ('ventas (admin): últimas ventas',
+         Venta.objects.order_by('-fecha')[:20]),
+        ('home: ventas del mes',
+         Venta.objects.filter(fecha__gte=ahora.replace(day=1)).values('id')),
+        ('ficha_credito: ventas a crédito del cliente',
+         Venta.objects.filter(cliente_id=1, tipo_pago='credito').order_by('-fecha')),
+        ('ficha_credito: abonos del cliente',
+         Abono.objects.filter(cliente_id=1).order_by('-fecha')),
+        ('margenes: detalles de venta de un período',
+         DetalleVenta.objects.filter(venta__fecha__gte=ahora.replace(day=1), venta__fecha__lt=ahora)
+         .values('producto_id').annotate(total=Sum('subtotal'))),
+        ('cierre de caja: ventas del turno por vendedor y tipo de pago',
+         Venta.objects.filter(sucursal_id=1, fecha__gte=ahora.replace(hour=0), fecha__lt=ahora)
+         .values('vendedor_id', 'tipo_pago').annotate(total=Sum('total'))),
+        ('alertar_stock_bajo: stock bajo en la sucursal',
+         StockSucursal.objects.filter(sucursal_id=1, producto_id__in=[1, 2, 3], stock__lt=10)),
+        ('home: productos bajo stock (vista agregada)',
+         StockTotal.objects.filter(stock__lt=10)),
+        ('procesar_outbox: eventos a reclamar (outbox.reclamar_lote)',
+         eventos_disponibles(ahora).values_list('id', flat=True)[:50]),
+        ('procesar_outbox --purgar-dias: eventos procesados antiguos',
+         procesados_antes_de(ahora).values_list('id', flat=True)[:1000]),
+        ('api_cambios_catalogo: productos modificados',
+         Producto.objects.filter(updated_at__gt=ahora).order_by('updated_at', 'id')[:500]),
+        ('login: usuario por nombre',
+         User.objects.filter(username='admin')),
+    ]
+
+
+# Patrones que delatan un recorrido completo de tabla o un ordenamiento extra, por motor
+ALERTAS = {
+    'sqlite': [
+        ('recorrido completo', re.compile(r'\bSCAN (?!.*\bUSING (COVERING )?INDEX\b)')),
+        ('ordenamiento', re.compile(r'USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)')),
+    ],
+    'postgresql': [
+        ('recorrido completo', re.compile(r'\bSeq Scan\b')),
+        ('ordenamiento', re.compile(r'(?<!Incremental )\bSort\b(?! Key)')),
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta EXPLAIN sobre las consultas frecuentes y marca recorridos completos y ordenamientos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--planes', action='store_true', help='Muestra el plan completo de cada consulta')
+        parser.add_argument('--salida', help='Guarda los planes en un archivo JSON (para comparar antes/después)')
+
+    def handle(self, *args, **options):
+        alertas = ALERTAS.get(connection.vendor)
+        if alertas is None:
+            raise CommandError(f'Motor no soportado: {connection.vendor}. Use SQLite o PostgreSQL.')
+
+        resultados = []
+        for nombre, queryset in consultas_frecuentes():
+            plan = queryset.explain()
+            marcas = sorted({motivo for motivo, patron in alertas for linea in plan.splitlines() if patron.search(linea)})
+            resultados.append({'consulta': nombre, 'alertas': marcas, 'plan': plan})
+
+            if marcas:
+                self.stdout.write(self.style.WARNING(f"⚠️  {nombre}: {', '.join(marcas)}"))
+            else:
+                self.stdout.write(f"✅ {nombre}")
+            if options['planes'] or marcas:
+                for linea in plan.splitlines():
+                    self.stdout.write(f"      {linea}")
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as f:
+                json.dump({'motor': connection.vendor, 'consultas': resultados}, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"📝 Planes guardados en {options['salida']}")
+
+        con_alertas = sum(1 for r in resultados if r['alertas'])
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(resultados)} consultas analizadas · {con_alertas} con alertas"
+        ))
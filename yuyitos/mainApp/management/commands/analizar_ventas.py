@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from mainApp.analisis import calcular_abc, calcular_asociaciones, sparse
+
+
+class Command(BaseCommand):
+    help = 'Calcula productos que se venden juntos (lift) y la clasificación ABC por ingreso del período'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=365, help='Días de ventas a analizar')
+        parser.add_argument('--min-juntas', type=int, default=3, help='Ventas juntas mínimas para guardar un par')
+        parser.add_argument('--max-asociados', type=int, default=20, help='Asociados guardados por producto (los de mayor lift)')
+        parser.add_argument('--limite-a', type=float, default=0.8, help='Fracción acumulada del ingreso que cubre la clase A')
+        parser.add_argument('--limite-b', type=float, default=0.95, help='Fracción acumulada del ingreso que cubre las clases A y B')
+
+    def handle(self, *args, **options):
+        inicio = timezone.now() - timedelta(days=options['dias'])
+
+        if sparse is None:
+            self.stdout.write(self.style.WARNING('⚠️  scipy no está instalado: se usa el conteo en Python puro'))
+        ventas, asociaciones = calcular_asociaciones(inicio, options['min_juntas'], options['max_asociados'])
+        self.stdout.write(f"   ✅ Canasta: {ventas} ventas analizadas, {asociaciones} asociaciones guardadas")
+
+        clases = calcular_abc(timezone.localdate(inicio), options['limite_a'], options['limite_b'])
+        self.stdout.write(f"   ✅ ABC: {clases['A']} productos A, {clases['B']} B, {clases['C']} C")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Análisis de ventas de los últimos {options['dias']} días listo"))
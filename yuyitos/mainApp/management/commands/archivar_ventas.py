@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mainApp.archivo import archivar_lote, limite_archivo, ventas_archivables
+
+
+class Command(BaseCommand):
+    help = 'Mueve las ventas cerradas más antiguas que el horizonte a las tablas de archivo, por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, help='Horizonte en días (por defecto ARCHIVO_VENTAS_DIAS)')
+        parser.add_argument('--lote', type=int, default=1000, help='Ventas por transacción')
+        parser.add_argument('--max-lotes', type=int, help='Detenerse después de N lotes (se retoma en la próxima ejecución)')
+        parser.add_argument('--pausa', type=float, default=0, help='Segundos de espera entre lotes para no cargar la base')
+        parser.add_argument('--simular', action='store_true', help='Solo informa cuántas ventas se archivarían')
+
+    def handle(self, *args, **options):
+        limite = limite_archivo(options['dias'])
+
+        if options['simular']:
+            pendientes = ventas_archivables(limite).count()
+            self.stdout.write(f"🔎 {pendientes} ventas cerradas anteriores al {limite:%d/%m/%Y} se archivarían")
+            return
+
+        total = 0
+        lotes = 0
+        while options['max_lotes'] is None or lotes < options['max_lotes']:
+            movidas = archivar_lote(limite, options['lote'])
+            if not movidas:
+                break
+            total += movidas
+            lotes += 1
+            self.stdout.write(f"   ✅ Lote {lotes}: {movidas} ventas archivadas")
+            if options['pausa']:
+                time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} ventas anteriores al {limite:%d/%m/%Y} archivadas en {lotes} lote(s)"
+        ))
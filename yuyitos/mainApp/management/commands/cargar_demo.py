@@ -2,7 +2,8 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from mainApp.models import (
     Proveedor, CategoriaProducto, Producto, Cliente,
-    Venta, DetalleVenta, OrdenPedido, DetalleOrdenPedido
+    Venta, DetalleVenta, OrdenPedido, DetalleOrdenPedido,
+    Sucursal, PerfilUsuario, StockSucursal
 )
 from django.utils import timezone
 from decimal import Decimal
@@ -15,6 +16,9 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('   🚀 CARGANDO DATOS DE DEMOSTRACIÓN'))
         self.stdout.write(self.style.SUCCESS('='*60 + '\n'))
 
+        # 0. SUCURSAL
+        matriz, _ = Sucursal.objects.get_or_create(codigo='001', defaults={'nombre': 'Casa Matriz'})
+
         # 1. USUARIOS
         self.stdout.write('👤 Creando usuarios...')
         
@@ -44,6 +48,7 @@ class Command(BaseCommand):
         )
         vendedora.set_password('123456')
         vendedora.save()
+        PerfilUsuario.objects.create(usuario=vendedora, sucursal=matriz)
         self.stdout.write(self.style.SUCCESS('   ✅ Vendedora creada (vendedora/123456)\n'))
 
         # 2. PROVEEDORES (3 MÁXIMO)
@@ -113,13 +118,14 @@ class Command(BaseCommand):
                     categoria=categorias[prod_data['categoria']],
                     precio_compra=prod_data['precio_compra'],
                     precio=prod_data['precio'],
-                    stock=prod_data['stock'],
                     marca=prod_data['marca']
                 )
                 prod.save()
+                StockSucursal.objects.create(sucursal=matriz, producto=prod, stock=prod_data['stock'])
                 productos.append(prod)
-                stock_color = '🟢' if prod.stock > 30 else '🟡' if prod.stock > 10 else '🔴'
-                self.stdout.write(f"   ✅ {prod.nombre} {stock_color} Stock: {prod.stock}")
+                stock = prod_data['stock']
+                stock_color = '🟢' if stock > 30 else '🟡' if stock > 10 else '🔴'
+                self.stdout.write(f"   ✅ {prod.nombre} {stock_color} Stock: {stock}")
             else:
                 productos.append(prod_existente)
         
@@ -199,6 +205,7 @@ class Command(BaseCommand):
                     numero_boleta=venta_data['numero_boleta'],
                     cliente=venta_data['cliente'],
                     vendedor=venta_data['vendedor'],
+                    sucursal=matriz,
                     tipo_pago=venta_data['tipo_pago'],
                     total=total,
                     estado_credito=venta_data['estado_credito']
@@ -210,6 +217,7 @@ class Command(BaseCommand):
                         producto=productos[item['producto']],
                         cantidad=item['cantidad'],
                         precio_unitario=item['precio'],
+                        costo_unitario=productos[item['producto']].precio_compra,
                         subtotal=item['cantidad'] * item['precio']
                     )
                 
@@ -271,6 +279,7 @@ class Command(BaseCommand):
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS('📊 RESUMEN:'))
         self.stdout.write(self.style.SUCCESS('   ─────────────────────────────'))
+        self.stdout.write(f"   • Sucursales:  {Sucursal.objects.count()}")
         self.stdout.write(f"   • Proveedores: {Proveedor.objects.count()}")
         self.stdout.write(f"   • Categorías:  {CategoriaProducto.objects.count()}")
         self.stdout.write(f"   • Productos:   {Producto.objects.count()}")
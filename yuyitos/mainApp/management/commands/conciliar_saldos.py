@@ -0,0 +1,94 @@
+import csv
+import os
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from mainApp.conciliacion import corte_actual, tramos
+from mainApp.models import Cliente, StockSucursal
+from mainApp.procesos import crear_pool, ejecutar, enviar
+
+TAREAS = {
+    'deuda': ('mainApp.conciliacion.conciliar_deudas', lambda: Cliente.objects.all(), 'id'),
+    'stock': ('mainApp.conciliacion.conciliar_stock', lambda: StockSucursal.objects.all(), 'producto_id'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la deuda de los clientes y el stock por sucursal con lo que explican ventas, abonos y '
+        'recepciones desde la última conciliación, por tramos en paralelo, e informa las diferencias'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solo', choices=sorted(TAREAS), help='Concilia solo deuda o solo stock')
+        parser.add_argument('--procesos', type=int, default=min(4, os.cpu_count() or 1), help='Procesos en paralelo (1 = sin pool)')
+        parser.add_argument('--tamano', type=int, default=500, help='Clientes o productos por tramo')
+        parser.add_argument('--desde-cero', action='store_true',
+                            help='Ignora los puntos de conciliación y recalcula desde toda la historia. Sin esta '
+                                 'opción, lo que aún no tiene punto (p. ej. la primera corrida) toma su valor '
+                                 'actual como base sin informar diferencias')
+        parser.add_argument('--salida', help='Guarda el informe de diferencias en CSV')
+
+    def handle(self, *args, **options):
+        corte = corte_actual()
+        trabajos = [
+            (tipo, ruta, desde, hasta)
+            for tipo, (ruta, queryset, campo) in TAREAS.items()
+            if options['solo'] in (None, tipo)
+            for desde, hasta in tramos(queryset(), campo, options['tamano'])
+        ]
+        self.stdout.write(f"🔎 {len(trabajos)} tramos a conciliar hasta el {corte:%d/%m/%Y %H:%M:%S}")
+
+        resultados = []
+        if options['procesos'] > 1 and len(trabajos) > 1:
+            with crear_pool(options['procesos']) as pool:
+                futuros = {
+                    enviar(pool, ruta, desde, hasta, corte, options['desde_cero']): (tipo, desde, hasta)
+                    for tipo, ruta, desde, hasta in trabajos
+                }
+                for futuro in as_completed(futuros):
+                    resultados.append(self.anotar(futuros[futuro], futuro.result()))
+        else:
+            for tipo, ruta, desde, hasta in trabajos:
+                resultado = ejecutar(ruta, (desde, hasta, corte, options['desde_cero']))
+                resultados.append(self.anotar((tipo, desde, hasta), resultado))
+
+        diferencias = [d for resultado in resultados for d in resultado['diferencias']]
+        revisados = sum(r['revisados'] for r in resultados)
+        inicializados = sum(r['inicializados'] for r in resultados)
+        self.informar(diferencias, revisados, inicializados, options['salida'])
+
+    def anotar(self, trabajo, resultado):
+        tipo, desde, hasta = trabajo
+        self.stdout.write(
+            f"   ✅ {tipo} [{desde}, {hasta}): {resultado['revisados']} revisados, "
+            f"{resultado['inicializados']} inicializados, {len(resultado['diferencias'])} diferencias"
+        )
+        return resultado
+
+    def informar(self, diferencias, revisados, inicializados, salida):
+        self.stdout.write('')
+        for d in sorted(diferencias, key=lambda d: (d['tipo'], -abs(d['diferencia'])))[:50]:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️  {d['tipo']} #{d['id']} {d['descripcion']}: registrado {d['registrado']}, "
+                f"esperado {d['esperado']} (diferencia {d['diferencia']:+})"
+            ))
+        if len(diferencias) > 50:
+            self.stdout.write(f"   ... y {len(diferencias) - 50} más")
+
+        if salida:
+            with open(salida, 'w', newline='', encoding='utf-8') as f:
+                escritor = csv.DictWriter(f, fieldnames=['tipo', 'id', 'descripcion', 'registrado', 'esperado', 'diferencia', 'desde'])
+                escritor.writeheader()
+                escritor.writerows(diferencias)
+            self.stdout.write(f"📝 Informe guardado en {salida}")
+
+        if inicializados:
+            self.stdout.write(
+                f"🆕 {inicializados} saldos sin conciliación previa quedaron como base (use --desde-cero "
+                f"para revisarlos contra toda la historia)"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {revisados} saldos conciliados · {len(diferencias)} diferencias"
+        ))
@@ -0,0 +1,48 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mainApp.consultas_lentas import borrar_instantaneas, consultas_de_todos_los_procesos
+
+
+def principales(conteo):
+    return ', '.join(f"{valor} ({veces})" for valor, veces in sorted(conteo.items(), key=lambda i: -i[1])[:3])
+
+
+class Command(BaseCommand):
+    help = 'Muestra las consultas SQL más lentas registradas por los procesos de la app, agrupadas por huella'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=10, help='Cantidad de consultas a mostrar')
+        parser.add_argument('--json', action='store_true', help='Imprime el resultado como JSON')
+        parser.add_argument('--limpiar', action='store_true', help='Borra las instantáneas guardadas')
+
+    def handle(self, *args, **options):
+        if options['limpiar']:
+            borrar_instantaneas()
+            self.stdout.write(self.style.SUCCESS('✅ Instantáneas de consultas lentas borradas'))
+            return
+
+        consultas = consultas_de_todos_los_procesos(options['limite'])
+        if options['json']:
+            self.stdout.write(json.dumps(consultas, ensure_ascii=False, indent=2))
+            return
+
+        if not consultas:
+            self.stdout.write(f"No hay consultas sobre {settings.CONSULTAS_LENTAS_MS:.0f} ms registradas.")
+            return
+
+        for posicion, consulta in enumerate(consultas, start=1):
+            self.stdout.write(self.style.WARNING(
+                f"{posicion}. {consulta['total_ms']:.0f} ms en total · {consulta['veces']} veces · "
+                f"promedio {consulta['promedio_ms']:.0f} ms · máximo {consulta['max_ms']:.0f} ms"
+            ))
+            self.stdout.write(f"   {consulta['huella'][:500]}")
+            self.stdout.write(f"   Vistas: {principales(consulta['vistas'])}")
+            self.stdout.write(f"   Roles: {principales(consulta['roles'])}")
+            self.stdout.write(f"   Origen: {principales(consulta['origenes']) or '-'}")
+            self.stdout.write(f"   Parámetros: {consulta['parametros']}")
+            self.stdout.write('')
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(consultas)} consultas lentas (umbral {settings.CONSULTAS_LENTAS_MS:.0f} ms)"))
@@ -0,0 +1,32 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from mainApp.boletas import HTML, documentos_del_periodo, escribir_zip
+from mainApp.margenes import rango_datetime
+
+
+class Command(BaseCommand):
+    help = 'Exporta a un zip las boletas de un rango de días, generando antes las que falten'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial (AAAA-MM-DD); por defecto hoy')
+        parser.add_argument('--hasta', help='Fecha final (AAAA-MM-DD); por defecto igual a --desde')
+        parser.add_argument('--formato', choices=['html', 'pdf'], default='html')
+        parser.add_argument('--salida', help='Archivo zip de salida; por defecto boletas_AAAAMMDD.zip')
+
+    def handle(self, *args, **options):
+        try:
+            desde = date.fromisoformat(options['desde']) if options['desde'] else timezone.localdate()
+            hasta = date.fromisoformat(options['hasta']) if options['hasta'] else desde
+        except ValueError as e:
+            raise CommandError(f'Fecha inválida: {e}')
+        if options['formato'] == 'pdf' and HTML is None:
+            raise CommandError('Para exportar PDF hay que instalar weasyprint.')
+
+        documentos = documentos_del_periodo(*rango_datetime(desde, hasta))
+        salida = options['salida'] or f'boletas_{desde:%Y%m%d}.zip'
+        escribir_zip(documentos, salida, options['formato'])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(documentos)} boletas exportadas a {salida}"))
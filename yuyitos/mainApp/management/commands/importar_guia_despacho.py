@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mainApp.models import OrdenPedido, Sucursal
+from mainApp.recepciones import leer_guia_csv, registrar_recepcion
+
+
+class Command(BaseCommand):
+    help = 'Registra una recepción de una orden de pedido desde la guía de despacho CSV del proveedor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('orden_id', type=int, help='ID de la orden de pedido')
+        parser.add_argument('archivo', help='Ruta del CSV con columnas codigo y cantidad')
+        parser.add_argument('--sucursal', help='Código de la sucursal que recibe; por defecto la casa matriz')
+
+    def handle(self, *args, **options):
+        try:
+            orden = OrdenPedido.objects.get(pk=options['orden_id'])
+        except OrdenPedido.DoesNotExist:
+            raise CommandError(f"No existe la orden de pedido #{options['orden_id']}.")
+
+        if options['sucursal']:
+            try:
+                sucursal = Sucursal.objects.get(codigo=options['sucursal'])
+            except Sucursal.DoesNotExist:
+                raise CommandError(f"No existe la sucursal {options['sucursal']}.")
+        else:
+            sucursal = Sucursal.objects.order_by('codigo').first()
+
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                cantidades = leer_guia_csv(archivo)
+            recepcion = registrar_recepcion(orden, sucursal, cantidades)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Recepción #{recepcion.id} registrada en {sucursal.nombre}: "
+            f"{len(cantidades)} producto(s), {sum(cantidades.values())} unidades"
+        ))
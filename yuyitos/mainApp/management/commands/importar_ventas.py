@@ -0,0 +1,106 @@
+import csv
+import os
+import shutil
+from concurrent.futures import as_completed
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from mainApp.importacion import aplicar_ajustes, preparar
+from mainApp.margenes import actualizar_resumen
+from mainApp.procesos import crear_pool, ejecutar, enviar
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa ventas históricas desde un CSV o JSON por línea (una fila por línea de boleta): parte '
+        'el archivo por boleta, valida y carga cada partición en paralelo por lotes, y al final ajusta '
+        'stock, deuda y resumen de márgenes de una vez. Si se corta, volver a ejecutarlo reanuda.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='CSV (coma o punto y coma) o .jsonl con columnas boleta, fecha, rut, '
+                                            'vendedor, sucursal, tipo_pago, codigo, cantidad, precio_unitario '
+                                            '[, estado_credito, costo_unitario]')
+        parser.add_argument('--procesos', type=int, default=min(4, os.cpu_count() or 1), help='Procesos en paralelo (1 = sin pool)')
+        parser.add_argument('--particiones', type=int, default=16, help='Particiones del archivo (más = menos memoria por proceso)')
+        parser.add_argument('--lote', type=int, default=500, help='Boletas por transacción')
+        parser.add_argument('--sin-stock', action='store_true',
+                            help='No descuenta del stock lo vendido (el stock actual ya viene del sistema antiguo)')
+        parser.add_argument('--sin-deuda', action='store_true',
+                            help='No suma a la deuda de los clientes los créditos pendientes importados')
+        parser.add_argument('--salida', help='Guarda los errores de validación en CSV')
+
+    def handle(self, *args, **options):
+        try:
+            importacion, directorio, lineas = preparar(options['archivo'], options['particiones'], options['lote'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        particiones = sorted(n for n in os.listdir(directorio) if n.endswith('.jsonl'))
+        self.stdout.write(f"📦 {lineas} líneas en {len(particiones)} particiones (importación {importacion[:12]})")
+
+        trabajos = [(importacion, os.path.join(directorio, nombre), i, options['lote']) for i, nombre in enumerate(particiones)]
+        resultados = []
+        if options['procesos'] > 1 and len(trabajos) > 1:
+            with crear_pool(options['procesos']) as pool:
+                futuros = {enviar(pool, 'mainApp.importacion.importar_particion', *trabajo): trabajo[2] for trabajo in trabajos}
+                for futuro in as_completed(futuros):
+                    resultados.append(self.anotar(futuros[futuro], futuro.result()))
+        else:
+            for trabajo in trabajos:
+                resultados.append(self.anotar(trabajo[2], ejecutar('mainApp.importacion.importar_particion', trabajo)))
+
+        ajustes = aplicar_ajustes(stock=not options['sin_stock'], deuda=not options['sin_deuda'])
+        if ajustes['lotes']:
+            self.stdout.write(
+                f"🔧 {ajustes['lotes']} lotes aplicados: {ajustes['stock']} filas de stock, "
+                f"{ajustes['deuda']} clientes con deuda ajustada"
+            )
+            self.actualizar_margenes(ajustes['desde'], ajustes['hasta'])
+
+        errores = [e for r in resultados for e in r['errores']]
+        self.informar(resultados, errores, options['salida'])
+        if not any(e['boleta'] == '' for e in errores):
+            # Todas las particiones terminaron: ya no hacen falta para reanudar
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    def anotar(self, particion, resultado):
+        self.stdout.write(
+            f"   ✅ partición {particion}: {resultado['ventas']} ventas en {resultado['lotes']} lotes"
+            + (f", {resultado['saltados']} lotes ya cargados" if resultado['saltados'] else '')
+            + (f", {len(resultado['errores'])} errores" if resultado['errores'] else '')
+        )
+        return resultado
+
+    def actualizar_margenes(self, desde, hasta):
+        if desde is None:
+            return
+        inicio, fin = timezone.localdate(desde), timezone.localdate(hasta)
+        filas = 0
+        while inicio <= fin:
+            tramo_fin = min(inicio + timedelta(days=30), fin)
+            filas += actualizar_resumen(inicio, tramo_fin)
+            inicio = tramo_fin + timedelta(days=1)
+        self.stdout.write(f"📈 Resumen de márgenes actualizado del {timezone.localdate(desde):%d/%m/%Y} "
+                          f"al {fin:%d/%m/%Y}: {filas} filas")
+
+    def informar(self, resultados, errores, salida):
+        self.stdout.write('')
+        for e in errores[:50]:
+            self.stdout.write(self.style.WARNING(f"⚠️  Boleta {e['boleta'] or '-'}: {e['error']}"))
+        if len(errores) > 50:
+            self.stdout.write(f"   ... y {len(errores) - 50} más")
+
+        if salida:
+            with open(salida, 'w', newline='', encoding='utf-8') as f:
+                escritor = csv.DictWriter(f, fieldnames=['particion', 'boleta', 'error'])
+                escritor.writeheader()
+                escritor.writerows(errores)
+            self.stdout.write(f"📝 Errores guardados en {salida}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {sum(r['ventas'] for r in resultados)} ventas importadas "
+            f"({sum(r['lineas'] for r in resultados)} líneas) · "
+            f"{sum(r['omitidas'] for r in resultados)} ya existían · {len(errores)} con error"
+        ))
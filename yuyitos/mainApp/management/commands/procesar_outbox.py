@@ -0,0 +1,73 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from mainApp import outbox
+
+# Segundos entre purgas de eventos procesados (--purgar-dias) en un worker de larga vida
+INTERVALO_PURGA = 3600
+
+
+class Command(BaseCommand):
+    help = 'Worker que procesa los eventos del outbox (efectos posteriores a las ventas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50, help='Eventos reclamados por vuelta')
+        parser.add_argument('--hilos', type=int, default=4, help='Hilos que procesan eventos en paralelo')
+        parser.add_argument('--max-intentos', type=int, default=5, help='Intentos antes de marcar un evento como fallido')
+        parser.add_argument('--bloqueo', type=int, default=300, help='Segundos que un evento queda reservado para este worker')
+        parser.add_argument('--espera', type=float, default=1.0, help='Segundos de pausa cuando no hay eventos')
+        parser.add_argument('--una-vez', action='store_true', help='Procesa lo pendiente y termina')
+        parser.add_argument('--purgar-dias', type=int, help='Borra los eventos procesados hace más de N días '
+                            '(al iniciar y luego cada hora, cuando no hay eventos)')
+
+    def handle(self, *args, **options):
+        duracion_bloqueo = timedelta(seconds=options['bloqueo'])
+        procesados = fallidos = 0
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🚀 Worker outbox iniciado ({options['hilos']} hilos, lotes de {options['lote']})"
+        ))
+
+        proxima_purga = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=options['hilos']) as pool:
+            try:
+                while True:
+                    if options['purgar_dias'] is not None and time.monotonic() >= proxima_purga:
+                        self.purgar(options['purgar_dias'])
+                        proxima_purga = time.monotonic() + INTERVALO_PURGA
+
+                    eventos = outbox.reclamar_lote(options['lote'], duracion_bloqueo)
+
+                    if not eventos:
+                        if options['una_vez']:
+                            break
+                        time.sleep(options['espera'])
+                        continue
+
+                    for ok in pool.map(lambda e: self.procesar(e, options['max_intentos']), eventos):
+                        if ok:
+                            procesados += 1
+                        else:
+                            fallidos += 1
+            except KeyboardInterrupt:
+                self.stdout.write('⏹️  Deteniendo worker...')
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Eventos procesados: {procesados} · con error: {fallidos}"))
+
+    def purgar(self, dias):
+        borrados = outbox.purgar_procesados(dias)
+        if borrados:
+            self.stdout.write(f"🧹 {borrados} eventos procesados hace más de {dias} días eliminados")
+
+    def procesar(self, evento, max_intentos):
+        close_old_connections()
+        try:
+            return outbox.procesar(evento, max_intentos)
+        finally:
+            # Cada hilo tiene su propia conexión
+            connection.close()
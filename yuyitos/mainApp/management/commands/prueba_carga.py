@@ -0,0 +1,292 @@
+import http.client
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+from decimal import Decimal
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+# Clases de error reconocibles en la respuesta de registrar_venta
+CLASES_ERROR = [
+    ('boleta duplicada', re.compile(r'UNIQUE.*numero_boleta|numero_boleta.*(unique|duplicate|duplicad)', re.I)),
+    ('bloqueo de base', re.compile(r'database is locked|deadlock|could not serialize|lock wait', re.I)),
+    ('stock insuficiente', re.compile(r'Stock insuficiente', re.I)),
+    ('límite de crédito', re.compile(r'límite de crédito', re.I)),
+]
+
+
+def clasificar(mensaje):
+    for clase, patron in CLASES_ERROR:
+        if patron.search(mensaje):
+            return clase
+    return f'otro: {mensaje[:60]}'
+
+
+def percentil(ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not ordenados:
+        return 0
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[indice]
+
+
+class Sesion:
+    """Un navegador simulado: cookies propias y token CSRF tomado de la cookie"""
+
+    def __init__(self, base, timeout):
+        self.base = base.rstrip('/')
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies))
+
+    def csrf(self):
+        return next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+
+    def pedir(self, ruta, datos=None, json_body=None):
+        """Devuelve (estado, cuerpo, url final); los 4xx/5xx no levantan excepción"""
+        cabeceras = {'Referer': self.base + '/'}
+        cuerpo = None
+        if json_body is not None:
+            cuerpo = json.dumps(json_body).encode()
+            cabeceras.update({'Content-Type': 'application/json', 'X-CSRFToken': self.csrf()})
+        elif datos is not None:
+            cuerpo = urlencode({**datos, 'csrfmiddlewaretoken': self.csrf()}).encode()
+        try:
+            with self.opener.open(Request(self.base + ruta, data=cuerpo, headers=cabeceras), timeout=self.timeout) as r:
+                return r.status, r.read(), r.geturl()
+        except HTTPError as e:
+            return e.code, e.read(), e.geturl()
+
+    def login(self, usuario, password):
+        self.pedir('/')
+        _, _, url = self.pedir('/', datos={'username': usuario, 'password': password})
+        if url.rstrip('/') == self.base:
+            raise CommandError(f'No se pudo iniciar sesión como {usuario}')
+
+
+class Resultados:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencias = {}
+        self.errores = {}
+
+    def anotar(self, endpoint, segundos, error=None):
+        with self.lock:
+            self.latencias.setdefault(endpoint, [])
+            self.errores.setdefault(endpoint, {})
+            if error:
+                self.errores[endpoint][error] = self.errores[endpoint].get(error, 0) + 1
+            else:
+                self.latencias[endpoint].append(segundos * 1000)
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga contra un servidor en marcha: cajeros simulados registran ventas y se '
+        'mezclan búsquedas de productos y cargas del home. Informa rendimiento, p50/p95/p99 y errores'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Servidor a probar')
+        parser.add_argument('--cajeros', type=int, default=5, help='Cajas simuladas en paralelo')
+        parser.add_argument('--duracion', type=float, default=60, help='Segundos de prueba')
+        parser.add_argument('--tasa', type=float, default=0,
+                            help='Operaciones por segundo entre todas las cajas (0 = sin límite)')
+        parser.add_argument('--vendedor', default='vendedora:123456', help='usuario:clave de los cajeros')
+        parser.add_argument('--admin', default='admin:123456',
+                            help='usuario:clave para las cargas del home (vacío para no cargar el home)')
+        parser.add_argument('--mezcla', default='venta=70,productos=20,home=10', help='Peso de cada operación')
+        parser.add_argument('--articulos', type=int, default=5, help='Máximo de productos distintos por venta')
+        parser.add_argument('--credito', type=float, default=0.1, help='Fracción de ventas a crédito')
+        parser.add_argument('--timeout', type=float, default=30, help='Segundos de espera por request')
+        parser.add_argument('--salida', help='Guarda el informe en JSON (para comparar versiones)')
+
+    def handle(self, *args, **options):
+        pesos = self.leer_mezcla(options['mezcla'])
+        if not options['admin']:
+            pesos.pop('home', None)
+        credenciales = {
+            'venta': options['vendedor'].split(':', 1),
+            'productos': options['vendedor'].split(':', 1),
+            'home': (options['admin'] or ':').split(':', 1),
+        }
+
+        try:
+            productos, clientes = self.catalogo(options, credenciales['venta'])
+        except (OSError, http.client.HTTPException) as e:
+            raise CommandError(f"No se pudo conectar a {options['url']}: {e}")
+        if not productos or not clientes:
+            raise CommandError('El servidor no tiene productos o clientes activos para simular ventas.')
+
+        self.stdout.write(
+            f"🚀 {options['cajeros']} cajas contra {options['url']} durante {options['duracion']:.0f} s "
+            f"({len(productos)} productos, {len(clientes)} clientes)"
+        )
+
+        resultados = Resultados()
+        reloj = {'siguiente': time.monotonic(), 'lock': threading.Lock()}
+        fin = time.monotonic() + options['duracion']
+        hilos = [
+            threading.Thread(
+                target=self.caja,
+                args=(options, credenciales, pesos, productos, clientes, resultados, reloj, fin),
+                daemon=True,
+            )
+            for _ in range(options['cajeros'])
+        ]
+        inicio = time.monotonic()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.monotonic() - inicio
+
+        informe = self.informe(resultados, duracion)
+        self.imprimir(informe)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as f:
+                json.dump({
+                    'fecha': timezone.now().isoformat(),
+                    'parametros': {k: options[k] for k in ('url', 'cajeros', 'duracion', 'tasa', 'mezcla', 'articulos', 'credito')},
+                    'duracion': round(duracion, 2),
+                    'endpoints': informe,
+                }, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"📝 Informe guardado en {options['salida']}")
+
+    def leer_mezcla(self, texto):
+        try:
+            pesos = {nombre.strip(): float(peso) for nombre, peso in (p.split('=') for p in texto.split(','))}
+        except ValueError:
+            raise CommandError(f'Mezcla inválida: {texto}')
+        desconocidas = set(pesos) - {'venta', 'productos', 'home'}
+        if desconocidas:
+            raise CommandError(f"Operaciones desconocidas en la mezcla: {', '.join(desconocidas)}")
+        return {nombre: peso for nombre, peso in pesos.items() if peso > 0}
+
+    def catalogo(self, options, credenciales):
+        """Productos y clientes a usar, leídos por la misma API que usan las cajas"""
+        sesion = Sesion(options['url'], options['timeout'])
+        sesion.login(*credenciales)
+
+        productos, cursor = [], ''
+        while True:
+            _, cuerpo, _ = sesion.pedir('/api/productos/cambios/?' + urlencode({'cursor': cursor, 'limite': 1000}))
+            pagina = json.loads(cuerpo)
+            productos += pagina['productos']
+            cursor = pagina['cursor']
+            if not pagina['hay_mas']:
+                break
+
+        _, cuerpo, _ = sesion.pedir('/api/clientes/')
+        return productos, json.loads(cuerpo)['clientes']
+
+    def esperar_turno(self, options, reloj):
+        """Reparte las operaciones a ritmo constante entre todas las cajas"""
+        if not options['tasa']:
+            return
+        with reloj['lock']:
+            turno = max(reloj['siguiente'], time.monotonic())
+            reloj['siguiente'] = turno + 1 / options['tasa']
+        espera = turno - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+
+    def caja(self, options, credenciales, pesos, productos, clientes, resultados, reloj, fin):
+        sesiones = {}
+        operaciones, pesos_lista = list(pesos), list(pesos.values())
+        while True:
+            self.esperar_turno(options, reloj)
+            if time.monotonic() >= fin:
+                return
+            operacion = random.choices(operaciones, pesos_lista)[0]
+            inicio = time.monotonic()
+            try:
+                usuario = tuple(credenciales[operacion])
+                if usuario not in sesiones:
+                    # Se guarda recién con el login hecho: si la conexión falla se reintenta
+                    sesion = Sesion(options['url'], options['timeout'])
+                    sesion.login(*usuario)
+                    sesiones[usuario] = sesion
+                inicio = time.monotonic()
+                error = getattr(self, f'op_{operacion}')(sesiones[usuario], options, productos, clientes)
+            except socket.timeout:
+                error = 'timeout'
+            except URLError as e:
+                error = f'conexión: {e.reason}'
+            except (OSError, http.client.HTTPException) as e:
+                # RemoteDisconnected, ConnectionResetError, etc. llegan sin envolver en URLError
+                error = f'conexión: {type(e).__name__}'
+            except CommandError as e:
+                error = str(e)
+            resultados.anotar(operacion, time.monotonic() - inicio, error)
+
+    def op_venta(self, sesion, options, productos, clientes):
+        canasta = random.sample(productos, min(len(productos), random.randint(1, options['articulos'])))
+        items = [{'producto_id': p['id'], 'cantidad': random.randint(1, 3)} for p in canasta]
+        total = sum(Decimal(str(p['precio'])) * item['cantidad'] for p, item in zip(canasta, items))
+        estado, cuerpo, _ = sesion.pedir('/ventas/registrar/', json_body={
+            'items': items,
+            'cliente_id': random.choice(clientes)['id'],
+            'tipo_pago': 'credito' if random.random() < options['credito'] else 'contado',
+            'total': str(total),
+        })
+        try:
+            respuesta = json.loads(cuerpo)
+        except ValueError:
+            return f'HTTP {estado}'
+        if respuesta.get('success'):
+            return None
+        return clasificar(respuesta.get('error', ''))
+
+    def op_productos(self, sesion, options, productos, clientes):
+        termino = random.choice(productos)['nombre'][:3]
+        estado, _, _ = sesion.pedir('/productos/?' + urlencode({'q': termino}))
+        return None if estado == 200 else f'HTTP {estado}'
+
+    def op_home(self, sesion, options, productos, clientes):
+        estado, _, _ = sesion.pedir('/home/')
+        return None if estado == 200 else f'HTTP {estado}'
+
+    def informe(self, resultados, duracion):
+        informe = {}
+        for endpoint, latencias in resultados.latencias.items():
+            ordenadas = sorted(latencias)
+            errores = resultados.errores[endpoint]
+            informe[endpoint] = {
+                'exitosas': len(ordenadas),
+                'fallidas': sum(errores.values()),
+                'por_segundo': round(len(ordenadas) / duracion, 2) if duracion else 0,
+                'p50_ms': round(percentil(ordenadas, 50), 1),
+                'p95_ms': round(percentil(ordenadas, 95), 1),
+                'p99_ms': round(percentil(ordenadas, 99), 1),
+                'max_ms': round(ordenadas[-1], 1) if ordenadas else 0,
+                'errores': dict(sorted(errores.items(), key=lambda e: -e[1])),
+            }
+        return informe
+
+    def imprimir(self, informe):
+        self.stdout.write('')
+        self.stdout.write(f"{'Operación':<12}{'OK':>8}{'Error':>8}{'OK/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'máx':>9}")
+        for endpoint, datos in informe.items():
+            self.stdout.write(
+                f"{endpoint:<12}{datos['exitosas']:>8}{datos['fallidas']:>8}{datos['por_segundo']:>9}"
+                f"{datos['p50_ms']:>9}{datos['p95_ms']:>9}{datos['p99_ms']:>9}{datos['max_ms']:>9}"
+            )
+        for endpoint, datos in informe.items():
+            for clase, veces in datos['errores'].items():
+                self.stdout.write(self.style.WARNING(f"   ⚠️  {endpoint}: {clase} ({veces})"))
+
+        total_errores = sum(d['fallidas'] for d in informe.values())
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {sum(d['exitosas'] for d in informe.values())} operaciones exitosas · {total_errores} con error"
+        ))
@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from mainApp.archivo import primera_fecha_venta
+from mainApp.margenes import reconstruir_resumen
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de márgenes desde los detalles de venta (activos y archivados)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial (AAAA-MM-DD); por defecto la primera venta')
+        parser.add_argument('--hasta', help='Fecha final (AAAA-MM-DD); por defecto hoy')
+        parser.add_argument('--dias-por-tramo', type=int, default=31, help='Días procesados por transacción')
+
+    def handle(self, *args, **options):
+        try:
+            desde = date.fromisoformat(options['desde']) if options['desde'] else None
+            hasta = date.fromisoformat(options['hasta']) if options['hasta'] else timezone.localdate()
+        except ValueError as e:
+            raise CommandError(f'Fecha inválida: {e}')
+
+        if desde is None:
+            primera = primera_fecha_venta()
+            if primera is None:
+                self.stdout.write('No hay ventas registradas.')
+                return
+            desde = timezone.localdate(primera)
+
+        total = 0
+        tramo = timedelta(days=options['dias_por_tramo'])
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(inicio + tramo - timedelta(days=1), hasta)
+            filas = reconstruir_resumen(inicio, fin)
+            total += filas
+            self.stdout.write(f"   ✅ {inicio:%d/%m/%Y} - {fin:%d/%m/%Y}: {filas} filas")
+            inicio = fin + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Resumen de márgenes reconstruido: {total} filas"))
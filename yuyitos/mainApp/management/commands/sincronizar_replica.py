@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from mainApp.routers import ALIAS_PRIMARIO, ALIAS_REPLICA, replica_configurada
+
+
+class Command(BaseCommand):
+    help = 'Copia la base primaria a la réplica de lectura (solo para pruebas locales con SQLite)'
+
+    def handle(self, *args, **kwargs):
+        if not replica_configurada():
+            raise CommandError('No hay réplica configurada. Defina REPLICA_DATABASE_URL.')
+
+        primario = connections[ALIAS_PRIMARIO]
+        replica = connections[ALIAS_REPLICA]
+
+        if primario.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError(
+                'Solo se sincroniza SQLite a SQLite. En PostgreSQL use replicación '
+                'nativa (streaming replication) hacia la réplica.'
+            )
+
+        primario.ensure_connection()
+        replica.ensure_connection()
+        primario.connection.backup(replica.connection)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Réplica sincronizada: {primario.settings_dict['NAME']} → {replica.settings_dict['NAME']}"
+        ))
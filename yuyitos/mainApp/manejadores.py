@@ -0,0 +1,49 @@
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+from .boletas import generar_documento
+from .margenes import actualizar_resumen
+from .models import StockSucursal, Venta
+from .outbox import manejador
+
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------
+# VENTA REGISTRADA
+# -----------------------------
+@manejador('venta_registrada')
+def alertar_stock_bajo(payload):
+    """Avisa de los productos vendidos que quedaron bajo el stock mínimo en la sucursal"""
+    bajos = StockSucursal.objects.filter(
+        sucursal_id=payload['sucursal_id'],
+        producto_id__in=payload['productos'],
+        stock__lt=settings.STOCK_MINIMO_ALERTA,
+    ).select_related('producto', 'sucursal')
+
+    for stock in bajos:
+        logger.warning(
+            "Stock bajo en %s: %s (%s unidades)",
+            stock.sucursal.nombre, stock.producto.nombre, stock.stock
+        )
+
+
+@manejador('venta_registrada')
+def actualizar_resumen_margen(payload):
+    """Recalcula el resumen de margen del día de la venta para los productos vendidos"""
+    fecha = Venta.objects.filter(pk=payload['venta_id']).values_list('fecha', flat=True).first()
+    if fecha is None:
+        return
+    dia = timezone.localdate(fecha)
+    actualizar_resumen(dia, dia, productos=payload['productos'])
+
+
+@manejador('venta_registrada')
+def generar_boleta(payload):
+    """Deja la boleta renderizada en disco para que las reimpresiones no vuelvan a consultar la venta"""
+    venta = Venta.objects.select_related('cliente', 'vendedor', 'sucursal').filter(pk=payload['venta_id']).first()
+    if venta is not None:
+        generar_documento(venta)
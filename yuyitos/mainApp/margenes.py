@@ -0,0 +1,87 @@
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .archivo import incluye_archivo
+from .models import DetalleVenta, DetalleVentaArchivada, ResumenMargenDiario
+
+
+def rango_datetime(desde, hasta):
+    """Convierte un rango de fechas locales en [inicio, fin) con zona horaria, para usar índices sobre fecha"""
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+    return inicio, fin
+
+
+def agregar_detalles(desde, hasta, productos=None):
+    """
+    Cantidad, ingreso y costo por día local y producto, con una consulta agrupada por tabla.
+    Si el rango alcanza ventas archivadas se suman también las del archivo.
+    """
+    inicio, fin = rango_datetime(desde, hasta)
+    modelos = [DetalleVenta]
+    if incluye_archivo(inicio):
+        modelos.append(DetalleVentaArchivada)
+
+    filas = {}
+    for modelo in modelos:
+        for fila in _agregar(modelo, inicio, fin, productos):
+            clave = (fila['dia'], fila['producto_id'])
+            if clave not in filas:
+                filas[clave] = fila
+                continue
+            for campo in ('total_cantidad', 'total_ingreso', 'total_costo'):
+                filas[clave][campo] = (filas[clave][campo] or 0) + (fila[campo] or 0)
+    return list(filas.values())
+
+
+def _agregar(modelo, inicio, fin, productos):
+    detalles = modelo.objects.filter(venta__fecha__gte=inicio, venta__fecha__lt=fin)
+    if productos is not None:
+        detalles = detalles.filter(producto_id__in=productos)
+
+    return detalles.annotate(
+        dia=TruncDate('venta__fecha')
+    ).values(
+        'dia', 'producto_id', 'producto__categoria_id'
+    ).annotate(
+        total_cantidad=Sum('cantidad'),
+        total_ingreso=Sum('subtotal'),
+        total_costo=Sum(
+            F('cantidad') * F('costo_unitario'),
+            output_field=DecimalField(max_digits=14, decimal_places=2)
+        ),
+    ).order_by()
+
+
+def actualizar_resumen(desde, hasta, productos=None):
+    """Recalcula (idempotente) las filas de ResumenMargenDiario del rango y productos indicados"""
+    filas = [
+        ResumenMargenDiario(
+            fecha=fila['dia'],
+            producto_id=fila['producto_id'],
+            categoria_id=fila['producto__categoria_id'],
+            cantidad=fila['total_cantidad'] or 0,
+            ingreso=fila['total_ingreso'] or 0,
+            costo=fila['total_costo'] or 0,
+        )
+        for fila in agregar_detalles(desde, hasta, productos)
+    ]
+    ResumenMargenDiario.objects.bulk_create(
+        filas,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['fecha', 'producto'],
+        update_fields=['categoria', 'cantidad', 'ingreso', 'costo'],
+    )
+    return len(filas)
+
+
+def reconstruir_resumen(desde, hasta):
+    """Borra y vuelve a generar el resumen completo de un rango de fechas"""
+    with transaction.atomic():
+        ResumenMargenDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta).delete()
+        return actualizar_resumen(desde, hasta)
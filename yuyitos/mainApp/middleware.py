@@ -0,0 +1,204 @@
+import mimetypes
+import os
+import random
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+
+from . import consultas_lentas, perfilado, routers
+
+
+# Un año: los nombres hasheados cambian cuando cambia el contenido
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_SIN_HASH = 'public, max-age=60'
+
+# Orden de preferencia de las variantes precomprimidas
+CODIFICACIONES = [('br', '.br'), ('gzip', '.gz')]
+
+
+def calidades(accept_encoding):
+    """{'gzip': 1.0, 'br': 0.0, ...} desde Accept-Encoding; q ausente o inválido cuenta como 1"""
+    resultado = {}
+    for parte in accept_encoding.split(','):
+        cod, _, parametros = parte.partition(';')
+        cod = cod.strip().lower()
+        if not cod:
+            continue
+        q = 1.0
+        for parametro in parametros.split(';'):
+            nombre, _, valor = parametro.partition('=')
+            if nombre.strip().lower() == 'q':
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        resultado[cod] = q
+    return resultado
+
+
+class ArchivosEstaticosMiddleware:
+    """
+    Sirve STATIC_ROOT directamente desde la aplicación, sin servidor web aparte.
+    Elige la variante .br/.gz según Accept-Encoding y marca los archivos
+    hasheados del manifest como inmutables.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        prefijo = urlparse(settings.STATIC_URL).path
+        self.prefijo = '/' + prefijo.strip('/') + '/'
+        self.raiz = settings.STATIC_ROOT
+        self._hasheados = None
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefijo):
+            respuesta = self.servir(request, request.path_info[len(self.prefijo):])
+            if respuesta is not None:
+                return respuesta
+        return self.get_response(request)
+
+    @property
+    def hasheados(self):
+        if self._hasheados is None:
+            self._hasheados = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        return self._hasheados
+
+    def servir(self, request, nombre):
+        try:
+            ruta = safe_join(self.raiz, nombre)
+        except ValueError:
+            return None
+        if not os.path.isfile(ruta):
+            return None
+
+        # Negociación de contenido con las variantes precomprimidas: la de mayor q (q=0 la
+        # rechaza, * cubre las no nombradas) y, a igual q, en el orden de CODIFICACIONES
+        aceptadas = calidades(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        ruta_servida, codificacion, mejor = ruta, None, 0
+        for cod, extension in CODIFICACIONES:
+            q = aceptadas.get(cod, aceptadas.get('*', 0))
+            if q > mejor and os.path.isfile(ruta + extension):
+                ruta_servida, codificacion, mejor = ruta + extension, cod, q
+
+        stat = os.stat(ruta_servida)
+        etag = '"%x-%x%s"' % (int(stat.st_mtime), stat.st_size, '-' + codificacion if codificacion else '')
+
+        if self.no_modificado(request, etag, stat.st_mtime):
+            respuesta = HttpResponseNotModified()
+        else:
+            tipo, _ = mimetypes.guess_type(ruta)
+            respuesta = FileResponse(open(ruta_servida, 'rb'), content_type=tipo or 'application/octet-stream')
+            respuesta['Content-Length'] = stat.st_size
+            if codificacion:
+                respuesta['Content-Encoding'] = codificacion
+
+        respuesta['ETag'] = etag
+        respuesta['Last-Modified'] = http_date(stat.st_mtime)
+        respuesta['Vary'] = 'Accept-Encoding'
+        respuesta['Cache-Control'] = CACHE_INMUTABLE if nombre in self.hasheados else CACHE_SIN_HASH
+        return respuesta
+
+    def no_modificado(self, request, etag, mtime):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            return etag in [e.strip() for e in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+        if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class ReplicaMiddleware:
+    """
+    Activa la réplica de lectura para las vistas de reportes (settings.VISTAS_REPLICA)
+    y los changelists del admin. Si el request escribe, marca una cookie corta para
+    que los requests siguientes del mismo usuario lean del primario.
+    """
+
+    COOKIE = 'fijar_primario'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.vistas = set(getattr(settings, 'VISTAS_REPLICA', []))
+        self.segundos_fijacion = getattr(settings, 'REPLICA_FIJACION_SEGUNDOS', 5)
+
+    def __call__(self, request):
+        tokens = routers.iniciar_request()
+        try:
+            respuesta = self.get_response(request)
+            escribio = routers.escribio_en_primario()
+        finally:
+            routers.restaurar(tokens)
+
+        if escribio and routers.replica_configurada():
+            respuesta.set_cookie(self.COOKIE, '1', max_age=self.segundos_fijacion, httponly=True, samesite='Lax')
+        return respuesta
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not routers.replica_configurada():
+            return None
+        if request.method not in ('GET', 'HEAD') or request.COOKIES.get(self.COOKIE):
+            return None
+
+        match = request.resolver_match
+        es_changelist = 'admin' in match.namespaces and (match.url_name or '').endswith('_changelist')
+        if match.url_name in self.vistas or es_changelist:
+            routers.activar_replica()
+        return None
+
+
+class PerfiladoMiddleware:
+    """
+    Perfila requests con cProfile y registra su línea de tiempo SQL. Un superusuario lo
+    pide con ?perfilar=1 o la cabecera X-Perfilar: 1; además se perfila al azar la
+    fracción settings.PERFILADO_MUESTREO de todos los requests (0 lo desactiva).
+    """
+
+    PARAMETRO = 'perfilar'
+    CABECERA = 'HTTP_X_PERFILAR'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.muestreo = getattr(settings, 'PERFILADO_MUESTREO', 0)
+
+    def __call__(self, request):
+        motivo = self.motivo(request)
+        if motivo is None:
+            return self.get_response(request)
+        return perfilado.perfilar(request, self.get_response, motivo)
+
+    def motivo(self, request):
+        pedido = request.GET.get(self.PARAMETRO) == '1' or request.META.get(self.CABECERA) == '1'
+        if pedido and request.user.is_superuser:
+            return 'solicitado'
+        if self.muestreo and random.random() < self.muestreo:
+            return 'muestreo'
+        return None
+
+
+class ConsultasLentasMiddleware:
+    """Deja la vista (url_name) y el rol del request a mano del registro de consultas lentas"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = consultas_lentas.iniciar_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            consultas_lentas.terminar_request(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        consultas_lentas.fijar_vista(match.view_name if match else view_func.__name__)
+        return None
@@ -0,0 +1,119 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def crear_casa_matriz(apps, schema_editor):
+    """Crea la sucursal inicial y le asigna el stock, las ventas y las recepciones existentes"""
+    Sucursal = apps.get_model('mainApp', 'Sucursal')
+    Producto = apps.get_model('mainApp', 'Producto')
+    StockSucursal = apps.get_model('mainApp', 'StockSucursal')
+    Venta = apps.get_model('mainApp', 'Venta')
+    RecepcionProducto = apps.get_model('mainApp', 'RecepcionProducto')
+
+    matriz, _ = Sucursal.objects.get_or_create(codigo='001', defaults={'nombre': 'Casa Matriz'})
+
+    StockSucursal.objects.bulk_create(
+        [
+            StockSucursal(sucursal=matriz, producto_id=producto_id, stock=stock)
+            for producto_id, stock in Producto.objects.values_list('id', 'stock').iterator()
+        ],
+        batch_size=1000,
+    )
+    Venta.objects.update(sucursal=matriz)
+    RecepcionProducto.objects.update(sucursal=matriz)
+
+
+CREAR_VISTA_STOCK_TOTAL = """
+CREATE VIEW "mainApp_stocktotal" AS
+SELECT p."id" AS "producto_id", COALESCE(SUM(s."stock"), 0) AS "stock"
+FROM "mainApp_producto" p
+LEFT JOIN "mainApp_stocksucursal" s ON s."producto_id" = p."id"
+GROUP BY p."id"
+"""
+
+BORRAR_VISTA_STOCK_TOTAL = 'DROP VIEW IF EXISTS "mainApp_stocktotal"'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sucursal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(help_text='Código de 3 dígitos (ej: 001)', max_length=3, unique=True)),
+                ('nombre', models.CharField(max_length=100)),
+                ('direccion', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Sucursales',
+            },
+        ),
+        migrations.CreateModel(
+            name='PerfilUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='usuarios', to='mainApp.sucursal')),
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='perfil', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Perfiles de Usuario',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSucursal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.IntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stocks', to='mainApp.producto')),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stocks', to='mainApp.sucursal')),
+            ],
+            options={
+                'verbose_name_plural': 'Stock por Sucursal',
+                'constraints': [models.UniqueConstraint(fields=('sucursal', 'producto'), name='stock_unico_por_sucursal')],
+            },
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='sucursal',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='mainApp.sucursal'),
+        ),
+        migrations.AddField(
+            model_name='recepcionproducto',
+            name='sucursal',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='mainApp.sucursal'),
+        ),
+        migrations.RunPython(crear_casa_matriz, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='venta',
+            name='sucursal',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='mainApp.sucursal'),
+        ),
+        migrations.AlterField(
+            model_name='recepcionproducto',
+            name='sucursal',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='mainApp.sucursal'),
+        ),
+        migrations.RemoveField(
+            model_name='producto',
+            name='stock',
+        ),
+        migrations.RunSQL(CREAR_VISTA_STOCK_TOTAL, BORRAR_VISTA_STOCK_TOTAL),
+        migrations.CreateModel(
+            name='StockTotal',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='stock_total', serialize=False, to='mainApp.producto')),
+                ('stock', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'mainApp_stocktotal',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def cargar_historial_inicial(apps, schema_editor):
+    """
+    Abre un tramo de precios por producto con los valores actuales y usa el costo actual
+    como mejor aproximación del costo de las ventas anteriores a este cambio.
+    """
+    Producto = apps.get_model('mainApp', 'Producto')
+    DetalleVenta = apps.get_model('mainApp', 'DetalleVenta')
+    HistorialPrecio = apps.get_model('mainApp', 'HistorialPrecio')
+
+    HistorialPrecio.objects.bulk_create(
+        [
+            HistorialPrecio(
+                producto_id=p['id'],
+                precio=p['precio'],
+                precio_compra=p['precio_compra'],
+                vigente_desde=p['fecha_registro'],
+            )
+            for p in Producto.objects.values('id', 'precio', 'precio_compra', 'fecha_registro').iterator()
+        ],
+        batch_size=1000,
+    )
+    DetalleVenta.objects.update(
+        costo_unitario=Subquery(
+            Producto.objects.filter(pk=OuterRef('producto_id')).values('precio_compra')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0003_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detalleventa',
+            name='costo_unitario',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Precio de compra al momento de la venta', max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='HistorialPrecio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('precio_compra', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('vigente_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('vigente_hasta', models.DateTimeField(blank=True, null=True)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_precios', to='mainApp.producto')),
+            ],
+            options={
+                'verbose_name_plural': 'Historial de Precios',
+                'ordering': ['-vigente_desde'],
+                'indexes': [models.Index(fields=['producto', 'vigente_desde'], name='historial_producto_desde')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenMargenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('cantidad', models.IntegerField(default=0)),
+                ('ingreso', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('costo', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mainApp.categoriaproducto')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_margen', to='mainApp.producto')),
+            ],
+            options={
+                'verbose_name_plural': 'Resúmenes de Margen Diario',
+                'indexes': [models.Index(fields=['categoria', 'fecha'], name='resumen_categoria_fecha'), models.Index(fields=['producto', 'fecha'], name='resumen_producto_fecha')],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'producto'), name='resumen_margen_unico')],
+            },
+        ),
+        migrations.RunPython(cargar_historial_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Copias de mainApp.clientes al momento de esta migración: la migración no debe cambiar si ese
+# módulo cambia después
+def normalizar_rut(rut):
+    return re.sub(r'[^0-9K]', '', (rut or '').upper()).lstrip('0')
+
+
+def normalizar_nombre(texto):
+    sin_tildes = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(sin_tildes.lower().split())
+
+
+def normalizar_clientes(apps, schema_editor):
+    """Llena las columnas normalizadas y avisa si dos clientes quedan con el mismo RUT"""
+    Cliente = apps.get_model('mainApp', 'Cliente')
+
+    clientes = list(Cliente.objects.only('id', 'rut', 'nombre', 'apellido'))
+    vistos = {}
+    for cliente in clientes:
+        cliente.rut_normalizado = normalizar_rut(cliente.rut)
+        cliente.nombre_normalizado = normalizar_nombre(f"{cliente.nombre} {cliente.apellido}")
+        if cliente.rut_normalizado in vistos:
+            raise RuntimeError(
+                f"Los clientes {vistos[cliente.rut_normalizado]} y {cliente.id} tienen el mismo RUT "
+                f"({cliente.rut}) escrito con distinto formato. Unifíquelos antes de migrar."
+            )
+        vistos[cliente.rut_normalizado] = cliente.id
+
+    Cliente.objects.bulk_update(clientes, ['rut_normalizado', 'nombre_normalizado'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0004_historial_precios_y_margenes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='rut_normalizado',
+            field=models.CharField(default='', editable=False, max_length=12),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='nombre_normalizado',
+            field=models.CharField(default='', editable=False, max_length=401),
+            preserve_default=False,
+        ),
+        migrations.RunPython(normalizar_clientes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cliente',
+            name='rut_normalizado',
+            field=models.CharField(editable=False, max_length=12, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='cliente',
+            name='nombre_normalizado',
+            field=models.CharField(db_index=True, editable=False, max_length=401),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from importlib import import_module
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+# SQLite reconstruye la tabla de productos al agregar la columna y no permite hacerlo
+# con la vista de stock total apuntándole: se borra y se vuelve a crear alrededor
+sucursales = import_module('mainApp.migrations.0002_sucursales')
+
+
+def marcar_modificacion_inicial(apps, schema_editor):
+    Producto = apps.get_model('mainApp', 'Producto')
+    Producto.objects.update(updated_at=F('fecha_registro'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0005_cliente_rut_normalizado'),
+    ]
+
+    operations = [
+        migrations.RunSQL(sucursales.BORRAR_VISTA_STOCK_TOTAL, sucursales.CREAR_VISTA_STOCK_TOTAL),
+        migrations.AddField(
+            model_name='producto',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(marcar_modificacion_inicial, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['updated_at', 'id'], name='producto_updated_id'),
+        ),
+        migrations.RunSQL(sucursales.CREAR_VISTA_STOCK_TOTAL, sucursales.BORRAR_VISTA_STOCK_TOTAL),
+        migrations.CreateModel(
+            name='ProductoEliminado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('producto_id', models.IntegerField()),
+                ('codigo', models.CharField(max_length=17)),
+                ('eliminado_en', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'Productos Eliminados',
+                'indexes': [models.Index(fields=['eliminado_en', 'id'], name='eliminado_en_id')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Planes de `manage.py analizar_indices` en SQLite con los datos de cargar_demo.
+#
+# Antes:
+#   Abono.save (ventas a crédito pendientes)  SEARCH venta USING INDEX cliente_id + TEMP B-TREE ORDER BY
+#   ventas (por vendedor)                    SEARCH venta USING INDEX vendedor_id + TEMP B-TREE ORDER BY
+#   ventas (admin, últimas 20)               SCAN venta + TEMP B-TREE ORDER BY
+#   home (ventas del mes)                    SCAN venta + TEMP B-TREE ORDER BY
+#   ficha_credito (ventas a crédito)         SEARCH venta USING INDEX cliente_id + TEMP B-TREE ORDER BY
+#   ficha_credito (abonos)                   SEARCH abono USING INDEX cliente_id + TEMP B-TREE ORDER BY
+#   margenes (detalles del período)          SCAN detalleventa completo, venta por PK para cada detalle
+#
+# Después:
+#   Abono.save, ficha_credito                SEARCH venta USING INDEX venta_cliente_pago_fecha, sin ordenar
+#   ventas (por vendedor)                    SEARCH venta USING INDEX venta_vendedor_fecha, sin ordenar
+#   ventas (admin), home                     SCAN/SEARCH venta USING INDEX venta_fecha, sin ordenar
+#   ficha_credito (abonos)                   SEARCH abono USING INDEX abono_cliente_fecha, sin ordenar
+#   margenes (detalles del período)          SEARCH venta USING COVERING INDEX venta_fecha (rango)
+#
+# venta_credito_pendiente es parcial: PostgreSQL la usa para Abono.save con valores literales;
+# SQLite no la considera con parámetros enlazados y usa venta_cliente_pago_fecha.
+# Sigue marcada la vista agregada de stock total (home), que no admite índice.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0006_producto_updated_at_eliminados'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='abono',
+            index=models.Index(fields=['cliente', '-fecha'], name='abono_cliente_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['-fecha'], name='venta_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['vendedor', '-fecha'], name='venta_vendedor_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['cliente', 'tipo_pago', '-fecha'], name='venta_cliente_pago_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(condition=models.Q(('estado_credito', 'PENDIENTE'), ('tipo_pago', 'credito')), fields=['cliente', '-fecha'], name='venta_credito_pendiente'),
+        ),
+    ]
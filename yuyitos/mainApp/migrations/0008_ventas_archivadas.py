@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0007_indices_consultas_frecuentes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('numero_boleta', models.CharField(max_length=10, unique=True)),
+                ('tipo_pago', models.CharField(choices=[('contado', 'Contado'), ('credito', 'Crédito')], max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha', models.DateTimeField()),
+                ('estado_credito', models.CharField(choices=[('PENDIENTE', 'PENDIENTE'), ('CANCELADA', 'CANCELADA')], max_length=20)),
+                ('archivada_en', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ventas_archivadas', to='mainApp.cliente')),
+                ('sucursal', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='mainApp.sucursal')),
+                ('vendedor', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Ventas Archivadas',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DetalleVentaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('cantidad', models.IntegerField()),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('costo_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='mainApp.producto')),
+                ('venta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detalles', to='mainApp.ventaarchivada')),
+            ],
+            options={
+                'verbose_name_plural': 'Detalles de Ventas Archivadas',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['-fecha'], name='venta_archivada_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['cliente', 'tipo_pago', '-fecha'], name='venta_arch_cliente_pago_fecha'),
+        ),
+    ]
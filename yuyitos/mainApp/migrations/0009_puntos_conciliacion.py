@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0008_ventas_archivadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PuntoConciliacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('deuda', 'Deuda de cliente'), ('stock', 'Stock por sucursal')], max_length=5)),
+                ('objeto_id', models.BigIntegerField()),
+                ('base', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('corte', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Puntos de Conciliación',
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'objeto_id'), name='punto_conciliacion_unico')],
+            },
+        ),
+    ]
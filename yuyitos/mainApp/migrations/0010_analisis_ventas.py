@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0009_puntos_conciliacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClasificacionABC',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='clasificacion_abc', serialize=False, to='mainApp.producto')),
+                ('clase', models.CharField(choices=[('A', 'A'), ('B', 'B'), ('C', 'C')], db_index=True, max_length=1)),
+                ('ingreso', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('participacion', models.FloatField(help_text='Fracción del ingreso total')),
+                ('acumulado', models.FloatField(help_text='Fracción acumulada, de mayor a menor ingreso')),
+                ('calculado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Clasificación ABC',
+            },
+        ),
+        migrations.CreateModel(
+            name='AsociacionProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ventas_juntas', models.IntegerField()),
+                ('soporte', models.FloatField(help_text='Fracción de las ventas que llevan ambos productos')),
+                ('confianza', models.FloatField(help_text='Fracción de las ventas con el producto que también llevan el asociado')),
+                ('lift', models.FloatField(help_text='Cuántas veces más se venden juntos que si fueran independientes')),
+                ('asociado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='mainApp.producto')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='asociaciones', to='mainApp.producto')),
+            ],
+            options={
+                'verbose_name_plural': 'Asociaciones de Productos',
+                'indexes': [models.Index(fields=['producto', '-lift'], name='asociacion_producto_lift')],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'asociado'), name='asociacion_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0010_analisis_ventas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoBoleta',
+            fields=[
+                ('numero_boleta', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('venta_id', models.BigIntegerField(unique=True)),
+                ('vendedor_id', models.IntegerField()),
+                ('fecha', models.DateTimeField(db_index=True)),
+                ('html', models.CharField(max_length=120)),
+                ('pdf', models.CharField(blank=True, max_length=120)),
+                ('huella', models.CharField(help_text='SHA-256 del HTML', max_length=64)),
+                ('generado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Documentos de Boleta',
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0011_documentos_boleta'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CierreCaja',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desde', models.DateTimeField()),
+                ('hasta', models.DateTimeField()),
+                ('cerrado_en', models.DateTimeField(auto_now_add=True)),
+                ('cantidad_ventas', models.IntegerField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'Cierres de Caja',
+                'ordering': ['-hasta'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LineaCierreCaja',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo_pago', models.CharField(choices=[('contado', 'Contado'), ('credito', 'Crédito')], max_length=10)),
+                ('cantidad', models.IntegerField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'Líneas de Cierre de Caja',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['sucursal', 'fecha'], name='venta_sucursal_fecha'),
+        ),
+        migrations.AddField(
+            model_name='cierrecaja',
+            name='cerrado_por',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='cierrecaja',
+            name='sucursal',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='cierres', to='mainApp.sucursal'),
+        ),
+        migrations.AddField(
+            model_name='lineacierrecaja',
+            name='cierre',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='mainApp.cierrecaja'),
+        ),
+        migrations.AddField(
+            model_name='lineacierrecaja',
+            name='vendedor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='cierrecaja',
+            index=models.Index(fields=['sucursal', '-hasta'], name='cierre_sucursal_hasta'),
+        ),
+        migrations.AddConstraint(
+            model_name='cierrecaja',
+            constraint=models.UniqueConstraint(fields=('sucursal', 'desde'), name='cierre_unico_por_turno'),
+        ),
+        migrations.AddConstraint(
+            model_name='lineacierrecaja',
+            constraint=models.UniqueConstraint(fields=('cierre', 'vendedor', 'tipo_pago'), name='linea_cierre_unica'),
+        ),
+    ]
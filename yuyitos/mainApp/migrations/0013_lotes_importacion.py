@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0012_cierres_caja'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteImportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('importacion', models.CharField(help_text='Huella del archivo y de cómo se partió', max_length=64)),
+                ('particion', models.IntegerField()),
+                ('lote', models.IntegerField()),
+                ('ventas', models.IntegerField()),
+                ('lineas', models.IntegerField()),
+                ('desde', models.DateTimeField(null=True)),
+                ('hasta', models.DateTimeField(null=True)),
+                ('ajustes', models.JSONField(default=dict)),
+                ('aplicado', models.BooleanField(default=False)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Lotes de Importación',
+                'constraints': [models.UniqueConstraint(fields=('importacion', 'particion', 'lote'), name='lote_importacion_unico')],
+            },
+        ),
+    ]
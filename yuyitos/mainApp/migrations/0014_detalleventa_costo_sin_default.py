@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0013_lotes_importacion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='detalleventa',
+            name='costo_unitario',
+            field=models.DecimalField(decimal_places=2, help_text='Precio de compra al momento de la venta', max_digits=10),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainApp', '0014_detalleventa_costo_sin_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventooutbox',
+            index=models.Index(fields=['estado', 'procesado_en'], name='outbox_estado_procesado'),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from .clientes import normalizar_nombre, normalizar_rut, validar_rut
+
 class Proveedor(models.Model):
     id_proveedor = models.CharField(max_length=3, unique=True, help_text="ID de 3 dígitos (ej: 001)")
     nombre = models.CharField(max_length=200)
@@ -37,6 +39,33 @@ class CategoriaProducto(models.Model):
         verbose_name_plural = "Categorías de Productos"
 
 
+class Sucursal(models.Model):
+    codigo = models.CharField(max_length=3, unique=True, help_text="Código de 3 dígitos (ej: 001)")
+    nombre = models.CharField(max_length=100)
+    direccion = models.TextField(blank=True)
+
+    def clean(self):
+        if not self.codigo.isdigit() or len(self.codigo) != 3:
+            raise ValidationError({'codigo': 'Debe ser un número de 3 dígitos (ej: 001)'})
+
+    def __str__(self):
+        return self.nombre
+
+    class Meta:
+        verbose_name_plural = "Sucursales"
+
+
+class PerfilUsuario(models.Model):
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, related_name='perfil')
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.PROTECT, related_name='usuarios')
+
+    def __str__(self):
+        return f"{self.usuario.username} - {self.sucursal.nombre}"
+
+    class Meta:
+        verbose_name_plural = "Perfiles de Usuario"
+
+
 class Producto(models.Model):
     codigo = models.CharField(max_length=17, unique=True, editable=False, help_text="Generado automáticamente")
     nombre = models.CharField(max_length=200)
@@ -46,9 +75,11 @@ class Producto(models.Model):
     precio_compra = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="Precio de compra")
     precio = models.DecimalField(max_digits=10, decimal_places=2, help_text="Precio de venta")
     marca = models.CharField(max_length=100, blank=True)
-    stock = models.IntegerField(default=0)
     fecha_vencimiento = models.DateField(null=True, blank=True)
     fecha_registro = models.DateTimeField(auto_now_add=True)
+    # Marca de modificación para la sincronización incremental de las cajas. Los UPDATE
+    # masivos sobre productos deben asignarla a mano (auto_now solo actúa en save())
+    updated_at = models.DateTimeField(auto_now=True)
     numero_secuencial = models.CharField(max_length=3, editable=False, default='001', help_text="Generado automáticamente")
 
     def generar_codigo(self):
@@ -87,12 +118,96 @@ class Producto(models.Model):
         if not self.codigo:
             self.codigo = self.generar_codigo()
         super().save(*args, **kwargs)
+        self.registrar_historial_precio()
+
+    def registrar_historial_precio(self):
+        """Cierra el tramo de precios vigente y abre uno nuevo si precio o costo cambiaron"""
+        vigente = self.historial_precios.filter(vigente_hasta__isnull=True).first()
+        if vigente and vigente.precio == self.precio and vigente.precio_compra == self.precio_compra:
+            return
+
+        ahora = timezone.now()
+        if vigente:
+            self.historial_precios.filter(pk=vigente.pk).update(vigente_hasta=ahora)
+        HistorialPrecio.objects.create(
+            producto=self,
+            precio=self.precio,
+            precio_compra=self.precio_compra,
+            vigente_desde=ahora
+        )
 
     def __str__(self):
         return f"{self.codigo} - {self.nombre}"
 
     class Meta:
         verbose_name_plural = "Productos"
+        indexes = [
+            # Recorrido por cursor (updated_at, id) de la sincronización de catálogo
+            models.Index(fields=['updated_at', 'id'], name='producto_updated_id'),
+        ]
+
+
+class ProductoEliminado(models.Model):
+    """Lápida de un producto borrado, para que las cajas lo quiten de su catálogo local"""
+    producto_id = models.IntegerField()
+    codigo = models.CharField(max_length=17)
+    eliminado_en = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.codigo} eliminado el {self.eliminado_en:%d/%m/%Y %H:%M}"
+
+    class Meta:
+        verbose_name_plural = "Productos Eliminados"
+        indexes = [
+            models.Index(fields=['eliminado_en', 'id'], name='eliminado_en_id'),
+        ]
+
+
+class HistorialPrecio(models.Model):
+    """Tramo de vigencia de un precio de venta y costo; vigente_hasta nulo = vigente hoy"""
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='historial_precios')
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    precio_compra = models.DecimalField(max_digits=10, decimal_places=2)
+    vigente_desde = models.DateTimeField(default=timezone.now)
+    vigente_hasta = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.producto.nombre}: ${self.precio} (costo ${self.precio_compra}) desde {self.vigente_desde:%d/%m/%Y}"
+
+    class Meta:
+        verbose_name_plural = "Historial de Precios"
+        ordering = ['-vigente_desde']
+        indexes = [
+            models.Index(fields=['producto', 'vigente_desde'], name='historial_producto_desde'),
+        ]
+
+
+class StockSucursal(models.Model):
+    """Stock de un producto en una sucursal: cada caja solo toca las filas de su sucursal"""
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.PROTECT, related_name='stocks')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='stocks')
+    stock = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.producto.nombre} en {self.sucursal.nombre}: {self.stock}"
+
+    class Meta:
+        verbose_name_plural = "Stock por Sucursal"
+        constraints = [
+            models.UniqueConstraint(fields=['sucursal', 'producto'], name='stock_unico_por_sucursal'),
+        ]
+
+
+class StockTotal(models.Model):
+    """Stock total del catálogo, vista SQL que agrega StockSucursal (solo lectura)"""
+    producto = models.OneToOneField(
+        Producto, on_delete=models.DO_NOTHING, primary_key=True, related_name='stock_total'
+    )
+    stock = models.IntegerField()
+
+    class Meta:
+        managed = False
+        db_table = 'mainApp_stocktotal'
 
 
 class Cliente(models.Model):
@@ -104,6 +219,11 @@ class Cliente(models.Model):
     nombre = models.CharField(max_length=200)
     apellido = models.CharField(max_length=200, default='')
     rut = models.CharField(max_length=12, unique=True)
+    # Columnas derivadas para búsqueda: RUT sin formato (búsqueda exacta) y nombre
+    # completo en minúsculas y sin tildes (búsqueda por prefijo)
+    # Mismo largo que `rut`: un RUT antiguo sin puntos ni guion puede ocupar los 12 caracteres
+    rut_normalizado = models.CharField(max_length=12, unique=True, editable=False)
+    nombre_normalizado = models.CharField(max_length=401, db_index=True, editable=False)
     telefono = models.CharField(max_length=15)
     direccion = models.TextField()
     email = models.EmailField()
@@ -112,6 +232,23 @@ class Cliente(models.Model):
     estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='activo')
     fecha_registro = models.DateTimeField(auto_now_add=True)
 
+    def clean(self):
+        try:
+            validar_rut(self.rut)
+        except ValidationError as error:
+            raise ValidationError({'rut': error.messages})
+        duplicado = Cliente.objects.filter(rut_normalizado=normalizar_rut(self.rut)).exclude(pk=self.pk)
+        if duplicado.exists():
+            raise ValidationError({'rut': 'Ya existe un cliente con este RUT.'})
+
+    def save(self, *args, **kwargs):
+        self.rut_normalizado = normalizar_rut(self.rut)
+        self.nombre_normalizado = normalizar_nombre(f"{self.nombre} {self.apellido}")
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'rut_normalizado', 'nombre_normalizado'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.nombre} {self.apellido} - {self.rut}"
 
@@ -128,6 +265,7 @@ class Venta(models.Model):
     numero_boleta = models.CharField(max_length=10, unique=True)
     cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT)
     vendedor = models.ForeignKey(User, on_delete=models.PROTECT)
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.PROTECT)
     tipo_pago = models.CharField(max_length=10, choices=TIPO_PAGO_CHOICES)
     total = models.DecimalField(max_digits=10, decimal_places=2)
     fecha = models.DateTimeField(default=timezone.now)
@@ -143,6 +281,18 @@ class Venta(models.Model):
     class Meta:
         verbose_name_plural = "Ventas"
         ordering = ['-fecha']
+        # Ver analizar_indices: listados por vendedor y por fecha, ficha de crédito del
+        # cliente, ventas pendientes que Abono.save cancela y ventas del turno en el cierre de caja
+        indexes = [
+            models.Index(fields=['-fecha'], name='venta_fecha'),
+            models.Index(fields=['vendedor', '-fecha'], name='venta_vendedor_fecha'),
+            models.Index(fields=['cliente', 'tipo_pago', '-fecha'], name='venta_cliente_pago_fecha'),
+            models.Index(fields=['sucursal', 'fecha'], name='venta_sucursal_fecha'),
+            models.Index(
+                fields=['cliente', '-fecha'], name='venta_credito_pendiente',
+                condition=models.Q(tipo_pago='credito', estado_credito='PENDIENTE'),
+            ),
+        ]
 
 
 class DetalleVenta(models.Model):
@@ -150,16 +300,191 @@ class DetalleVenta(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.PROTECT)
     cantidad = models.IntegerField()
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    costo_unitario = models.DecimalField(max_digits=10, decimal_places=2, help_text="Precio de compra al momento de la venta")
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
 
     def save(self, *args, **kwargs):
         self.subtotal = self.cantidad * self.precio_unitario
+        # Líneas creadas fuera de registrar_venta (p. ej. el admin): costo vigente del producto
+        if self.costo_unitario is None:
+            self.costo_unitario = self.producto.precio_compra
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.producto.nombre} x{self.cantidad}"
 
 
+class VentaArchivada(models.Model):
+    """Venta cerrada y antigua movida fuera de la tabla activa por archivar_ventas (conserva su id)"""
+    id = models.BigIntegerField(primary_key=True)
+    numero_boleta = models.CharField(max_length=10, unique=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, related_name='ventas_archivadas')
+    vendedor = models.ForeignKey(User, on_delete=models.PROTECT, related_name='+')
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.PROTECT, related_name='+')
+    tipo_pago = models.CharField(max_length=10, choices=Venta.TIPO_PAGO_CHOICES)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    fecha = models.DateTimeField()
+    estado_credito = models.CharField(max_length=20, choices=[("PENDIENTE", "PENDIENTE"), ("CANCELADA", "CANCELADA")])
+    archivada_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Boleta {self.numero_boleta} - ${self.total} (archivada)"
+
+    class Meta:
+        verbose_name_plural = "Ventas Archivadas"
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['-fecha'], name='venta_archivada_fecha'),
+            models.Index(fields=['cliente', 'tipo_pago', '-fecha'], name='venta_arch_cliente_pago_fecha'),
+        ]
+
+
+class DetalleVentaArchivada(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    venta = models.ForeignKey(VentaArchivada, on_delete=models.CASCADE, related_name='detalles')
+    producto = models.ForeignKey(Producto, on_delete=models.PROTECT, related_name='+')
+    cantidad = models.IntegerField()
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    costo_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.producto.nombre} x{self.cantidad}"
+
+    class Meta:
+        verbose_name_plural = "Detalles de Ventas Archivadas"
+
+
+class DocumentoBoleta(models.Model):
+    """
+    Boleta ya renderizada (HTML y, si weasyprint está instalado, PDF), guardada en MEDIA_ROOT con
+    el hash del contenido como nombre. Sirve para reimprimir sin volver a consultar la venta.
+    """
+    numero_boleta = models.CharField(max_length=10, primary_key=True)
+    # Sin FK: la venta puede pasar al archivo y la boleta se sigue sirviendo igual
+    venta_id = models.BigIntegerField(unique=True)
+    vendedor_id = models.IntegerField()
+    fecha = models.DateTimeField(db_index=True)
+    html = models.CharField(max_length=120)
+    pdf = models.CharField(max_length=120, blank=True)
+    huella = models.CharField(max_length=64, help_text="SHA-256 del HTML")
+    generado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Boleta {self.numero_boleta} ({self.huella[:12]})"
+
+    class Meta:
+        verbose_name_plural = "Documentos de Boleta"
+
+
+class CierreCaja(models.Model):
+    """Cierre de un turno de caja en una sucursal: foto inmutable de las ventas en [desde, hasta)"""
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.PROTECT, related_name='cierres')
+    desde = models.DateTimeField()
+    hasta = models.DateTimeField()
+    cerrado_por = models.ForeignKey(User, on_delete=models.PROTECT, related_name='+')
+    cerrado_en = models.DateTimeField(auto_now_add=True)
+    cantidad_ventas = models.IntegerField()
+    total = models.DecimalField(max_digits=14, decimal_places=2)
+
+    def __str__(self):
+        return f"Cierre {self.sucursal.nombre} {self.hasta:%d/%m/%Y %H:%M}"
+
+    class Meta:
+        verbose_name_plural = "Cierres de Caja"
+        ordering = ['-hasta']
+        constraints = [
+            # Dos cierres simultáneos de la misma sucursal parten del mismo `desde`: uno falla
+            models.UniqueConstraint(fields=['sucursal', 'desde'], name='cierre_unico_por_turno'),
+        ]
+        indexes = [
+            models.Index(fields=['sucursal', '-hasta'], name='cierre_sucursal_hasta'),
+        ]
+
+
+class LineaCierreCaja(models.Model):
+    """Ventas de un vendedor con un tipo de pago dentro de un cierre"""
+    cierre = models.ForeignKey(CierreCaja, on_delete=models.CASCADE, related_name='lineas')
+    vendedor = models.ForeignKey(User, on_delete=models.PROTECT, related_name='+')
+    tipo_pago = models.CharField(max_length=10, choices=Venta.TIPO_PAGO_CHOICES)
+    cantidad = models.IntegerField()
+    total = models.DecimalField(max_digits=14, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.vendedor.username} {self.tipo_pago}: ${self.total}"
+
+    class Meta:
+        verbose_name_plural = "Líneas de Cierre de Caja"
+        constraints = [
+            models.UniqueConstraint(fields=['cierre', 'vendedor', 'tipo_pago'], name='linea_cierre_unica'),
+        ]
+
+
+class ResumenMargenDiario(models.Model):
+    """Ventas y costo por producto y día, para reportes de margen sin recorrer DetalleVenta"""
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='resumenes_margen')
+    categoria = models.ForeignKey(CategoriaProducto, on_delete=models.CASCADE)
+    cantidad = models.IntegerField(default=0)
+    ingreso = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    costo = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.fecha:%d/%m/%Y} {self.producto.nombre}: ${self.ingreso - self.costo}"
+
+    class Meta:
+        verbose_name_plural = "Resúmenes de Margen Diario"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='resumen_margen_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['categoria', 'fecha'], name='resumen_categoria_fecha'),
+            models.Index(fields=['producto', 'fecha'], name='resumen_producto_fecha'),
+        ]
+
+
+class AsociacionProducto(models.Model):
+    """Par de productos que aparecen juntos en las ventas (analizar_ventas); se guarda en ambos sentidos"""
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='asociaciones')
+    asociado = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='+')
+    ventas_juntas = models.IntegerField()
+    soporte = models.FloatField(help_text="Fracción de las ventas que llevan ambos productos")
+    confianza = models.FloatField(help_text="Fracción de las ventas con el producto que también llevan el asociado")
+    lift = models.FloatField(help_text="Cuántas veces más se venden juntos que si fueran independientes")
+
+    def __str__(self):
+        return f"{self.producto.nombre} → {self.asociado.nombre} (lift {self.lift:.2f})"
+
+    class Meta:
+        verbose_name_plural = "Asociaciones de Productos"
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'asociado'], name='asociacion_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['producto', '-lift'], name='asociacion_producto_lift'),
+        ]
+
+
+class ClasificacionABC(models.Model):
+    """Clase ABC de cada producto según su aporte al ingreso del período analizado"""
+    CLASE_CHOICES = [('A', 'A'), ('B', 'B'), ('C', 'C')]
+
+    producto = models.OneToOneField(
+        Producto, on_delete=models.CASCADE, primary_key=True, related_name='clasificacion_abc'
+    )
+    clase = models.CharField(max_length=1, choices=CLASE_CHOICES, db_index=True)
+    ingreso = models.DecimalField(max_digits=14, decimal_places=2)
+    participacion = models.FloatField(help_text="Fracción del ingreso total")
+    acumulado = models.FloatField(help_text="Fracción acumulada, de mayor a menor ingreso")
+    calculado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.producto.nombre}: {self.clase}"
+
+    class Meta:
+        verbose_name_plural = "Clasificación ABC"
+
+
 class Abono(models.Model):
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name="abonos")
     numero_boleta = models.CharField(max_length=10, blank=True)
@@ -191,6 +516,11 @@ class Abono(models.Model):
     def __str__(self):
         return f"Abono {self.cliente.nombre} - ${self.monto}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['cliente', '-fecha'], name='abono_cliente_fecha'),
+        ]
+
 
 class OrdenPedido(models.Model):
     proveedor = models.ForeignKey(Proveedor, on_delete=models.PROTECT)
@@ -218,6 +548,7 @@ class DetalleOrdenPedido(models.Model):
 
 class RecepcionProducto(models.Model):
     orden = models.ForeignKey(OrdenPedido, on_delete=models.PROTECT)
+    sucursal = models.ForeignKey(Sucursal, on_delete=models.PROTECT)
     fecha_recepcion = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
@@ -233,4 +564,86 @@ class DetalleRecepcion(models.Model):
     cantidad_recibida = models.IntegerField()
 
     def __str__(self):
-        return f"{self.producto.nombre} recibidos: {self.cantidad_recibida}"
\ No newline at end of file
+        return f"{self.producto.nombre} recibidos: {self.cantidad_recibida}"
+
+class EventoOutbox(models.Model):
+    """Efecto secundario pendiente, escrito en la misma transacción que lo origina"""
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('procesado', 'Procesado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    tipo = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    disponible_desde = models.DateTimeField(default=timezone.now)
+    bloqueado_hasta = models.DateTimeField(null=True, blank=True)
+    reclamado_por = models.CharField(max_length=32, blank=True)
+    ultimo_error = models.TextField(blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    procesado_en = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.tipo} #{self.id} ({self.estado})"
+
+    class Meta:
+        verbose_name_plural = "Eventos Outbox"
+        indexes = [
+            models.Index(fields=['estado', 'disponible_desde'], name='outbox_estado_disponible'),
+            models.Index(fields=['estado', 'procesado_en'], name='outbox_estado_procesado'),
+        ]
+
+
+class PuntoConciliacion(models.Model):
+    """
+    Último saldo conciliado de un cliente (deuda) o de una fila de StockSucursal: la próxima
+    conciliación parte de `base` y solo recorre los movimientos posteriores a `corte`.
+    """
+    TIPO_CHOICES = [
+        ('deuda', 'Deuda de cliente'),
+        ('stock', 'Stock por sucursal'),
+    ]
+
+    tipo = models.CharField(max_length=5, choices=TIPO_CHOICES)
+    objeto_id = models.BigIntegerField()
+    base = models.DecimalField(max_digits=14, decimal_places=2)
+    corte = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.objeto_id}: {self.base} al {self.corte:%d/%m/%Y %H:%M}"
+
+    class Meta:
+        verbose_name_plural = "Puntos de Conciliación"
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'objeto_id'], name='punto_conciliacion_unico'),
+        ]
+
+
+class LoteImportacion(models.Model):
+    """
+    Lote de ventas históricas ya cargado por importar_ventas. Se escribe en la misma transacción
+    que las ventas: al reanudar, los lotes registrados se saltan. `ajustes` guarda el stock
+    vendido y la deuda generada por el lote, que se aplican todos juntos al final.
+    """
+    importacion = models.CharField(max_length=64, help_text="Huella del archivo y de cómo se partió")
+    particion = models.IntegerField()
+    lote = models.IntegerField()
+    ventas = models.IntegerField()
+    lineas = models.IntegerField()
+    desde = models.DateTimeField(null=True)
+    hasta = models.DateTimeField(null=True)
+    ajustes = models.JSONField(default=dict)
+    aplicado = models.BooleanField(default=False)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Importación {self.importacion[:12]} partición {self.particion} lote {self.lote}"
+
+    class Meta:
+        verbose_name_plural = "Lotes de Importación"
+        constraints = [
+            models.UniqueConstraint(fields=['importacion', 'particion', 'lote'], name='lote_importacion_unico'),
+        ]
@@ -0,0 +1,126 @@
+import logging
+import random
+import traceback
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import EventoOutbox
+
+
+logger = logging.getLogger(__name__)
+
+# Un tipo de evento puede tener varios manejadores; todos deben ser idempotentes
+# porque un fallo en cualquiera reintenta el evento completo
+MANEJADORES = defaultdict(list)
+
+
+def manejador(tipo):
+    """Registra una función que procesa los eventos de un tipo"""
+    def registrar(funcion):
+        MANEJADORES[tipo].append(funcion)
+        return funcion
+    return registrar
+
+
+def publicar(tipo, payload):
+    """
+    Encola un evento. Debe llamarse dentro de la transacción que lo origina:
+    si esa transacción se revierte, el evento desaparece con ella.
+    """
+    return EventoOutbox.objects.create(tipo=tipo, payload=payload)
+
+
+def eventos_disponibles(ahora):
+    """Pendientes ya disponibles y 'procesando' con el bloqueo vencido, en orden de llegada"""
+    return EventoOutbox.objects.filter(
+        Q(estado='pendiente', disponible_desde__lte=ahora)
+        | Q(estado='procesando', bloqueado_hasta__lt=ahora)
+    ).order_by('id')
+
+
+def reclamar_lote(tamano, duracion_bloqueo):
+    """
+    Reclama hasta `tamano` eventos disponibles para este worker. Usa SKIP LOCKED donde
+    la base lo soporta; en SQLite el UPDATE condicional decide qué worker gana cada evento.
+    Los eventos 'procesando' con el bloqueo vencido (worker caído) se vuelven a reclamar.
+    """
+    ahora = timezone.now()
+    token = uuid.uuid4().hex
+
+    with transaction.atomic():
+        candidatos = eventos_disponibles(ahora)
+        if connection.features.has_select_for_update_skip_locked:
+            candidatos = candidatos.select_for_update(skip_locked=True)
+        ids = list(candidatos.values_list('id', flat=True)[:tamano])
+        if not ids:
+            return []
+
+        eventos_disponibles(ahora).filter(id__in=ids).update(
+            estado='procesando',
+            reclamado_por=token,
+            bloqueado_hasta=ahora + duracion_bloqueo,
+            intentos=F('intentos') + 1,
+        )
+
+    return list(EventoOutbox.objects.filter(id__in=ids, reclamado_por=token).order_by('id'))
+
+
+def espera_reintento(intentos, base=2, maximo=300):
+    """Backoff exponencial con jitter: 2s, 4s, 8s... hasta `maximo` segundos"""
+    segundos = min(maximo, base * 2 ** (intentos - 1))
+    return timedelta(seconds=segundos * random.uniform(0.5, 1.0))
+
+
+def procesar(evento, max_intentos):
+    """Ejecuta los manejadores de un evento reclamado y registra el resultado"""
+    funciones = MANEJADORES.get(evento.tipo)
+    propio = EventoOutbox.objects.filter(pk=evento.pk, reclamado_por=evento.reclamado_por)
+
+    if not funciones:
+        propio.update(estado='fallido', ultimo_error=f"Sin manejador para '{evento.tipo}'")
+        return False
+
+    try:
+        for funcion in funciones:
+            funcion(evento.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if evento.intentos >= max_intentos:
+            logger.error("Evento %s descartado tras %s intentos: %s", evento.pk, evento.intentos, error)
+            propio.update(estado='fallido', ultimo_error=error, bloqueado_hasta=None)
+        else:
+            propio.update(
+                estado='pendiente',
+                ultimo_error=error,
+                bloqueado_hasta=None,
+                disponible_desde=timezone.now() + espera_reintento(evento.intentos),
+            )
+        return False
+
+    propio.update(estado='procesado', procesado_en=timezone.now(), bloqueado_hasta=None, ultimo_error='')
+    return True
+
+
+def procesados_antes_de(limite):
+    """Eventos ya procesados antes de `limite`: sus efectos están hechos y solo ocupan espacio"""
+    return EventoOutbox.objects.filter(estado='procesado', procesado_en__lt=limite)
+
+
+def purgar_procesados(dias, tamano=1000):
+    """
+    Borra los eventos procesados hace más de `dias` días, en tandas de `tamano` para no
+    bloquear la tabla mientras otros workers reclaman eventos. Los fallidos se conservan
+    para revisarlos a mano. Devuelve cuántos se borraron.
+    """
+    limite = timezone.now() - timedelta(days=dias)
+    borrados = 0
+    while True:
+        ids = list(procesados_antes_de(limite).values_list('id', flat=True)[:tamano])
+        if not ids:
+            return borrados
+        borrados += EventoOutbox.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,171 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Los nombres de perfil empiezan con la fecha, así el orden alfabético es el cronológico
+PATRON_ID = re.compile(r'^\d{8}-\d{6}-\d{6}-[0-9a-f]{4}$')
+
+# Se guarda el SQL sin parámetros (no quedan RUTs ni montos en disco) y recortado
+LARGO_MAXIMO_SQL = 2000
+
+
+def directorio():
+    return settings.PERFILADO_DIRECTORIO
+
+
+def perfilar(request, get_response, motivo):
+    """
+    Ejecuta el request bajo cProfile registrando cada consulta SQL (alias, inicio relativo y
+    duración), guarda el resultado en el almacén y devuelve la respuesta con su id en X-Perfil.
+    """
+    consultas = []
+    inicio = time.perf_counter()
+
+    def registrar_consulta(execute, sql, params, many, context):
+        comienzo = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            consultas.append({
+                'alias': context['connection'].alias,
+                'sql': sql[:LARGO_MAXIMO_SQL],
+                'muchas': many,
+                'inicio_ms': round((comienzo - inicio) * 1000, 2),
+                'duracion_ms': round((time.perf_counter() - comienzo) * 1000, 2),
+            })
+
+    perfil = cProfile.Profile()
+    with ExitStack() as pila:
+        for conexion in connections.all():
+            pila.enter_context(conexion.execute_wrapper(registrar_consulta))
+        try:
+            perfil.enable()
+        except ValueError:
+            # Ya hay otro perfilador activo en el hilo (p. ej. un runserver perfilado)
+            return get_response(request)
+        try:
+            respuesta = get_response(request)
+        finally:
+            perfil.disable()
+
+    datos = {
+        'fecha': timezone.now().isoformat(),
+        'metodo': request.method,
+        'ruta': request.path,
+        'usuario': request.user.get_username() if getattr(request, 'user', None) else '',
+        'motivo': motivo,
+        'estado': respuesta.status_code,
+        'duracion_ms': round((time.perf_counter() - inicio) * 1000, 2),
+        'consultas': consultas,
+    }
+    try:
+        respuesta['X-Perfil'] = guardar_perfil(perfil, datos)
+    except OSError as e:
+        logger.warning("No se pudo guardar el perfil de %s: %s", request.path, e)
+    return respuesta
+
+
+def guardar_perfil(perfil, datos):
+    """Escribe <id>.prof (pstats) y <id>.json (metadatos y consultas) y rota el almacén"""
+    os.makedirs(directorio(), exist_ok=True)
+    perfil_id = f"{timezone.now():%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:4]}"
+    base = os.path.join(directorio(), perfil_id)
+
+    perfil.dump_stats(base + '.prof')
+    # Se escribe a un temporal y se renombra para que el listado nunca vea un JSON a medias
+    with open(base + '.json.tmp', 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(base + '.json.tmp', base + '.json')
+
+    rotar()
+    return perfil_id
+
+
+def ids_guardados():
+    if not os.path.isdir(directorio()):
+        return []
+    return sorted(
+        (nombre[:-len('.json')] for nombre in os.listdir(directorio()) if nombre.endswith('.json')),
+        reverse=True,
+    )
+
+
+def rotar():
+    """Deja solo los PERFILADO_MAXIMO perfiles más recientes"""
+    for perfil_id in ids_guardados()[settings.PERFILADO_MAXIMO:]:
+        for extension in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(directorio(), perfil_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+def leer_datos(perfil_id):
+    if not PATRON_ID.match(perfil_id):
+        return None
+    try:
+        with open(os.path.join(directorio(), perfil_id + '.json'), encoding='utf-8') as f:
+            datos = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    datos['id'] = perfil_id
+    datos['fecha'] = datetime.fromisoformat(datos['fecha'])
+    return datos
+
+
+def listar_perfiles():
+    """Resumen de los perfiles guardados, del más reciente al más antiguo"""
+    perfiles = []
+    for perfil_id in ids_guardados():
+        datos = leer_datos(perfil_id)
+        if datos is None:
+            continue
+        consultas = datos.pop('consultas')
+        datos['total_consultas'] = len(consultas)
+        datos['tiempo_sql_ms'] = round(sum(c['duracion_ms'] for c in consultas), 2)
+        perfiles.append(datos)
+    return perfiles
+
+
+def funciones_principales(perfil_id, orden='cumulative', limite=30):
+    """Las funciones con más tiempo según `orden` ('cumulative' o 'tottime')"""
+    stats = pstats.Stats(os.path.join(directorio(), perfil_id + '.prof'), stream=io.StringIO())
+    filas = []
+    for (archivo, linea, funcion), (_, llamadas, propio, acumulado, _) in stats.stats.items():
+        filas.append({
+            'funcion': funcion,
+            'ubicacion': f"{archivo}:{linea}",
+            'llamadas': llamadas,
+            'propio_ms': round(propio * 1000, 2),
+            'acumulado_ms': round(acumulado * 1000, 2),
+        })
+    clave = 'propio_ms' if orden == 'tottime' else 'acumulado_ms'
+    filas.sort(key=lambda fila: fila[clave], reverse=True)
+    return filas[:limite]
+
+
+def consultas_principales(consultas, limite=20):
+    """Consultas agrupadas por SQL, ordenadas por tiempo total (delata los N+1)"""
+    grupos = {}
+    for consulta in consultas:
+        grupo = grupos.setdefault(consulta['sql'], {'sql': consulta['sql'], 'veces': 0, 'total_ms': 0})
+        grupo['veces'] += 1
+        grupo['total_ms'] += consulta['duracion_ms']
+    filas = sorted(grupos.values(), key=lambda g: g['total_ms'], reverse=True)
+    for fila in filas:
+        fila['total_ms'] = round(fila['total_ms'], 2)
+    return filas[:limite]
@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Cast, Greatest, Round
+from django.utils import timezone
+
+from .catalogo import invalidar_catalogo
+from .models import HistorialPrecio, Producto
+
+CAMPOS_PRECIO = {
+    'precio': ['precio'],
+    'precio_compra': ['precio_compra'],
+    'ambos': ['precio', 'precio_compra'],
+}
+
+
+def nuevo_valor(campo, porcentaje=None, monto=None, redondear_a=None):
+    """
+    Expresión SQL del precio ajustado: `porcentaje` (p. ej. 4.5 = +4,5 %) o `monto` fijo en pesos,
+    redondeada a múltiplos de `redondear_a` (o a centavos) y nunca bajo cero.
+    """
+    salida = DecimalField(max_digits=10, decimal_places=2)
+    if porcentaje is not None:
+        valor = F(campo) * Value(1 + Decimal(porcentaje) / 100, output_field=salida)
+    else:
+        valor = F(campo) + Value(Decimal(monto), output_field=salida)
+
+    if redondear_a:
+        paso = Value(Decimal(redondear_a), output_field=salida)
+        valor = Round(valor / paso) * paso
+    else:
+        valor = Round(valor, 2)
+    return Greatest(Cast(valor, salida), Value(Decimal('0'), output_field=salida))
+
+
+def ajustar_precios(productos, campo='precio', porcentaje=None, monto=None, redondear_a=None):
+    """
+    Ajusta en un solo UPDATE el `campo` ('precio', 'precio_compra' o 'ambos') de los productos
+    del queryset, abre un tramo de HistorialPrecio por producto con un INSERT masivo e invalida el
+    catálogo una vez. Devuelve la cantidad de productos ajustados.
+    """
+    if (porcentaje is None) == (monto is None):
+        raise ValueError('Indique un porcentaje o un monto, no ambos.')
+    if campo not in CAMPOS_PRECIO:
+        raise ValueError(f'Campo inválido: {campo}')
+
+    # update() no llama a save(): la marca de la sincronización de cajas se asigna a mano y
+    # sirve además para reconocer las filas de este ajuste
+    ahora = timezone.now()
+    seleccion = Producto.objects.filter(pk__in=productos.values('pk'))
+    with transaction.atomic():
+        actualizados = seleccion.update(
+            updated_at=ahora,
+            **{c: nuevo_valor(c, porcentaje, monto, redondear_a) for c in CAMPOS_PRECIO[campo]},
+        )
+        if not actualizados:
+            return 0
+
+        ajustados = list(seleccion.filter(updated_at=ahora).values_list('id', 'precio', 'precio_compra'))
+        HistorialPrecio.objects.filter(
+            producto__in=seleccion.filter(updated_at=ahora), vigente_hasta__isnull=True
+        ).update(vigente_hasta=ahora)
+        HistorialPrecio.objects.bulk_create(
+            [
+                HistorialPrecio(producto_id=id, precio=precio, precio_compra=precio_compra, vigente_desde=ahora)
+                for id, precio, precio_compra in ajustados
+            ],
+            batch_size=1000,
+        )
+        invalidar_catalogo([id for id, _, _ in ajustados])
+    return actualizados
@@ -0,0 +1,30 @@
+from concurrent.futures import ProcessPoolExecutor
+from importlib import import_module
+
+# Este módulo no importa modelos al cargarse: en Windows (spawn) el hijo lo importa
+# antes de que Django esté listo
+
+
+def _iniciar():
+    import django
+    django.setup()
+
+
+def ejecutar(ruta, args):
+    """Llama a la función 'modulo.funcion' con `args` (en el mismo proceso)"""
+    modulo, funcion = ruta.rsplit('.', 1)
+    return getattr(import_module(modulo), funcion)(*args)
+
+
+def crear_pool(procesos):
+    """Pool de procesos para comandos pesados; cada hijo levanta Django y abre su propia conexión"""
+    from django.db import connections
+
+    # Con fork los hijos heredarían las conexiones abiertas del padre
+    connections.close_all()
+    return ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar)
+
+
+def enviar(pool, ruta, *args):
+    """Ejecuta la función `ruta` ('modulo.funcion') con `args` en el pool; devuelve el Future"""
+    return pool.submit(ejecutar, ruta, args)
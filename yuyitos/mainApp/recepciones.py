@@ -0,0 +1,155 @@
+import csv
+import io
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .catalogo import invalidar_stock
+from .models import (
+    DetalleOrdenPedido, DetalleRecepcion, OrdenPedido, Producto, RecepcionProducto, StockSucursal
+)
+from .sucursales import SIN_SUCURSAL
+
+# Filas por sentencia en el UPDATE con CASE, para no pasar el límite de parámetros del motor
+TAMANO_TRAMO_STOCK = 500
+
+
+def cantidades_recibidas(orden):
+    """Unidades ya recibidas por producto, sumando todas las recepciones parciales de la orden"""
+    return dict(
+        DetalleRecepcion.objects.filter(recepcion__orden=orden)
+        .values('producto_id')
+        .annotate(total=Sum('cantidad_recibida'))
+        .values_list('producto_id', 'total')
+    )
+
+
+def ordenes_con_avance(ordenes):
+    """Anota total_ordenado y total_recibido en cada orden con dos subconsultas agregadas"""
+    ordenado = DetalleOrdenPedido.objects.filter(
+        orden=OuterRef('pk')
+    ).values('orden').annotate(total=Sum('cantidad')).values('total')
+    recibido = DetalleRecepcion.objects.filter(
+        recepcion__orden=OuterRef('pk')
+    ).values('recepcion__orden').annotate(total=Sum('cantidad_recibida')).values('total')
+
+    return ordenes.annotate(
+        total_ordenado=Coalesce(Subquery(ordenado), Value(0)),
+        total_recibido=Coalesce(Subquery(recibido), Value(0)),
+    )
+
+
+def sumar_stock(sucursal, cantidades):
+    """Suma las cantidades {producto_id: unidades} al stock de la sucursal con UPDATE por tramos"""
+    StockSucursal.objects.bulk_create(
+        [StockSucursal(sucursal=sucursal, producto_id=producto_id, stock=0) for producto_id in cantidades],
+        ignore_conflicts=True,
+    )
+
+    ids = list(cantidades)
+    for i in range(0, len(ids), TAMANO_TRAMO_STOCK):
+        tramo = ids[i:i + TAMANO_TRAMO_STOCK]
+        StockSucursal.objects.filter(sucursal=sucursal, producto_id__in=tramo).update(
+            stock=F('stock') + Case(
+                *[When(producto_id=producto_id, then=Value(cantidades[producto_id])) for producto_id in tramo],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+    invalidar_stock(sucursal.pk, ids)
+
+
+def registrar_recepcion(orden, sucursal, cantidades):
+    """
+    Registra una recepción (total o parcial) de la orden con {producto_id: unidades}.
+    Valida contra lo ya recibido en recepciones anteriores y levanta ValueError si algo no cuadra.
+    """
+    if not cantidades:
+        raise ValueError('Debe ingresar al menos un producto recibido.')
+    if sucursal is None:
+        raise ValueError(SIN_SUCURSAL)
+
+    with transaction.atomic():
+        # Bloquea la orden para que dos recepciones simultáneas no superen lo pedido
+        orden = OrdenPedido.objects.select_for_update().get(pk=orden.pk)
+        ordenados = {
+            d.producto_id: d for d in orden.detalles.select_related('producto')
+        }
+        recibidos = cantidades_recibidas(orden)
+
+        fuera_de_orden = [producto_id for producto_id in cantidades if producto_id not in ordenados]
+        nombres = dict(Producto.objects.filter(id__in=fuera_de_orden).values_list('id', 'nombre'))
+
+        errores = []
+        for producto_id, cantidad in cantidades.items():
+            if producto_id not in ordenados:
+                nombre = nombres.get(producto_id, f'ID {producto_id}')
+                errores.append(f'El producto {nombre} NO está en la orden de pedido #{orden.id}.')
+                continue
+            detalle = ordenados[producto_id]
+            if cantidad <= 0:
+                errores.append(f'Cantidad recibida debe ser mayor a 0 para {detalle.producto.nombre}.')
+                continue
+            pendiente = detalle.cantidad - recibidos.get(producto_id, 0)
+            if cantidad > pendiente:
+                errores.append(
+                    f'Cantidad recibida ({cantidad}) excede lo pendiente ({pendiente} de '
+                    f'{detalle.cantidad}) para {detalle.producto.nombre}.'
+                )
+        if errores:
+            # Se informan los primeros para que el mensaje siga siendo legible en guías grandes
+            extra = f' (y {len(errores) - 5} error(es) más)' if len(errores) > 5 else ''
+            raise ValueError(' '.join(errores[:5]) + extra)
+
+        recepcion = RecepcionProducto.objects.create(orden=orden, sucursal=sucursal)
+        DetalleRecepcion.objects.bulk_create(
+            [
+                DetalleRecepcion(recepcion=recepcion, producto_id=producto_id, cantidad_recibida=cantidad)
+                for producto_id, cantidad in cantidades.items()
+            ],
+            batch_size=1000,
+        )
+        sumar_stock(sucursal, cantidades)
+
+    return recepcion
+
+
+def leer_guia_csv(archivo):
+    """
+    Lee la guía de despacho del proveedor (CSV con columnas codigo y cantidad, separado por
+    coma o punto y coma) y devuelve {producto_id: unidades}, sumando códigos repetidos.
+    """
+    texto = archivo.read()
+    if isinstance(texto, bytes):
+        texto = texto.decode('utf-8-sig')
+
+    try:
+        dialecto = csv.Sniffer().sniff(texto[:4096], delimiters=',;')
+    except csv.Error:
+        dialecto = csv.excel
+    lector = csv.DictReader(io.StringIO(texto), dialect=dialecto)
+
+    columnas = {c.strip().lower(): c for c in (lector.fieldnames or [])}
+    if 'codigo' not in columnas or 'cantidad' not in columnas:
+        raise ValueError('La guía debe tener las columnas "codigo" y "cantidad".')
+
+    por_codigo = {}
+    for numero, fila in enumerate(lector, start=2):
+        codigo = (fila[columnas['codigo']] or '').strip()
+        if not codigo:
+            continue
+        texto_cantidad = (fila[columnas['cantidad']] or '').strip()
+        try:
+            cantidad = int(texto_cantidad)
+        except ValueError:
+            raise ValueError(f'Línea {numero}: cantidad inválida "{texto_cantidad}".')
+        por_codigo[codigo] = por_codigo.get(codigo, 0) + cantidad
+
+    ids = dict(Producto.objects.filter(codigo__in=por_codigo).values_list('codigo', 'id'))
+    desconocidos = [codigo for codigo in por_codigo if codigo not in ids]
+    if desconocidos:
+        raise ValueError(f'Códigos no encontrados: {", ".join(desconocidos[:10])}'
+                         + (f' (y {len(desconocidos) - 10} más)' if len(desconocidos) > 10 else ''))
+
+    return {ids[codigo]: cantidad for codigo, cantidad in por_codigo.items()}
@@ -0,0 +1,65 @@
+import contextvars
+
+from django.conf import settings
+
+
+ALIAS_PRIMARIO = 'default'
+ALIAS_REPLICA = 'replica'
+
+# Estado por request (contextvars para que funcione igual en WSGI y ASGI)
+_usar_replica = contextvars.ContextVar('usar_replica', default=False)
+_fijado_primario = contextvars.ContextVar('fijado_primario', default=False)
+
+
+def replica_configurada():
+    return ALIAS_REPLICA in settings.DATABASES
+
+
+def iniciar_request():
+    """Limpia el estado de enrutamiento; devuelve tokens para restaurarlo al terminar el request"""
+    return _usar_replica.set(False), _fijado_primario.set(False)
+
+
+def activar_replica():
+    """Marca el request actual como de solo reportes"""
+    _usar_replica.set(True)
+
+
+def restaurar(tokens):
+    token_replica, token_fijado = tokens
+    _usar_replica.reset(token_replica)
+    _fijado_primario.reset(token_fijado)
+
+
+def escribio_en_primario():
+    return _fijado_primario.get()
+
+
+class ReplicaRouter:
+    """
+    Envía las lecturas de las vistas de reportes a la réplica (si existe).
+    Solo se enrutan los modelos de mainApp: sesiones y usuarios siempre se leen
+    del primario para no perder un login recién hecho por el retraso de replicación.
+    Apenas el request escribe algo, queda fijado al primario.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            _usar_replica.get()
+            and not _fijado_primario.get()
+            and model._meta.app_label == 'mainApp'
+            and replica_configurada()
+        ):
+            return ALIAS_REPLICA
+        return ALIAS_PRIMARIO
+
+    def db_for_write(self, model, **hints):
+        _fijado_primario.set(True)
+        return ALIAS_PRIMARIO
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario y réplica tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -0,0 +1,76 @@
+from django.contrib.auth.models import Group, User
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidar_usuario, invalidar_usuarios
+from .catalogo import invalidar_catalogo, invalidar_stock
+from .models import CategoriaProducto, PerfilUsuario, Producto, ProductoEliminado, Proveedor, StockSucursal
+
+
+# -----------------------------
+# CACHE DE USUARIOS AUTENTICADOS
+# -----------------------------
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_usuario_guardado(sender, instance, **kwargs):
+    # Cubre cambio de contraseña, is_superuser, is_active, etc.
+    invalidar_usuario(instance.pk)
+
+
+@receiver(post_save, sender=PerfilUsuario)
+@receiver(post_delete, sender=PerfilUsuario)
+def invalidar_usuario_perfil(sender, instance, **kwargs):
+    # El usuario cacheado incluye su sucursal
+    invalidar_usuario(instance.usuario_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidar_permisos_usuario(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        # Se modificaron los usuarios de un grupo/permiso
+        for user_id in pk_set or []:
+            invalidar_usuario(user_id)
+    else:
+        invalidar_usuario(instance.pk)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidar_permisos_grupo(sender, action, **kwargs):
+    # Cambio poco frecuente que afecta a muchos usuarios: se limpia todo
+    if action.startswith('post_'):
+        invalidar_usuarios()
+
+
+@receiver(user_logged_out)
+def invalidar_usuario_logout(sender, user, **kwargs):
+    if user is not None:
+        invalidar_usuario(user.pk)
+
+
+# -----------------------------
+# VERSIÓN DEL CATÁLOGO (ETag)
+# -----------------------------
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=CategoriaProducto)
+@receiver(post_delete, sender=CategoriaProducto)
+@receiver(post_save, sender=Proveedor)
+@receiver(post_delete, sender=Proveedor)
+def invalidar_catalogo_guardado(sender, instance, **kwargs):
+    invalidar_catalogo([instance.pk] if sender is Producto else None)
+
+
+@receiver(post_save, sender=StockSucursal)
+@receiver(post_delete, sender=StockSucursal)
+def invalidar_stock_guardado(sender, instance, **kwargs):
+    invalidar_stock(instance.sucursal_id, [instance.producto_id])
+
+
+@receiver(post_delete, sender=Producto)
+def registrar_producto_eliminado(sender, instance, **kwargs):
+    # Lápida para la sincronización incremental de las cajas
+    ProductoEliminado.objects.create(producto_id=instance.pk, codigo=instance.codigo)
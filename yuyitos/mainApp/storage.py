@@ -0,0 +1,60 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional, sin él solo se generan variantes .gz
+    brotli = None
+
+
+EXTENSIONES_COMPRIMIBLES = ('.css', '.js', '.svg', '.html', '.txt', '.json', '.map', '.xml', '.ico')
+
+# Bajo este tamaño la compresión no compensa el encabezado extra
+TAMANO_MINIMO_COMPRESION = 256
+
+
+class ComprimidoManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Storage de estáticos con nombres hasheados (manifest) que además deja
+    precalculadas las variantes .gz y .br de cada archivo al correr collectstatic.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        procesados = set()
+        for nombre, nombre_hasheado, procesado in super().post_process(paths, dry_run, **options):
+            if not dry_run and not isinstance(procesado, Exception):
+                procesados.add(nombre)
+                if nombre_hasheado:
+                    procesados.add(nombre_hasheado)
+            yield nombre, nombre_hasheado, procesado
+
+        if dry_run:
+            return
+
+        for nombre in procesados:
+            self.comprimir(nombre)
+
+    def comprimir(self, nombre):
+        """Escribe las variantes .gz y .br de un archivo si es comprimible y vale la pena"""
+        if not nombre.endswith(EXTENSIONES_COMPRIMIBLES):
+            return
+
+        ruta = self.path(nombre)
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+
+        if len(contenido) < TAMANO_MINIMO_COMPRESION:
+            return
+
+        variantes = [('.gz', gzip.compress(contenido, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variantes.append(('.br', brotli.compress(contenido, quality=11)))
+
+        for extension, comprimido in variantes:
+            if len(comprimido) >= len(contenido):
+                continue
+            with open(ruta + extension, 'wb') as f:
+                f.write(comprimido)
+            os.utime(ruta + extension, (os.path.getatime(ruta), os.path.getmtime(ruta)))
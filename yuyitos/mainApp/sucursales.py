@@ -0,0 +1,29 @@
+from django.db.models import F, FilteredRelation, Q, Value
+from django.db.models.functions import Coalesce
+
+from .models import PerfilUsuario, Producto, StockSucursal, Sucursal
+
+SIN_SUCURSAL = 'No hay sucursales registradas. Cree una en el administrador antes de operar.'
+
+
+def sucursal_de(usuario):
+    """Sucursal en la que trabaja el usuario; sin perfil asignado, la casa matriz (None si no hay sucursales)"""
+    try:
+        return usuario.perfil.sucursal
+    except PerfilUsuario.DoesNotExist:
+        return Sucursal.objects.order_by('codigo').first()
+
+
+def productos_con_stock(sucursal):
+    """Productos anotados con `stock` de la sucursal (0 si no tienen fila de stock)"""
+    return Producto.objects.annotate(
+        stock_sucursal=FilteredRelation('stocks', condition=Q(stocks__sucursal=sucursal))
+    ).annotate(
+        stock=Coalesce(F('stock_sucursal__stock'), Value(0))
+    )
+
+
+def stock_en_sucursal(sucursal, producto):
+    return StockSucursal.objects.filter(
+        sucursal=sucursal, producto=producto
+    ).values_list('stock', flat=True).first() or 0
@@ -1,3 +1,128 @@
-from django.test import TestCase
+import json
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, TransactionTestCase, override_settings
+
+from .models import (
+    CategoriaProducto, Cliente, Producto, Proveedor, StockSucursal, Sucursal, Venta, VentaArchivada
+)
+
+
+# La base de pruebas SQLite en memoria (cache compartido) no espera los bloqueos: sesión y usuario
+# se leen del cache (un solo proceso) para que solo la vista compita por la base
+@override_settings(
+    SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+    USUARIOS_CACHE_SEGUNDOS=60,
+)
+class VentaCreditoConcurrenteTest(TransactionTestCase):
+    """Ventas a crédito en paralelo: la deuda nunca pierde actualizaciones ni supera el límite"""
+
+    VENTAS_PARALELAS = 16
+    PRECIO = Decimal('1000')
+    LIMITE = Decimal('10000')
+
+    def setUp(self):
+        proveedor = Proveedor.objects.create(
+            id_proveedor='001', nombre='Proveedor', rut='1-9',
+            contacto='Contacto', direccion='Dirección', rubro='Rubro'
+        )
+        categoria = CategoriaProducto.objects.create(nombre='Categoría', codigo='001')
+        self.producto = Producto.objects.create(
+            nombre='Producto', proveedor=proveedor, categoria=categoria,
+            precio=self.PRECIO
+        )
+        # TransactionTestCase vacía las tablas entre tests, incluida la casa matriz de la migración
+        matriz, _ = Sucursal.objects.get_or_create(codigo='001', defaults={'nombre': 'Casa Matriz'})
+        StockSucursal.objects.create(sucursal=matriz, producto=self.producto, stock=1000)
+        self.cliente = Cliente.objects.create(
+            nombre='Cliente', rut='11.111.111-1', telefono='1', direccion='Dirección',
+            email='cliente@yuyitos.cl', limite_credito=self.LIMITE
+        )
+        User.objects.create_user(username='cajera', password='123456')
+
+    def cliente_http(self):
+        client = Client()
+        client.login(username='cajera', password='123456')
+        return client
+
+    def vender(self, client, resultados, total=None):
+        try:
+            respuesta = client.post(
+                '/ventas/registrar/',
+                data=json.dumps({
+                    'tipo_pago': 'credito',
+                    'cliente_id': self.cliente.id,
+                    'total': str(self.PRECIO if total is None else total),
+                    'items': [{'producto_id': self.producto.id, 'cantidad': 1}],
+                }),
+                content_type='application/json'
+            )
+            resultados.append(respuesta.json())
+        finally:
+            connection.close()
+
+    def test_ventas_paralelas_sin_actualizaciones_perdidas(self):
+        resultados = []
+        hilos = [
+            threading.Thread(target=self.vender, args=(self.cliente_http(), resultados))
+            for _ in range(self.VENTAS_PARALELAS)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        exitosas = [r for r in resultados if r['success']]
+        self.assertEqual(len(resultados), self.VENTAS_PARALELAS)
+        self.assertTrue(exitosas)
+        self.cliente.refresh_from_db()
+
+        # Cada venta confirmada sumó exactamente su total a la deuda
+        self.assertEqual(self.cliente.deuda_actual, self.PRECIO * len(exitosas))
+        self.assertEqual(Venta.objects.filter(cliente=self.cliente).count(), len(exitosas))
+        self.assertLessEqual(self.cliente.deuda_actual, self.LIMITE)
+        self.assertLessEqual(len(exitosas), int(self.LIMITE / self.PRECIO))
+
+    def test_venta_sobre_el_limite_es_rechazada(self):
+        Cliente.objects.filter(pk=self.cliente.pk).update(deuda_actual=self.LIMITE - self.PRECIO / 2)
+        resultados = []
+        self.vender(self.cliente_http(), resultados)
+
+        self.assertFalse(resultados[0]['success'])
+        self.assertIn('límite de crédito', resultados[0]['error'])
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.deuda_actual, self.LIMITE - self.PRECIO / 2)
+        self.assertFalse(Venta.objects.exists())
+
+    def test_total_alterado_por_el_cliente_es_rechazado(self):
+        # Con total 0 (o negativo) la venta no debe saltarse el límite ni bajar la deuda
+        Cliente.objects.filter(pk=self.cliente.pk).update(deuda_actual=self.LIMITE)
+        resultados = []
+        self.vender(self.cliente_http(), resultados, total=-self.PRECIO)
+
+        self.assertFalse(resultados[0]['success'])
+        self.assertIn('total de la venta', resultados[0]['error'])
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.deuda_actual, self.LIMITE)
+        self.assertFalse(Venta.objects.exists())
+
+    def test_numero_de_boleta_sigue_al_mayor_entre_activas_y_archivadas(self):
+        # Crédito pendiente antiguo en la tabla activa; la boleta posterior ya fue archivada
+        vendedor = User.objects.get(username='cajera')
+        matriz = Sucursal.objects.get(codigo='001')
+        Venta.objects.create(
+            numero_boleta='0000000001', cliente=self.cliente, vendedor=vendedor, sucursal=matriz,
+            tipo_pago='credito', total=self.PRECIO, estado_credito='PENDIENTE'
+        )
+        VentaArchivada.objects.create(
+            id=2, numero_boleta='0000000002', cliente=self.cliente, vendedor=vendedor, sucursal=matriz,
+            tipo_pago='contado', total=self.PRECIO, fecha='2020-01-01T00:00:00Z', estado_credito='CANCELADA'
+        )
+        resultados = []
+        self.vender(self.cliente_http(), resultados)
+
+        self.assertTrue(resultados[0]['success'])
+        self.assertTrue(Venta.objects.filter(numero_boleta='0000000003').exists())
@@ -2,19 +2,43 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Sum, Count, Q
+from django.conf import settings
+from django.views.decorators.http import condition
+from django.db.models import Sum, Count, Max, Q, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, TruncMonth
 from django.utils import timezone
 from django.db import transaction
-from django.http import JsonResponse, HttpResponse
-from datetime import timedelta
-from decimal import Decimal
+from django.http import JsonResponse, HttpResponse, Http404, FileResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.core.files.storage import default_storage
+from django.core.paginator import Paginator
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
 import json
+import tempfile
 
+from asgiref.sync import sync_to_async
+
+from . import eventos, outbox, perfilado
+from .archivo import buscar_venta, total_ventas_archivadas, ventas_con_archivo
+from .boletas import documento_de, documentos_del_periodo, escribir_zip
+from .catalogo import (
+    cambios_catalogo, etag_catalogo, etag_inventario, invalidar_stock,
+    ultima_modificacion_catalogo, ultima_modificacion_inventario
+)
+from .cierres import cerrar_caja, comparar_lineas, fin_turno, inicio_turno, resumen_turno
+from .clientes import API_CLIENTES_POR_PAGINA, CLIENTES_POR_PAGINA, buscar_clientes
+from .codigo_barra import svg_codigo_barra
+from .consultas_lentas import borrar_instantaneas, consultas_de_todos_los_procesos
+from .margenes import rango_datetime
+from .recepciones import cantidades_recibidas, leer_guia_csv, ordenes_con_avance, registrar_recepcion
 from .models import (
     Producto, Venta, Cliente, Proveedor, DetalleVenta,
     CategoriaProducto, Abono, OrdenPedido, DetalleOrdenPedido,
-    RecepcionProducto, DetalleRecepcion
+    RecepcionProducto, StockSucursal, StockTotal,
+    ResumenMargenDiario, VentaArchivada, Sucursal, CierreCaja, LineaCierreCaja
 )
+from .sucursales import SIN_SUCURSAL, sucursal_de, productos_con_stock, stock_en_sucursal
 
 
 # -----------------------------
@@ -81,8 +105,9 @@ def logout_view(request):
 def home(request):
     # Estadísticas generales
     total_productos = Producto.objects.count()
-    total_ventas = Venta.objects.count()
-    productos_bajo_stock = Producto.objects.filter(stock__lt=10).count()
+    total_ventas = Venta.objects.count() + total_ventas_archivadas()
+    # Stock total del catálogo (suma de todas las sucursales)
+    productos_bajo_stock = StockTotal.objects.filter(stock__lt=10).count()
     total_clientes = Cliente.objects.count()
     total_proveedores = Proveedor.objects.count()
     
@@ -108,12 +133,13 @@ def home(request):
 # PRODUCTOS – ADMIN Y VENDEDOR
 # -----------------------------
 @login_required
+@condition(etag_func=etag_catalogo, last_modified_func=ultima_modificacion_catalogo)
 def productos(request):
     query = request.GET.get('q', '')
-    lista = Producto.objects.all()
+    lista = productos_con_stock(sucursal_de(request.user)).select_related('categoria')
     
     if query:
-        lista = lista.filter(nombre__icontains=query) | lista.filter(codigo__icontains=query)
+        lista = lista.filter(Q(nombre__icontains=query) | Q(codigo__icontains=query))
     
     return render(request, "productos.html", {"productos": lista, "query": query})
 
@@ -123,9 +149,13 @@ def productos(request):
 # -----------------------------
 @login_required
 @user_passes_test(es_admin, login_url='/')
+@condition(etag_func=etag_inventario, last_modified_func=ultima_modificacion_inventario)
 def inventario(request):
-    lista = Producto.objects.all().order_by('stock')
-    return render(request, "inventario.html", {"productos": lista})
+    sucursal = sucursal_de(request.user)
+    lista = productos_con_stock(sucursal).select_related(
+        'proveedor', 'stock_total'
+    ).order_by('stock')
+    return render(request, "inventario.html", {"productos": lista, "sucursal": sucursal})
 
 
 # -----------------------------
@@ -134,10 +164,10 @@ def inventario(request):
 @login_required
 def ventas(request):
     # Si es vendedor, solo ve sus propias ventas
-    if request.user.is_superuser:
-        lista = Venta.objects.all().order_by('-fecha')[:20]
-    else:
-        lista = Venta.objects.filter(vendedor=request.user).order_by('-fecha')[:20]
+    lista = Venta.objects.select_related('cliente').order_by('-fecha')
+    if not request.user.is_superuser:
+        lista = lista.filter(vendedor=request.user)
+    lista = lista[:20]
     
     return render(request, "ventas.html", {"ventas": lista})
 
@@ -165,30 +195,30 @@ def registrar_venta(request):
             except Cliente.DoesNotExist:
                 return JsonResponse({'success': False, 'error': 'Cliente no encontrado.'}, status=400)
 
+            # Sin sucursales creadas no hay dónde descontar el stock
+            sucursal = sucursal_de(request.user)
+            if sucursal is None:
+                return JsonResponse({'success': False, 'error': SIN_SUCURSAL}, status=400)
+
             with transaction.atomic():
                 # Generar número de boleta (igual que tu lógica original)
-                ultima_venta = Venta.objects.all().order_by('-id').first()
-                if ultima_venta and ultima_venta.numero_boleta:
+                # Se sigue el mayor número entre ventas activas y archivadas: las ventas a crédito
+                # pendientes quedan activas aunque haya boletas posteriores ya archivadas, y las
+                # históricas importadas tienen ids nuevos pero números antiguos
+                ultimos = [
+                    modelo.objects.aggregate(ultimo=Max('numero_boleta'))['ultimo']
+                    for modelo in (Venta, VentaArchivada)
+                ]
+                ultimo_numero = 0
+                for numero in ultimos:
                     try:
-                        ultimo_numero = int(ultima_venta.numero_boleta)
+                        ultimo_numero = max(ultimo_numero, int(numero or 0))
                     except ValueError:
-                        ultimo_numero = 0
-                    nuevo_numero = str(ultimo_numero + 1).zfill(10)
-                else:
-                    nuevo_numero = "0000000001"
-
-                total_enviado = Decimal(str(data.get('total', '0')))
+                        pass
+                nuevo_numero = str(ultimo_numero + 1).zfill(10)
 
-                # Crear venta
-                venta = Venta.objects.create(
-                    numero_boleta=nuevo_numero,
-                    cliente=cliente,
-                    vendedor=request.user,
-                    tipo_pago=data.get('tipo_pago'),
-                    total=total_enviado
-                )
-
-                # Crear detalles y actualizar stock
+                # Descontar stock y armar las líneas con los precios del servidor
+                lineas = []
                 for item in data['items']:
                     producto_id = item.get('producto_id')
                     cantidad = int(item.get('cantidad', 0))
@@ -200,26 +230,76 @@ def registrar_venta(request):
                     except Producto.DoesNotExist:
                         raise Exception('Producto no encontrado.')
 
-                    if producto.stock < cantidad:
-                        raise Exception(f"Stock insuficiente para {producto.nombre} (disponible {producto.stock}).")
+                    # Descuento condicional sobre la fila de esta sucursal: otras
+                    # sucursales nunca compiten por el mismo registro
+                    actualizados = StockSucursal.objects.filter(
+                        sucursal=sucursal, producto=producto, stock__gte=cantidad
+                    ).update(stock=F('stock') - cantidad)
+
+                    if not actualizados:
+                        disponible = stock_en_sucursal(sucursal, producto)
+                        raise Exception(f"Stock insuficiente para {producto.nombre} (disponible {disponible}).")
+
+                    lineas.append((producto, cantidad, Decimal(cantidad) * producto.precio))
+
+                # El total sale de las líneas; el del cliente solo se compara (centavos por
+                # redondeo del navegador) para detectar un carrito con precios viejos
+                total = sum((subtotal for _, _, subtotal in lineas), Decimal('0'))
+                try:
+                    total_enviado = Decimal(str(data.get('total', ''))).quantize(Decimal('0.01'))
+                except InvalidOperation:
+                    raise Exception('Total de la venta inválido.')
+                if total_enviado != total:
+                    raise Exception(
+                        f'El total de la venta cambió a ${total:.0f} (precios actualizados). '
+                        f'Revise el carrito y vuelva a confirmar.'
+                    )
 
-                    subtotal = Decimal(cantidad) * producto.precio
+                # Crear venta
+                venta = Venta.objects.create(
+                    numero_boleta=nuevo_numero,
+                    cliente=cliente,
+                    vendedor=request.user,
+                    sucursal=sucursal,
+                    tipo_pago=data.get('tipo_pago'),
+                    total=total
+                )
 
+                for producto, cantidad, subtotal in lineas:
                     DetalleVenta.objects.create(
                         venta=venta,
                         producto=producto,
                         cantidad=cantidad,
                         precio_unitario=producto.precio,
+                        costo_unitario=producto.precio_compra,
                         subtotal=subtotal
                     )
 
-                    producto.stock -= cantidad
-                    producto.save()
+                # El UPDATE no dispara señales: se avisa a mano que cambió el stock
+                invalidar_stock(sucursal.pk, [item.get('producto_id') for item in data['items']])
 
-                # Si es crédito, actualizar deuda
+                # Si es crédito, sumar a la deuda solo si no supera el límite.
+                # Un único UPDATE condicional: sin leer-modificar-guardar ni bloqueos
+                # previos, y al final para que el lock de la fila dure lo mínimo.
                 if data.get('tipo_pago') == 'credito':
-                    cliente.deuda_actual += total_enviado
-                    cliente.save()
+                    actualizados = Cliente.objects.filter(
+                        pk=cliente.pk,
+                        deuda_actual__lte=F('limite_credito') - total
+                    ).update(deuda_actual=F('deuda_actual') + total)
+
+                    if not actualizados:
+                        raise Exception(
+                            f'Venta a crédito rechazada: el cliente {cliente.nombre} '
+                            f'superaría su límite de crédito.'
+                        )
+
+                # Efectos posteriores (alertas, resúmenes, caches) los procesa el worker
+                # del outbox; aquí solo se encolan en la misma transacción
+                outbox.publicar('venta_registrada', {
+                    'venta_id': venta.id,
+                    'sucursal_id': sucursal.id,
+                    'productos': [int(item.get('producto_id')) for item in data['items']],
+                })
 
                 return JsonResponse({
                     'success': True,
@@ -231,12 +311,12 @@ def registrar_venta(request):
             return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
     # GET: Mostrar formulario
-    productos = Producto.objects.filter(stock__gt=0).order_by('nombre')
-    clientes = Cliente.objects.filter(estado='activo').order_by('nombre')
+    sucursal = sucursal_de(request.user)
+    productos = productos_con_stock(sucursal).filter(stock__gt=0).order_by('nombre')
 
     return render(request, "registrar_venta.html", {
         'productos': productos,
-        'clientes': clientes
+        'sucursal': sucursal
     })
 
 
@@ -245,33 +325,48 @@ def registrar_venta(request):
 # -----------------------------
 @login_required
 def clientes(request):
-    query = request.GET.get('q', '')
-    lista = Cliente.objects.all().order_by('nombre')
-    
-    if query:
-        lista = lista.filter(
-            Q(nombre__icontains=query) | Q(rut__icontains=query)
-        )
-    
+    query = request.GET.get('q', '').strip()
+    lista = buscar_clientes(Cliente.objects.order_by('nombre_normalizado', 'id'), query)
+
+    pagina = Paginator(lista, CLIENTES_POR_PAGINA).get_page(request.GET.get('pagina'))
+
     return render(request, "clientes.html", {
-        "clientes": lista,
+        "clientes": pagina,
+        "pagina": pagina,
         "query": query
     })
 
 
+@login_required
+def api_clientes(request):
+    """API de búsqueda paginada de clientes activos (RUT exacto o prefijo del nombre)"""
+    lista = buscar_clientes(
+        Cliente.objects.filter(estado='activo').order_by('nombre_normalizado', 'id'),
+        request.GET.get('q', '')
+    ).values('id', 'nombre', 'apellido', 'rut', 'limite_credito', 'deuda_actual')
+
+    pagina = Paginator(lista, API_CLIENTES_POR_PAGINA).get_page(request.GET.get('pagina'))
+    return JsonResponse({
+        'success': True,
+        'clientes': list(pagina),
+        'pagina': pagina.number,
+        'hay_mas': pagina.has_next(),
+    })
+
+
 # -----------------------------
 # DETALLE DE VENTA
 # -----------------------------
 @login_required
 def detalle_venta(request, venta_id):
-    venta = get_object_or_404(Venta, id=venta_id)
+    venta = buscar_venta(venta_id)
     
     # Si es vendedor, solo puede ver sus propias ventas
     if not request.user.is_superuser and venta.vendedor != request.user:
         messages.error(request, "No tienes permiso para ver esta venta")
         return redirect('ventas')
     
-    detalles = venta.detalles.all()
+    detalles = venta.detalles.select_related('producto')
     
     return render(request, "detalles_venta.html", {
         'venta': venta,
@@ -279,6 +374,48 @@ def detalle_venta(request, venta_id):
     })
 
 
+@login_required
+def boleta(request, venta_id):
+    """Boleta ya renderizada (HTML o ?formato=pdf), servida directo desde el almacenamiento"""
+    venta = buscar_venta(venta_id)
+    if not request.user.is_superuser and venta.vendedor_id != request.user.id:
+        messages.error(request, "No tienes permiso para ver esta venta")
+        return redirect('ventas')
+    documento = documento_de(venta)
+
+    if request.method in ('GET', 'HEAD') and request.META.get('HTTP_IF_NONE_MATCH') == f'"{documento.huella}"':
+        return HttpResponse(status=304)
+
+    if request.GET.get('formato') == 'pdf':
+        if not documento.pdf:
+            raise Http404('PDF no disponible: falta instalar weasyprint')
+        respuesta = FileResponse(default_storage.open(documento.pdf, 'rb'), content_type='application/pdf',
+                                 filename=f'boleta_{documento.numero_boleta}.pdf')
+    else:
+        respuesta = FileResponse(default_storage.open(documento.html, 'rb'), content_type='text/html; charset=utf-8')
+    respuesta['ETag'] = f'"{documento.huella}"'
+    respuesta['Cache-Control'] = 'private, max-age=86400'
+    return respuesta
+
+
+@login_required
+@user_passes_test(es_admin, login_url='/')
+def exportar_boletas(request):
+    """Zip con las boletas de un día (?fecha=AAAA-MM-DD, por defecto hoy), copiadas desde el almacenamiento"""
+    try:
+        dia = date.fromisoformat(request.GET.get('fecha', ''))
+    except ValueError:
+        dia = timezone.localdate()
+    formato = 'pdf' if request.GET.get('formato') == 'pdf' else 'html'
+
+    documentos = documentos_del_periodo(*rango_datetime(dia, dia))
+    # En disco y no en memoria: un cierre puede tener miles de boletas
+    archivo = tempfile.TemporaryFile()
+    escribir_zip(documentos, archivo, formato)
+    archivo.seek(0)
+    return FileResponse(archivo, as_attachment=True, filename=f'boletas_{dia:%Y%m%d}.zip', content_type='application/zip')
+
+
 # -----------------------------
 # ÓRDENES DE PEDIDO
 # -----------------------------
@@ -286,7 +423,7 @@ def detalle_venta(request, venta_id):
 @user_passes_test(es_admin, login_url='/')
 def ordenes_pedido(request):
     """Lista todas las órdenes de pedido"""
-    ordenes = OrdenPedido.objects.all().select_related('proveedor').order_by('-fecha')
+    ordenes = ordenes_con_avance(OrdenPedido.objects.all()).select_related('proveedor').order_by('-fecha')
     return render(request, "ordenes_pedido.html", {"ordenes": ordenes})
 
 
@@ -366,19 +503,24 @@ def crear_orden_pedido(request):
 def detalle_orden_pedido(request, orden_id):
     """Ver detalle de una orden de pedido"""
     orden = get_object_or_404(OrdenPedido, id=orden_id)
-    detalles = orden.detalles.all().select_related('producto')
+    detalles = list(orden.detalles.all().select_related('producto'))
     
     # Calcular total
     total = sum(d.subtotal() for d in detalles)
     
-    # Verificar si tiene recepción
-    tiene_recepcion = RecepcionProducto.objects.filter(orden=orden).exists()
+    # Avance de la recepción sumando todas las recepciones parciales
+    recibidos = cantidades_recibidas(orden)
+    for detalle in detalles:
+        detalle.recibido = recibidos.get(detalle.producto_id, 0)
+    total_recibido = sum(recibidos.values())
+    completa = all(d.recibido >= d.cantidad for d in detalles)
     
     return render(request, "detalle_orden_pedido.html", {
         'orden': orden,
         'detalles': detalles,
         'total': total,
-        'tiene_recepcion': tiene_recepcion
+        'tiene_recepcion': total_recibido > 0,
+        'completa': completa
     })
 
 
@@ -396,14 +538,9 @@ def recepciones(request):
 @login_required
 @user_passes_test(es_admin, login_url='/')
 def crear_recepcion(request, orden_id):
-    """Crear una recepción basada en una orden de pedido"""
+    """Crear una recepción (total o parcial) basada en una orden de pedido"""
     orden = get_object_or_404(OrdenPedido, id=orden_id)
     
-    # Verificar si ya existe una recepción para esta orden
-    if RecepcionProducto.objects.filter(orden=orden).exists():
-        messages.error(request, "❌ Esta orden ya tiene una recepción registrada.")
-        return redirect('detalle_orden_pedido', orden_id=orden_id)
-    
     if request.method == "POST":
         try:
             data = json.loads(request.body)
@@ -411,61 +548,39 @@ def crear_recepcion(request, orden_id):
             if not data.get('items') or len(data['items']) == 0:
                 return JsonResponse({'success': False, 'error': 'Debe ingresar al menos un producto recibido.'}, status=400)
             
-            with transaction.atomic():
-                # Crear recepción
-                recepcion = RecepcionProducto.objects.create(orden=orden)
-                
-                # Obtener todos los productos de la orden
-                productos_orden = {d.producto_id: d for d in orden.detalles.all()}
-                
-                # Procesar cada item recibido
-                for item in data['items']:
-                    producto_id = int(item.get('producto_id'))
-                    cantidad_recibida = int(item.get('cantidad_recibida', 0))
-                    
-                    if cantidad_recibida <= 0:
-                        raise Exception('Cantidad recibida debe ser mayor a 0.')
-                    
-                    # VALIDACIÓN: Verificar que el producto está en la orden
-                    if producto_id not in productos_orden:
-                        try:
-                            producto_nombre = Producto.objects.get(id=producto_id).nombre
-                        except:
-                            producto_nombre = f"ID {producto_id}"
-                        raise Exception(f'El producto {producto_nombre} NO está en la orden de pedido #{orden.id}.')
-                    
-                    detalle_orden = productos_orden[producto_id]
-                    
-                    # VALIDACIÓN: Verificar que no exceda la cantidad ordenada
-                    if cantidad_recibida > detalle_orden.cantidad:
-                        raise Exception(
-                            f'Cantidad recibida ({cantidad_recibida}) excede la cantidad ordenada '
-                            f'({detalle_orden.cantidad}) para {detalle_orden.producto.nombre}.'
-                        )
-                    
-                    # Crear detalle de recepción
-                    DetalleRecepcion.objects.create(
-                        recepcion=recepcion,
-                        producto=detalle_orden.producto,
-                        cantidad_recibida=cantidad_recibida
-                    )
-                    
-                    # Actualizar stock del producto
-                    producto = detalle_orden.producto
-                    producto.stock += cantidad_recibida
-                    producto.save()
-                
-                return JsonResponse({
-                    'success': True,
-                    'recepcion_id': recepcion.id,
-                    'message': f'✅ Recepción #{recepcion.id} registrada exitosamente. Stock actualizado.'
-                })
+            # Agrupar por producto por si viene repetido
+            cantidades = {}
+            for item in data['items']:
+                producto_id = int(item.get('producto_id'))
+                cantidades[producto_id] = cantidades.get(producto_id, 0) + int(item.get('cantidad_recibida', 0))
+
+            recepcion = registrar_recepcion(orden, sucursal_de(request.user), cantidades)
+
+            return JsonResponse({
+                'success': True,
+                'recepcion_id': recepcion.id,
+                'message': f'✅ Recepción #{recepcion.id} registrada exitosamente. Stock actualizado.'
+            })
         
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)}, status=400)
     
-    # GET: Mostrar formulario
-    detalles_orden = orden.detalles.all().select_related('producto')
+    # GET: Mostrar formulario con lo pendiente de cada producto
+    recibidos = cantidades_recibidas(orden)
+    detalles_orden = list(orden.detalles.all().select_related('producto').annotate(
+        stock_sucursal=Coalesce(Subquery(
+            StockSucursal.objects.filter(
+                sucursal=sucursal_de(request.user), producto=OuterRef('producto')
+            ).values('stock')[:1]
+        ), Value(0))
+    ))
+    for detalle in detalles_orden:
+        detalle.recibido = recibidos.get(detalle.producto_id, 0)
+        detalle.pendiente = max(detalle.cantidad - detalle.recibido, 0)
+
+    if all(d.pendiente == 0 for d in detalles_orden):
+        messages.error(request, "❌ Esta orden ya fue recibida completamente.")
+        return redirect('detalle_orden_pedido', orden_id=orden_id)
     
     return render(request, "crear_recepcion.html", {
         'orden': orden,
@@ -473,28 +588,56 @@ def crear_recepcion(request, orden_id):
     })
 
 
+@login_required
+@user_passes_test(es_admin, login_url='/')
+def importar_guia_recepcion(request, orden_id):
+    """Registra una recepción a partir de la guía de despacho (CSV) del proveedor"""
+    orden = get_object_or_404(OrdenPedido, id=orden_id)
+    archivo = request.FILES.get('guia')
+
+    if request.method != "POST" or not archivo:
+        messages.error(request, "❌ Debe adjuntar la guía de despacho en formato CSV.")
+        return redirect('crear_recepcion', orden_id=orden_id)
+
+    try:
+        cantidades = leer_guia_csv(archivo)
+        recepcion = registrar_recepcion(orden, sucursal_de(request.user), cantidades)
+    except Exception as e:
+        messages.error(request, f"❌ No se pudo importar la guía: {e}")
+        return redirect('crear_recepcion', orden_id=orden_id)
+
+    messages.success(
+        request,
+        f"✅ Recepción #{recepcion.id} importada: {len(cantidades)} producto(s), "
+        f"{sum(cantidades.values())} unidades."
+    )
+    return redirect('detalle_recepcion', recepcion_id=recepcion.id)
+
+
 @login_required
 @user_passes_test(es_admin, login_url='/')
 def detalle_recepcion(request, recepcion_id):
     """Ver detalle de una recepción de productos"""
-    recepcion = get_object_or_404(RecepcionProducto, id=recepcion_id)
-    detalles = recepcion.detalles.all().select_related('producto')
+    recepcion = get_object_or_404(
+        RecepcionProducto.objects.select_related('orden__proveedor', 'sucursal'), id=recepcion_id
+    )
+    en_esta = dict(recepcion.detalles.values_list('producto_id', 'cantidad_recibida'))
+    acumulado = cantidades_recibidas(recepcion.orden)
     detalles_orden = recepcion.orden.detalles.all().select_related('producto')
     
-    # Crear un diccionario para comparar cantidades ordenadas vs recibidas
+    # Comparar cantidades ordenadas vs recibidas (en esta recepción y en total)
     comparacion = []
     for detalle_orden in detalles_orden:
-        cantidad_recibida = 0
-        detalle_recepcion = detalles.filter(producto=detalle_orden.producto).first()
-        if detalle_recepcion:
-            cantidad_recibida = detalle_recepcion.cantidad_recibida
+        cantidad_recibida = en_esta.get(detalle_orden.producto_id, 0)
+        total_recibido = acumulado.get(detalle_orden.producto_id, 0)
         
         comparacion.append({
             'producto': detalle_orden.producto,
             'cantidad_ordenada': detalle_orden.cantidad,
             'cantidad_recibida': cantidad_recibida,
-            'diferencia': cantidad_recibida - detalle_orden.cantidad,
-            'completo': cantidad_recibida == detalle_orden.cantidad
+            'total_recibido': total_recibido,
+            'diferencia': total_recibido - detalle_orden.cantidad,
+            'completo': total_recibido == detalle_orden.cantidad
         })
     
     return render(request, "detalle_recepcion.html", {
@@ -508,17 +651,60 @@ def detalle_recepcion(request, recepcion_id):
 # -----------------------------
 @login_required
 @user_passes_test(es_admin, login_url='/')
+@condition(etag_func=etag_catalogo, last_modified_func=ultima_modificacion_catalogo)
 def api_productos_proveedor(request, proveedor_id):
     """API para obtener productos de un proveedor específico"""
     try:
-        productos = Producto.objects.filter(proveedor_id=proveedor_id).values(
-            'id', 'codigo', 'nombre', 'precio', 'stock'
-        )
+        productos = productos_con_stock(sucursal_de(request.user)).filter(
+            proveedor_id=proveedor_id
+        ).values('id', 'codigo', 'nombre', 'precio', 'stock')
         return JsonResponse({'success': True, 'productos': list(productos)})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
 
+# -----------------------------
+# API: SINCRONIZACIÓN DE CATÁLOGO PARA CAJAS
+# -----------------------------
+@login_required
+def api_cambios_catalogo(request):
+    """
+    Productos modificados y eliminados desde el cursor recibido, por páginas.
+    Sin cursor entrega el catálogo completo; la caja repite con el cursor devuelto mientras hay_mas.
+    """
+    try:
+        limite = min(max(int(request.GET.get('limite', 500)), 1), 1000)
+        cambios = cambios_catalogo(request.GET.get('cursor'), limite)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({'success': True, **cambios})
+
+
+# -----------------------------
+# EVENTOS DE STOCK Y PRECIO PARA CAJAS (SSE)
+# -----------------------------
+@login_required
+async def eventos_stock(request):
+    """
+    Canal server-sent events con los cambios de stock de la sucursal y de precios. Necesita un
+    servidor ASGI (ver asgi.py): bajo WSGI cada caja ocuparía un worker, así que se responde 204
+    y el navegador no vuelve a intentar. Lo mismo si no hay sucursales registradas.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    usuario = await request.auser()
+    sucursal = await sync_to_async(sucursal_de)(usuario)
+    if sucursal is None:
+        return HttpResponse(status=204)
+    respuesta = StreamingHttpResponse(eventos.flujo(sucursal.pk), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    # Sin buffer en nginx: cada evento sale apenas se escribe
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+
 # -----------------------------
 # FICHA DE CRÉDITO
 # -----------------------------
@@ -528,7 +714,9 @@ def ficha_credito(request, cliente_id):
     """Vista para mostrar la ficha de crédito del cliente"""
     cliente = get_object_or_404(Cliente, id=cliente_id)
     
-    ventas_credito = Venta.objects.filter(
+    # Incluye las ventas a crédito ya archivadas
+    ventas_credito = ventas_con_archivo(
+        ['id', 'numero_boleta', 'fecha', 'total', 'estado_credito'],
         cliente=cliente,
         tipo_pago='credito'
     ).order_by('-fecha')
@@ -549,5 +737,263 @@ def ficha_credito(request, cliente_id):
 @user_passes_test(es_admin, login_url='/')
 def imprimir_codigo_barra(request, producto_id):
     """Vista HTML para imprimir código de producto"""
-    producto = get_object_or_404(Producto, id=producto_id)
-    return render(request, "imprimir_codigo.html", {'producto': producto})
\ No newline at end of file
+    producto = get_object_or_404(
+        productos_con_stock(sucursal_de(request.user)).select_related('categoria', 'proveedor'),
+        id=producto_id
+    )
+    return render(request, "imprimir_codigo.html", {
+        'producto': producto,
+        'svg_codigo': svg_codigo_barra(producto.codigo)
+    })
+
+
+# -----------------------------
+# IMPRIMIR ETIQUETAS EN LOTE
+# -----------------------------
+ETIQUETAS_POR_HOJA = 24
+
+
+@login_required
+@user_passes_test(es_admin, login_url='/')
+def imprimir_etiquetas(request):
+    """Hojas de etiquetas con código de barras para una recepción, una orden o una lista de productos"""
+    recepcion_id = request.GET.get('recepcion')
+    orden_id = request.GET.get('orden')
+    productos_ids = request.GET.get('productos', '')
+    por_unidad = request.GET.get('por_unidad') == '1'
+
+    if recepcion_id:
+        recepcion = get_object_or_404(RecepcionProducto, id=recepcion_id)
+        lineas = [
+            (d.producto, d.cantidad_recibida)
+            for d in recepcion.detalles.all().select_related('producto')
+        ]
+        titulo = f"Recepción #{recepcion.id}"
+    elif orden_id:
+        orden = get_object_or_404(OrdenPedido, id=orden_id)
+        lineas = [
+            (d.producto, d.cantidad)
+            for d in orden.detalles.all().select_related('producto')
+        ]
+        titulo = f"Orden de Pedido #{orden.id}"
+    else:
+        try:
+            ids = [int(i) for i in productos_ids.split(',') if i.strip()]
+        except ValueError:
+            ids = []
+        if not ids:
+            messages.error(request, "❌ Debe indicar una recepción, una orden o una lista de productos.")
+            return redirect('productos')
+        lineas = [(p, 1) for p in Producto.objects.filter(id__in=ids).order_by('nombre')]
+        titulo = f"{len(lineas)} producto(s)"
+
+    # Una etiqueta por producto, o una por unidad si se pide
+    etiquetas = []
+    for producto, cantidad in lineas:
+        etiqueta = {'producto': producto, 'svg': svg_codigo_barra(producto.codigo)}
+        etiquetas.extend([etiqueta] * (cantidad if por_unidad else 1))
+
+    hojas = [
+        etiquetas[i:i + ETIQUETAS_POR_HOJA]
+        for i in range(0, len(etiquetas), ETIQUETAS_POR_HOJA)
+    ]
+
+    return render(request, "imprimir_etiquetas.html", {
+        'titulo': titulo,
+        'hojas': hojas,
+        'total_etiquetas': len(etiquetas),
+    })
+
+
+
+# -----------------------------
+# MÁRGENES – SOLO ADMIN
+# -----------------------------
+AGRUPACIONES_MARGEN = {
+    'producto': 'producto__nombre',
+    'categoria': 'categoria__nombre',
+    'mes': 'mes',
+}
+
+
+@login_required
+@user_passes_test(es_admin, login_url='/')
+def margenes(request):
+    """Margen por producto, categoría o mes, leído del resumen diario precalculado"""
+    hoy = timezone.localdate()
+    try:
+        desde = date.fromisoformat(request.GET.get('desde', ''))
+    except ValueError:
+        desde = hoy.replace(day=1)
+    try:
+        hasta = date.fromisoformat(request.GET.get('hasta', ''))
+    except ValueError:
+        hasta = hoy
+
+    agrupar = request.GET.get('agrupar', 'producto')
+    if agrupar not in AGRUPACIONES_MARGEN:
+        agrupar = 'producto'
+    campo = AGRUPACIONES_MARGEN[agrupar]
+
+    resumen = ResumenMargenDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+    if agrupar == 'mes':
+        resumen = resumen.annotate(mes=TruncMonth('fecha'))
+
+    filas = list(
+        resumen.values(campo).annotate(
+            cantidad=Sum('cantidad'),
+            ingreso=Sum('ingreso'),
+            costo=Sum('costo'),
+        ).order_by('-ingreso' if agrupar != 'mes' else 'mes')
+    )
+
+    totales = {'cantidad': 0, 'ingreso': Decimal('0'), 'costo': Decimal('0')}
+    for fila in filas:
+        fila['grupo'] = fila[campo]
+        fila['margen'] = fila['ingreso'] - fila['costo']
+        fila['porcentaje'] = (fila['margen'] / fila['ingreso'] * 100) if fila['ingreso'] else 0
+        for clave in totales:
+            totales[clave] += fila[clave]
+    totales['margen'] = totales['ingreso'] - totales['costo']
+    totales['porcentaje'] = (totales['margen'] / totales['ingreso'] * 100) if totales['ingreso'] else 0
+
+    return render(request, "margenes.html", {
+        'filas': filas,
+        'totales': totales,
+        'desde': desde,
+        'hasta': hasta,
+        'agrupar': agrupar,
+    })
+
+
+# -----------------------------
+# PERFILES DE REQUESTS – SOLO ADMIN
+# -----------------------------
+@login_required
+@user_passes_test(es_admin, login_url='/')
+def perfiles(request):
+    """Perfiles capturados por PerfiladoMiddleware, del más reciente al más antiguo"""
+    return render(request, "perfiles.html", {
+        'perfiles': perfilado.listar_perfiles(),
+        'muestreo': settings.PERFILADO_MUESTREO,
+    })
+
+
+@login_required
+@user_passes_test(es_admin, login_url='/')
+def detalle_perfil(request, perfil_id):
+    datos = perfilado.leer_datos(perfil_id)
+    if datos is None:
+        raise Http404('Perfil no encontrado')
+
+    orden = request.GET.get('orden', 'cumulative')
+    if orden not in ('cumulative', 'tottime'):
+        orden = 'cumulative'
+
+    return render(request, "detalle_perfil.html", {
+        'perfil': datos,
+        'orden': orden,
+        'funciones': perfilado.funciones_principales(perfil_id, orden),
+        'consultas_agrupadas': perfilado.consultas_principales(datos['consultas']),
+        'tiempo_sql_ms': round(sum(c['duracion_ms'] for c in datos['consultas']), 2),
+    })
+
+
+# -----------------------------
+# CONSULTAS LENTAS – SOLO ADMIN
+# -----------------------------
+@login_required
+@user_passes_test(es_admin, login_url='/')
+def consultas_lentas(request):
+    """Consultas sobre el umbral, unidas de todos los procesos, de la más costosa a la menos"""
+    if request.method == 'POST':
+        borrar_instantaneas()
+        messages.success(request, 'Registro de consultas lentas reiniciado.')
+        return redirect('consultas_lentas')
+
+    consultas = consultas_de_todos_los_procesos(limite=50)
+    for consulta in consultas:
+        for campo in ('vistas', 'roles', 'origenes'):
+            consulta[campo] = sorted(consulta[campo].items(), key=lambda item: -item[1])
+
+    return render(request, "consultas_lentas.html", {
+        'consultas': consultas,
+        'umbral': settings.CONSULTAS_LENTAS_MS,
+    })
+
+
+# -----------------------------
+# CIERRES DE CAJA – SOLO ADMIN
+# -----------------------------
+@login_required
+@user_passes_test(es_admin, login_url='/')
+def cierres_caja(request):
+    """
+    Turno abierto de cada sucursal (con botón para cerrarlo) y cierres anteriores. Con ?mes=AAAA-MM
+    suma las líneas congeladas del mes por vendedor y tipo de pago, sin volver a leer Venta.
+    """
+    if request.method == 'POST':
+        sucursal = get_object_or_404(Sucursal, id=request.POST.get('sucursal_id'))
+        try:
+            cierre = cerrar_caja(sucursal, request.user)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('cierres_caja')
+        messages.success(request, f'Caja de {sucursal.nombre} cerrada: {cierre.cantidad_ventas} ventas por ${cierre.total:.0f}.')
+        return redirect('detalle_cierre', cierre_id=cierre.id)
+
+    # Mismo corte que usaría el cierre, para que la vista previa coincida con lo que se congela
+    hasta = fin_turno()
+    turnos = []
+    for sucursal in Sucursal.objects.order_by('codigo'):
+        desde = inicio_turno(sucursal)
+        filas = resumen_turno(sucursal, desde, hasta)
+        turnos.append({
+            'sucursal': sucursal,
+            'desde': desde,
+            'hasta': hasta,
+            'filas': filas,
+            'cantidad': sum(f['cantidad'] for f in filas),
+            'total': sum((f['total'] for f in filas), Decimal('0')),
+        })
+
+    cierres = CierreCaja.objects.select_related('sucursal', 'cerrado_por')
+    mes, resumen_mes = request.GET.get('mes', ''), None
+    try:
+        inicio_mes = date.fromisoformat(f'{mes}-01')
+    except ValueError:
+        mes = ''
+    else:
+        fin_mes = (inicio_mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        inicio, fin = rango_datetime(inicio_mes, fin_mes)
+        cierres = cierres.filter(hasta__gte=inicio, hasta__lt=fin)
+        resumen_mes = list(
+            LineaCierreCaja.objects.filter(cierre__in=cierres)
+            .values('vendedor__username', 'tipo_pago')
+            .annotate(cantidad=Sum('cantidad'), total=Sum('total'))
+            .order_by('vendedor__username', 'tipo_pago')
+        )
+
+    return render(request, "cierres_caja.html", {
+        'turnos': turnos,
+        'cierres': Paginator(cierres, 30).get_page(request.GET.get('pagina')),
+        'mes': mes,
+        'resumen_mes': resumen_mes,
+        'total_mes': sum((f['total'] for f in resumen_mes or []), Decimal('0')),
+    })
+
+
+@login_required
+@user_passes_test(es_admin, login_url='/')
+def detalle_cierre(request, cierre_id):
+    """Líneas del cierre comparadas con el cierre anterior de la misma sucursal"""
+    cierre = get_object_or_404(CierreCaja.objects.select_related('sucursal', 'cerrado_por'), id=cierre_id)
+    anterior = (
+        CierreCaja.objects.filter(sucursal=cierre.sucursal, hasta__lte=cierre.desde)
+        .order_by('-hasta').first()
+    )
+    return render(request, "detalle_cierre.html", {
+        'cierre': cierre,
+        'anterior': anterior,
+        'filas': comparar_lineas(cierre, anterior),
+    })
@@ -5,6 +5,13 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Las cajas reciben los cambios de stock y precio por /api/eventos/stock/ (server-sent events),
+que solo se sirve bajo ASGI, p. ej.:
+
+    uvicorn yuyitos.asgi:application --workers 1
+
+Con más de un worker, EVENTOS_DIFUSOR debe apuntar a un difusor con pub/sub compartido.
 """
 
 import os
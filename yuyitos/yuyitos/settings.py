@@ -13,6 +13,8 @@ LOGIN_URL = '/'
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 TEMPLATES_DIR = os.path.join(BASE_DIR,'templates')
@@ -55,8 +57,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'mainApp.middleware.ReplicaMiddleware',
+    'mainApp.middleware.ConsultasLentasMiddleware',
+    'mainApp.middleware.PerfiladoMiddleware',
 ]
 
+# En producción los estáticos se sirven desde la app (hasheados y precomprimidos)
+if not DEBUG:
+    MIDDLEWARE.insert(1, 'mainApp.middleware.ArchivosEstaticosMiddleware')
+
 ROOT_URLCONF = 'yuyitos.urls'
 
 TEMPLATES = [
@@ -89,6 +98,71 @@ DATABASES = {
     )
 }
 
+# Réplica de lectura opcional para reportes (home, inventario, ficha de crédito, admin).
+# Para probar en local: REPLICA_DATABASE_URL=sqlite:///replica.sqlite3 y luego
+# `python manage.py sincronizar_replica` copia el primario a la réplica.
+REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = dj_database_url.parse(REPLICA_DATABASE_URL, conn_max_age=600)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['mainApp.routers.ReplicaRouter']
+
+VISTAS_REPLICA = ['home', 'inventario', 'ficha_credito']
+
+# Segundos que un usuario queda leyendo del primario después de escribir
+REPLICA_FIJACION_SEGUNDOS = 5
+
+
+# Cache
+# Con varios procesos (gunicorn con workers) conviene un cache compartido: REDIS_URL
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+CACHES = {
+    'default': (
+        {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+        if REDIS_URL else
+        {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'yuyitos'}
+    ),
+    # Usuarios autenticados, local al proceso y de vida corta (validado contra 'default')
+    'usuarios': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'usuarios',
+    },
+}
+
+# ETag/Last-Modified de catálogo e inventario. Las versiones viven en el cache: con cache local
+# al proceso un cambio hecho en un worker no llega a los demás y entregarían un 304 con datos
+# viejos, así que solo se activan con cache compartido
+CATALOGO_ETAG = bool(REDIS_URL)
+CATALOGO_VERSION_SEGUNDOS = None
+
+# La sincronización de catálogo solo entrega cambios con esta antigüedad mínima, para que
+# una transacción lenta que confirma tarde no quede detrás del cursor de una caja
+SINCRONIZACION_MARGEN_SEGUNDOS = 5
+
+
+# Sesiones y autenticación
+# SESSION_MODE: 'db', 'cached_db' (por defecto con REDIS_URL) o 'signed_cookies'. cached_db
+# necesita cache compartido: con cache local un logout en un worker deja la sesión viva en los demás
+
+SESSION_MODE = os.environ.get('SESSION_MODE', 'cached_db' if REDIS_URL else 'db')
+if SESSION_MODE == 'cached_db' and not REDIS_URL:
+    raise ImproperlyConfigured("SESSION_MODE='cached_db' requiere un cache compartido (REDIS_URL).")
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_MODE]
+
+AUTHENTICATION_BACKENDS = ['mainApp.backends.CachedModelBackend']
+
+# Segundos que un usuario (y su rol) queda en el cache del proceso. Las invalidaciones viajan
+# por el cache compartido: con cache local (sin REDIS_URL) otro worker no se enteraría de un
+# cambio de rol o una desactivación, así que se desactiva
+USUARIOS_CACHE_SEGUNDOS = 60 if REDIS_URL else 0
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -128,6 +202,20 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [STATIC_DIR]  
+STATIC_ROOT = os.path.join(BASE_DIR,'staticfiles')
+
+# collectstatic genera nombres hasheados (manifest) y variantes .gz/.br
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'mainApp.storage.ComprimidoManifestStaticFilesStorage'
+        ),
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -135,4 +223,60 @@ STATICFILES_DIRS = [STATIC_DIR]
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR,'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR,'media')
+
+# Bajo este stock por sucursal se emite una alerta al procesar la venta
+STOCK_MINIMO_ALERTA = 10
+
+# Las ventas cerradas con más de estos días pasan a las tablas de archivo (archivar_ventas)
+ARCHIVO_VENTAS_DIAS = 365
+
+# La conciliación de saldos solo da por cerrados los movimientos con esta antigüedad
+CONCILIACION_MARGEN_SEGUNDOS = 60
+
+# El cierre de caja llega hasta hace estos segundos: la fecha de una venta se fija antes de
+# confirmar su transacción, y una venta en curso al cerrar queda para el turno siguiente
+CIERRE_CAJA_MARGEN_SEGUNDOS = 10
+
+# Particiones temporales de importar_ventas (se conservan hasta terminar, para poder reanudar)
+IMPORTACION_DIRECTORIO = os.path.join(BASE_DIR, 'importaciones')
+
+# Avisos de stock y precio a las cajas por server-sent events (solo bajo ASGI, ver asgi.py).
+# El difusor local solo alcanza a las cajas conectadas al mismo proceso
+EVENTOS_DIFUSOR = 'mainApp.eventos.DifusorLocal'
+# Los cambios que llegan dentro de esta ventana se envían juntos
+EVENTOS_VENTANA_SEGUNDOS = 0.5
+EVENTOS_LATIDO_SEGUNDOS = 15
+EVENTOS_REINTENTO_MS = 5000
+
+# Perfilado de requests (ver /reportes/perfiles/). Fracción de requests perfilados al azar:
+# 0 lo desactiva; los superusuarios siempre pueden pedirlo con ?perfilar=1
+PERFILADO_MUESTREO = float(os.environ.get('PERFILADO_MUESTREO', '0'))
+PERFILADO_DIRECTORIO = os.environ.get('PERFILADO_DIRECTORIO', os.path.join(BASE_DIR, 'perfiles'))
+# Perfiles guardados; al pasar el límite se borran los más antiguos
+PERFILADO_MAXIMO = 200
+
+# Consultas lentas (ver /reportes/consultas-lentas/ y el comando consultas_lentas)
+CONSULTAS_LENTAS_MS = float(os.environ.get('CONSULTAS_LENTAS_MS', '100'))
+# Huellas distintas que conserva cada proceso (las de más tiempo total)
+CONSULTAS_LENTAS_MAXIMO = 50
+CONSULTAS_LENTAS_DIRECTORIO = os.path.join(BASE_DIR, 'consultas_lentas')
+CONSULTAS_LENTAS_INSTANTANEA_SEGUNDOS = 30
+# Donde no se puede consultar si un proceso sigue vivo (Windows), sus instantáneas se descartan
+# tras este tiempo sin actualizarse
+CONSULTAS_LENTAS_VIGENCIA_SEGUNDOS = 24 * 3600
+
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{asctime} {levelname} {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        'mainApp': {'handlers': ['consola'], 'level': os.environ.get('LOG_NIVEL', 'INFO')},
+    },
+}
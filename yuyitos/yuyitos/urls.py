@@ -16,6 +16,8 @@ urlpatterns = [
     path('ventas/', views.ventas, name="ventas"),
     path('ventas/registrar/', views.registrar_venta, name="registrar_venta"),
     path('ventas/<int:venta_id>/', views.detalle_venta, name="detalle_venta"),
+    path('ventas/<int:venta_id>/boleta/', views.boleta, name="boleta"),
+    path('ventas/boletas/exportar/', views.exportar_boletas, name="exportar_boletas"),
     
     path('clientes/', views.clientes, name="clientes"),
     path('clientes/<int:cliente_id>/ficha-credito/', views.ficha_credito, name="ficha_credito"),
@@ -26,9 +28,21 @@ urlpatterns = [
     
     path('recepciones/', views.recepciones, name="recepciones"),
     path('recepciones/crear/<int:orden_id>/', views.crear_recepcion, name="crear_recepcion"),
+    path('recepciones/importar/<int:orden_id>/', views.importar_guia_recepcion, name="importar_guia_recepcion"),
     path('recepciones/<int:recepcion_id>/', views.detalle_recepcion, name="detalle_recepcion"),
     
+    path('reportes/margenes/', views.margenes, name="margenes"),
+    path('reportes/perfiles/', views.perfiles, name="perfiles"),
+    path('reportes/perfiles/<str:perfil_id>/', views.detalle_perfil, name="detalle_perfil"),
+    path('reportes/consultas-lentas/', views.consultas_lentas, name="consultas_lentas"),
+    path('reportes/cierres-caja/', views.cierres_caja, name="cierres_caja"),
+    path('reportes/cierres-caja/<int:cierre_id>/', views.detalle_cierre, name="detalle_cierre"),
+
+    path('api/productos/cambios/', views.api_cambios_catalogo, name="api_cambios_catalogo"),
+    path('api/eventos/stock/', views.eventos_stock, name="eventos_stock"),
+    path('api/clientes/', views.api_clientes, name="api_clientes"),
     path('api/productos-proveedor/<int:proveedor_id>/', views.api_productos_proveedor, name="api_productos_proveedor"),
     
     path('productos/<int:producto_id>/codigo-barra/', views.imprimir_codigo_barra, name="imprimir_codigo_barra"),
+    path('productos/etiquetas/', views.imprimir_etiquetas, name="imprimir_etiquetas"),
 ]
\ No newline at end of file